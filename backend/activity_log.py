@@ -0,0 +1,118 @@
+import os
+import time
+import atexit
+import datetime
+import threading
+from collections import deque
+from sqlalchemy import insert, select
+
+from .models import db, ActivityLog, Plan
+from .versioning import bump_versions
+from .analytics import apply_rollups
+
+class ActivityLogWriter:
+    """
+    An in-memory, batching sink for ActivityLog rows.
+
+    Request handlers call `log()`, which only appends to a bounded queue. A background thread
+    writes the queue in multi-row INSERTs whenever `batch_size` events are waiting or
+    `flush_interval` seconds have passed, and `stop()` (registered with atexit) drains it on shutdown.
+
+    Loss policy: the queue holds at most `max_queue` events. When it is full the *oldest* event is
+    dropped and counted in `dropped`. A batch whose INSERT fails is put back at the head of the queue
+    and retried up to `max_retries` times before it is dropped. A hard crash therefore loses at most
+    `max_queue` events. With `enabled=False` every event is written synchronously instead.
+
+    Each batch also updates the analytics rollups in the same transaction, so a lost event is
+    missing from both the log and the dashboards, never from only one of them.
+    """
+    def __init__(self, app=None):
+        self.app = None; self.dropped = 0; self.written = 0
+        self._queue = deque(); self._cond = threading.Condition()
+        self._thread = None; self._pid = None; self._stopping = False
+        if app is not None: self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = str(app.config.get('ACTIVITY_LOG_ASYNC', True)).lower() not in ('0', 'false', 'no')
+        self.batch_size = int(app.config.get('ACTIVITY_LOG_BATCH_SIZE', 100))
+        self.flush_interval = float(app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL', 1.0))
+        self.max_queue = int(app.config.get('ACTIVITY_LOG_MAX_QUEUE', 10000))
+        self.max_retries = int(app.config.get('ACTIVITY_LOG_MAX_RETRIES', 3))
+        app.extensions['activity_log'] = self
+        atexit.register(self.stop)
+
+    def log(self, user_id, action_code, payload=None, plan_id=None, rollup=None, request_id=None):
+        """
+        Records an event without touching the database on the calling thread. `action_code` is one of
+        events.EVENT_TYPES and `payload` its template fields; `rollup` is an analytics event (see analytics.py).
+        `request_id` correlates the event with the request's trace (see tracing.py).
+        """
+        row = {"user_id": user_id, "action": "", "action_code": action_code, "payload": payload, "plan_id": plan_id, "request_id": request_id,
+               "timestamp": datetime.datetime.utcnow(), "rollup": rollup}
+        if not self.enabled: self._write([row]); return
+        self._ensure_started()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft(); self.dropped += 1
+            self._queue.append((row, 0))
+            if len(self._queue) >= self.batch_size: self._cond.notify()
+
+    def flush(self):
+        """Synchronously writes everything that is currently queued."""
+        while True:
+            batch = self._take_batch()
+            if not batch: return
+            self._write_batch(batch)
+
+    def stop(self, timeout=5.0):
+        """Stops the background thread and drains the queue. Safe to call more than once."""
+        with self._cond:
+            self._stopping = True; self._cond.notify()
+        if self._thread is not None and self._thread.is_alive(): self._thread.join(timeout)
+        self.flush()
+        if self.dropped: print(f"Activity log writer dropped {self.dropped} events.")
+
+    def _ensure_started(self):
+        # Started lazily so that each forked worker process gets its own thread.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(): return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(): return
+            self._stopping = False; self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True); self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: break
+                    self._cond.wait(remaining)
+                if self._stopping: return
+            batch = self._take_batch()
+            if batch: self._write_batch(batch)
+
+    def _take_batch(self):
+        with self._cond:
+            return [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+    def _write_batch(self, batch):
+        try:
+            self._write([row for row, _ in batch])
+        except Exception as e:
+            print(f"Activity log write failed ({len(batch)} events): {e}")
+            with self._cond:
+                for row, attempts in reversed(batch):
+                    if attempts + 1 >= self.max_retries or len(self._queue) >= self.max_queue: self.dropped += 1
+                    else: self._queue.appendleft((row, attempts + 1))
+
+    def _write(self, rows):
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                # A plan can be deleted before its event is written; keep its id in the payload only, not as a dangling reference.
+                plan_ids = {row["plan_id"] for row in rows if row["plan_id"] is not None}
+                if plan_ids: plan_ids = set(conn.execute(select(Plan.id).where(Plan.id.in_(plan_ids))).scalars())
+                conn.execute(insert(ActivityLog.__table__), [{**{k: v for k, v in row.items() if k != "rollup"}, "plan_id": row["plan_id"] if row["plan_id"] in plan_ids else None} for row in rows])
+                apply_rollups(conn, rows); bump_versions(conn, ["activity_logs"])
+        self.written += len(rows)
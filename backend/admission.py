@@ -0,0 +1,193 @@
+import json
+import math
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# ==============================================================================
+# ===              ADMISSION CONTROL FOR PLAN GENERATION                     ===
+# ==============================================================================
+# Every generation passes two gates before it may call the LLM:
+#   1. A token bucket per user: `rate_per_minute` tokens refill continuously up to `burst`, and each
+#      generation takes one per LLM call it makes (`cost`, e.g. the number of plan variants, at most `burst`).
+#      The limits are set per role (GENERATION_RATE_LIMITS).
+#   2. A global cap on in-flight LLM calls (GENERATION_MAX_CONCURRENCY); a generation holds `cost` slots. Requests that find every slot
+#      busy wait in a per-user queue, and a freed slot goes to the next *user* in round-robin order,
+#      so one user's burst cannot hold the slots while another user waits. A user may have at most
+#      GENERATION_MAX_QUEUED_PER_USER requests waiting, and no request waits longer than
+#      GENERATION_QUEUE_TIMEOUT seconds.
+# A request refused at either gate gets AdmissionRejected, which the endpoint turns into a 429 with a
+# Retry-After header. A request refused at the second gate gets its tokens back.
+#
+# State is per process by default. With ADMISSION_REDIS_URL the buckets and slots are shared by every
+# worker (redis is then an optional dependency): the round-robin queue stays per worker, and it asks
+# redis for a slot on behalf of the next user in its queue.
+
+DEFAULT_RATE_LIMITS = {"teacher": {"rate_per_minute": 4, "burst": 6}, "admin": {"rate_per_minute": 20, "burst": 20}}
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is refused; `retry_after` is in seconds."""
+    def __init__(self, message, retry_after):
+        super().__init__(message); self.message = message; self.retry_after = max(1, math.ceil(retry_after))
+
+class LocalAdmissionState:
+    """Token buckets and slot counter held in this process."""
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency; self._lock = threading.Lock(); self._buckets = {}; self._in_flight = {}  # lease -> slots held
+
+    def take_token(self, key, rate_per_second, burst, cost=1):
+        """Takes `cost` tokens; returns 0 on success or the seconds until that many will be available."""
+        with self._lock:
+            now = time.monotonic(); tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate_per_second)
+            if tokens >= cost: self._buckets[key] = (tokens - cost, now); return 0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate_per_second if rate_per_second > 0 else 3600
+
+    def return_token(self, key, burst, cost=1):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, time.monotonic())); self._buckets[key] = (min(burst, tokens + cost), updated)
+
+    def try_acquire_slot(self, lease, weight=1):
+        with self._lock:
+            if sum(self._in_flight.values()) + weight > self.max_concurrency: return False
+            self._in_flight[lease] = weight; return True
+
+    def release_slot(self, lease, weight=1):
+        with self._lock: self._in_flight.pop(lease, None)
+
+    def in_flight(self):
+        with self._lock: return sum(self._in_flight.values())
+
+class RedisAdmissionState:
+    """The same state in redis, shared by all workers. Slots are leases that expire after `lease_seconds`, so a crashed worker cannot leak them."""
+    TAKE_TOKEN = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+    local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost elseif rate > 0 then wait = (cost - tokens) / rate else wait = 3600 end
+    redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / math.max(rate, 0.001)) + 60)
+    return tostring(wait)
+    """
+    RETURN_TOKEN = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't'))
+    if tokens then redis.call('HSET', KEYS[1], 't', tostring(math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2])))) end
+    """
+    ACQUIRE_SLOT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    local weight = tonumber(ARGV[5])
+    if redis.call('ZCARD', KEYS[1]) + weight > tonumber(ARGV[2]) then return 0 end
+    for i = 1, weight do redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4] .. ':' .. i) end
+    return 1
+    """
+
+    def __init__(self, url, max_concurrency, lease_seconds, prefix="ltp:admission:"):
+        import redis  # Optional dependency, only needed for shared state
+        self.client = redis.Redis.from_url(url); self.max_concurrency = max_concurrency; self.lease_seconds = lease_seconds; self.prefix = prefix
+        self._take = self.client.register_script(self.TAKE_TOKEN); self._return = self.client.register_script(self.RETURN_TOKEN)
+        self._acquire = self.client.register_script(self.ACQUIRE_SLOT)
+
+    def take_token(self, key, rate_per_second, burst, cost=1):
+        return float(self._take(keys=[self.prefix + "bucket:" + key], args=[rate_per_second, burst, time.time(), cost]))
+
+    def return_token(self, key, burst, cost=1):
+        self._return(keys=[self.prefix + "bucket:" + key], args=[burst, cost])
+
+    def try_acquire_slot(self, lease, weight=1):
+        now = time.time()  # one sorted-set member per slot held: "<lease>:1" ... "<lease>:<weight>"
+        return bool(self._acquire(keys=[self.prefix + "slots"], args=[now, self.max_concurrency, now + self.lease_seconds, lease, weight]))
+
+    def release_slot(self, lease, weight=1):
+        self.client.zrem(self.prefix + "slots", *(f"{lease}:{i}" for i in range(1, weight + 1)))
+
+    def in_flight(self):
+        self.client.zremrangebyscore(self.prefix + "slots", "-inf", time.time()); return self.client.zcard(self.prefix + "slots")
+
+class _Waiter:
+    __slots__ = ("event", "lease", "weight")
+    def __init__(self, weight=1): self.event = threading.Event(); self.lease = None; self.weight = weight
+
+class AdmissionController:
+    """Rate limits and fair scheduling for plan generation. Use `with controller.generation_slot(user_id, role): ...`."""
+    def __init__(self, app=None):
+        self._lock = threading.Lock(); self._queues = OrderedDict()  # user_id -> deque of waiters, in round-robin order
+        if app is not None: self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = str(app.config.get('GENERATION_ADMISSION', True)).lower() not in ('0', 'false', 'no')
+        limits = app.config.get('GENERATION_RATE_LIMITS') or DEFAULT_RATE_LIMITS
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(json.loads(limits) if isinstance(limits, str) else limits)}
+        self.max_concurrency = int(app.config.get('GENERATION_MAX_CONCURRENCY', 4))
+        self.max_queued_per_user = int(app.config.get('GENERATION_MAX_QUEUED_PER_USER', 1))
+        self.queue_timeout = float(app.config.get('GENERATION_QUEUE_TIMEOUT', 30))
+        self.poll_interval = float(app.config.get('GENERATION_QUEUE_POLL_INTERVAL', 0.25))
+        redis_url = app.config.get('ADMISSION_REDIS_URL')
+        self.state = RedisAdmissionState(redis_url, self.max_concurrency, int(app.config.get('GENERATION_LEASE_SECONDS', 300))) if redis_url \
+            else LocalAdmissionState(self.max_concurrency)
+        app.extensions['admission'] = self
+
+    def limits_for(self, role):
+        return self.rate_limits.get(role) or self.rate_limits["teacher"]
+
+    @contextmanager
+    def generation_slot(self, user_id, role, cost=1):
+        """
+        Admits one generation making `cost` concurrent LLM calls for the user, or raises AdmissionRejected.
+        It takes `cost` tokens (at most a full bucket) and holds `cost` slots (at most all of them) until the block exits.
+        """
+        if not self.enabled: yield; return
+        limits = self.limits_for(role); key = str(user_id); burst = float(limits["burst"])
+        tokens = min(cost, burst); weight = max(1, min(cost, self.max_concurrency))
+        wait = self.state.take_token(key, float(limits["rate_per_minute"]) / 60, burst, tokens)
+        if wait > 0: raise AdmissionRejected(f"You can generate {limits['rate_per_minute']} plans per minute. Please wait before trying again.", wait)
+        try: lease = self._acquire(user_id, weight)
+        except AdmissionRejected: self.state.return_token(key, burst, tokens); raise
+        try: yield
+        finally:
+            self.state.release_slot(lease, weight); self._dispatch()
+
+    def queued(self):
+        """{user_id: waiting requests} in this process."""
+        with self._lock: return {user_id: len(waiters) for user_id, waiters in self._queues.items()}
+
+    def _acquire(self, user_id, weight=1):
+        waiter = _Waiter(weight)
+        with self._lock:
+            waiters = self._queues.get(user_id)
+            if waiters is not None and len(waiters) >= self.max_queued_per_user:
+                raise AdmissionRejected("A plan you requested earlier is still waiting to be generated.", self.poll_interval * 4 + 1)
+            if not self._queues:  # nobody is waiting: take a free slot directly
+                lease = uuid.uuid4().hex
+                if self.state.try_acquire_slot(lease, weight): return lease
+            self._queues.setdefault(user_id, deque()).append(waiter)
+        deadline = time.monotonic() + self.queue_timeout
+        while not waiter.event.wait(min(self.poll_interval, max(0, deadline - time.monotonic()))):
+            self._dispatch()  # picks up slots freed by other workers when the state is shared
+            if waiter.event.is_set(): break
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    if waiter.lease is None:
+                        waiters = self._queues.get(user_id)
+                        if waiters is not None and waiter in waiters:
+                            waiters.remove(waiter)
+                            if not waiters: del self._queues[user_id]
+                        raise AdmissionRejected("The plan generator is busy. Please try again shortly.", self.queue_timeout / 2)
+                break
+        return waiter.lease
+
+    def _dispatch(self):
+        """Hands free slots to waiting requests, one user at a time in round-robin order."""
+        with self._lock:
+            while self._queues:
+                # The next request in turn waits until enough slots for all its calls are free, rather than being overtaken.
+                lease = uuid.uuid4().hex; user_id, waiters = next(iter(self._queues.items()))
+                if not self.state.try_acquire_slot(lease, waiters[0].weight): return
+                waiter = waiters.popleft()
+                if waiters: self._queues.move_to_end(user_id)
+                else: del self._queues[user_id]
+                waiter.lease = lease; waiter.event.set()
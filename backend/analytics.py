@@ -0,0 +1,154 @@
+import datetime
+from collections import Counter, defaultdict
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import db, UsageRollup, DailyActivity, ActiveUserDay, ActivityLog, FeedbackLog
+from .versioning import bump_versions
+
+# ==============================================================================
+# ===                    INCREMENTAL ANALYTICS ROLLUPS                       ===
+# ==============================================================================
+# Counters are kept per UTC day in three small tables:
+#   usage_rollup     generations / positive / negative ratings per (cohort, domain, component, play type)
+#   daily_activity   distinct active users, logged events and the day's usage totals
+#   active_user_day  which users were active on a day, so each is counted once
+# The activity-log writer applies a batch's increments in the same transaction as its ActivityLog
+# insert (see apply_rollups), so the admin analytics endpoints never scan the raw logs.
+# `flask rebuild-analytics` (and the first start after an upgrade) recomputes ratings and activity from the raw tables; generations were
+# never logged with their selections, so days before the rollups existed have none.
+
+DIMENSIONS = ("age_cohort", "domain", "component", "play_type")
+METRICS = ("generations", "positive_ratings", "negative_ratings")
+
+def rollup_key(age_cohort, domain, component, play_type):
+    """The dimension tuple of a usage_rollup row. `play_type` may be the {"name", "context"} dict the chatbot sends."""
+    if isinstance(play_type, dict): play_type = play_type.get('name')
+    return tuple(str(value or '')[:limit] for value, limit in zip((age_cohort, domain, component, play_type), (50, 100, 200, 100)))
+
+def selections_key(selections):
+    """rollup_key() for the selections dict stored with feedback ({"age", "domain", "sub_domain", "play_type"})."""
+    s = selections if isinstance(selections, dict) else {}
+    return rollup_key(s.get('age'), s.get('domain'), s.get('sub_domain'), s.get('play_type'))
+
+def generation_event(age_cohort, domain, component, play_type):
+    return (rollup_key(age_cohort, domain, component, play_type), "generations")
+
+def rating_event(selections, rating):
+    return (selections_key(selections), "positive_ratings" if rating > 0 else "negative_ratings")
+
+def _dialect_insert(connection):
+    return {'sqlite': sqlite_insert, 'postgresql': pg_insert}.get(connection.dialect.name)
+
+def _increment(connection, table, keys, rows):
+    """Adds each row's counters to the row with the same key, creating it if needed (an upsert where the dialect has one)."""
+    if not rows: return
+    counters = [c for c in rows[0] if c not in keys]; dialect_insert = _dialect_insert(connection)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        connection.execute(stmt.on_conflict_do_update(index_elements=[table.c[k] for k in keys], set_={c: table.c[c] + stmt.excluded[c] for c in counters}), rows)
+        return
+    for row in rows:
+        match = [table.c[k] == row[k] for k in keys]
+        if connection.execute(update(table).where(*match).values({c: table.c[c] + row[c] for c in counters})).rowcount == 0:
+            connection.execute(insert(table).values(row))
+
+def _mark_active(connection, pairs):
+    """Records (day, user_id) pairs and returns how many were new for each day."""
+    table = ActiveUserDay.__table__; dialect_insert = _dialect_insert(connection)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values([{"day": day, "user_id": user_id} for day, user_id in pairs])
+        return Counter(row.day for row in connection.execute(stmt.on_conflict_do_nothing().returning(table.c.day)))
+    new = Counter()
+    for day, user_id in pairs:
+        if connection.execute(select(table.c.day).where(table.c.day == day, table.c.user_id == user_id)).first() is None:
+            connection.execute(insert(table).values(day=day, user_id=user_id)); new[day] += 1
+    return new
+
+def apply_rollups(connection, rows):
+    """
+    Folds a batch of activity rows ({"user_id", "timestamp", "rollup": (key, metric) or None}) into the
+    rollup tables using `connection`, i.e. inside the caller's transaction. A batch costs at most three
+    statements however many events it holds.
+    """
+    usage = defaultdict(Counter); daily = defaultdict(Counter); pairs = set()
+    for row in rows:
+        day = row["timestamp"].date(); daily[day]["events"] += 1; pairs.add((day, row["user_id"]))
+        if row.get("rollup"):
+            key, metric = row["rollup"]; usage[(day,) + tuple(key)][metric] += 1; daily[day][metric] += 1
+    _increment(connection, UsageRollup.__table__, ("day",) + DIMENSIONS,
+               [{"day": k[0], **dict(zip(DIMENSIONS, k[1:])), **{m: counts[m] for m in METRICS}} for k, counts in usage.items()])
+    new_users = _mark_active(connection, sorted(pairs)) if pairs else Counter()
+    _increment(connection, DailyActivity.__table__, ("day",), [{"day": day, "active_users": new_users[day], "events": counts["events"], **{m: counts[m] for m in METRICS}} for day, counts in daily.items()])
+    bump_versions(connection, ["analytics"])
+
+def rebuild_rollups(batch_size=5000):
+    """
+    Recomputes the rating counters and the daily activity tables from FeedbackLog and ActivityLog, in batches.
+    Generation counters are kept: they exist only in the rollups. So is the activity of days before the oldest
+    row left in ActivityLog, which have been archived (see events.py). Returns (feedback rows, activity days).
+    """
+    ratings = defaultdict(Counter); last_id = 0; feedback_rows = 0
+    while True:
+        rows = db.session.execute(select(FeedbackLog.id, FeedbackLog.rating, FeedbackLog.selections, FeedbackLog.timestamp)
+                                  .where(FeedbackLog.id > last_id).order_by(FeedbackLog.id).limit(batch_size)).all()
+        if not rows: break
+        last_id = rows[-1].id; feedback_rows += len(rows)
+        for row in rows:
+            if row.timestamp is None: continue
+            key, metric = rating_event(row.selections, row.rating); ratings[(row.timestamp.date(),) + key][metric] += 1
+    day = func.date(ActivityLog.timestamp)
+    logged = ActivityLog.timestamp.is_not(None)
+    activity = db.session.execute(select(day, func.count(func.distinct(ActivityLog.user_id)), func.count()).where(logged).group_by(day)).all()
+    pairs = db.session.execute(select(day, ActivityLog.user_id).where(logged).distinct()).all()
+    as_date = lambda value: value if isinstance(value, datetime.date) else datetime.date.fromisoformat(value)
+    conn = db.session.connection(); rollup = UsageRollup.__table__
+    conn.execute(update(rollup).values(positive_ratings=0, negative_ratings=0))
+    _increment(conn, rollup, ("day",) + DIMENSIONS,
+               [{"day": k[0], **dict(zip(DIMENSIONS, k[1:])), "generations": 0, "positive_ratings": c["positive_ratings"], "negative_ratings": c["negative_ratings"]} for k, c in ratings.items()])
+    conn.execute(delete(rollup).where(rollup.c.generations == 0, rollup.c.positive_ratings == 0, rollup.c.negative_ratings == 0))
+    first_day = min((as_date(d) for d, _, _ in activity), default=datetime.date.max); daily = defaultdict(Counter)
+    for row in conn.execute(select(DailyActivity.day, DailyActivity.active_users, DailyActivity.events).where(DailyActivity.day < first_day)):
+        daily[row.day].update(active_users=row.active_users, events=row.events)
+    conn.execute(delete(ActiveUserDay.__table__).where(ActiveUserDay.day >= first_day)); conn.execute(delete(DailyActivity.__table__))
+    for start in range(0, len(pairs), batch_size):
+        conn.execute(insert(ActiveUserDay.__table__), [{"day": as_date(d), "user_id": u} for d, u in pairs[start:start + batch_size]])
+    for d, users, count in activity: daily[as_date(d)].update(active_users=users, events=count)
+    for row in conn.execute(select(rollup.c.day, *[func.sum(rollup.c[m]).label(m) for m in METRICS]).group_by(rollup.c.day)):
+        daily[as_date(row.day)].update({m: int(row._mapping[m]) for m in METRICS})
+    if daily: conn.execute(insert(DailyActivity.__table__), [{"day": d, **{c: counts[c] for c in ("active_users", "events") + METRICS}} for d, counts in daily.items()])
+    bump_versions(conn, ["analytics"]); db.session.commit()
+    return feedback_rows, len(activity)
+
+def backfill_rollups():
+    """Fills the rollups from the raw logs the first time they are deployed on a database that already has activity."""
+    if db.session.execute(select(DailyActivity.day).limit(1)).first() is not None: return
+    if db.session.execute(select(ActivityLog.id).limit(1)).first() is None and db.session.execute(select(FeedbackLog.id).limit(1)).first() is None: return
+    feedback_rows, days = rebuild_rollups(); print(f"Built analytics rollups from {feedback_rows} feedback rows and {days} days of activity.")
+
+# ==============================================================================
+# ===                           ROLLUP QUERIES                               ===
+# ==============================================================================
+def parse_range(start, end, default_days=30):
+    """(from, to) as dates from ISO strings; defaults to the last `default_days` days. Raises ValueError on bad input."""
+    end = datetime.date.fromisoformat(end) if end else datetime.datetime.utcnow().date()
+    start = datetime.date.fromisoformat(start) if start else end - datetime.timedelta(days=default_days - 1)
+    if start > end: raise ValueError("'from' must not be after 'to'")
+    return start, end
+
+def usage_summary(start, end, group_by=DIMENSIONS):
+    """Generation and rating totals between two days (inclusive), grouped by any subset of the dimensions."""
+    columns = [getattr(UsageRollup, name) for name in group_by]
+    totals = [func.sum(getattr(UsageRollup, m)).label(m) for m in METRICS]
+    rows = db.session.execute(select(*columns, *totals).where(UsageRollup.day.between(start, end))
+                              .group_by(*columns).order_by(func.sum(UsageRollup.generations).desc(), *columns)).all()
+    return [{**{name: getattr(row, name) for name in group_by}, **{m: int(getattr(row, m)) for m in METRICS}} for row in rows]
+
+def daily_summary(start, end):
+    """One entry per day in the range: active users, events, generations and ratings (zero-filled)."""
+    fields = ("active_users", "events") + METRICS
+    days = {start + datetime.timedelta(days=i): dict.fromkeys(fields, 0) for i in range((end - start).days + 1)}
+    for row in db.session.execute(select(DailyActivity).where(DailyActivity.day.between(start, end))).scalars():
+        days[row.day].update({name: getattr(row, name) for name in fields})
+    return [{"day": day.isoformat(), **counts} for day, counts in days.items()]
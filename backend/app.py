@@ -1,16 +1,43 @@
 import os
-from flask import Flask, request, jsonify, current_app
+import json
+import time
+import click
+import datetime
+from flask import Flask, request, jsonify, current_app, stream_with_context, session
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from dotenv import dotenv_values
 from functools import wraps
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
 
 # --- Local Module Imports ---
 from .models import db, User, Plan, KnowledgeBase, ActivityLog, AgeCohort, Domain, Component, PlayType, Resource, FeedbackLog
-from .services import generate_teacher_guide
+from .services import generate_teacher_guides
 from .initial_data import AGE_COHORTS, DOMAINS, PLAY_TYPES, COMPONENTS
 from .rag_setup import add_resource_to_vectorstore
+from .uploads import store_upload, UploadTooLarge
+from .migrations import upgrade_schema
+from .database import init_database
+from .curriculum import get_curriculum_snapshot
+from .conditional import conditional
+from .activity_log import ActivityLogWriter
+from .instrumentation import init_sql_instrumentation
+from .serializers import serialize_components, serialize_play_types, serialize_resources, serialize_users, serialize_named
+from .curriculum_io import import_curriculum, export_curriculum, curriculum_to_csv, curriculum_from_csv, CurriculumImportError
+from . import passwords, rag_setup
+from .plans import list_plans_page, plan_metadata, InvalidCursor, encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from .search import search_plans
+from .guides import store_document, store_search_text, plan_markdown, load_document, migrate_plan_storage, best_stored_guide, MARKDOWN_KEY
+from .analytics import generation_event, rating_event, rebuild_rollups, backfill_rollups, parse_range, usage_summary, daily_summary, DIMENSIONS
+from .events import describe_event, migrate_activity_log, archive_activity_logs
+from .admission import AdmissionController, AdmissionRejected
+from .circuit import CircuitBreaker, CircuitOpen
+from .tracing import init_tracing, current_request_id, record_stage
+from .metrics import REGISTRY, GENERATIONS, LLM_TOKENS, LLM_SECONDS
+from .prompts import PromptRegistry, UnknownPromptProfile
+from .variants import new_batch, next_variant, discard_batch
+from .export import parse_export_args, export_bounds, iter_export_rows, stream_zip, stream_jsonl, InvalidExportRequest
 
 # --- App Initialization ---
 app = Flask(__name__)
@@ -18,7 +45,8 @@ app = Flask(__name__)
 # --- Flask-Native Configuration ---
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 dotenv_path = os.path.join(project_root, '.env')
-config = dotenv_values(dotenv_path)
+# Real environment variables take precedence over the .env file (e.g. for production or benchmark runs).
+config = {**dotenv_values(dotenv_path), **os.environ}
 
 app.config.update(
     SECRET_KEY=config.get('FLASK_SECRET_KEY', 'a-fallback-secret-key'),
@@ -26,14 +54,66 @@ app.config.update(
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
     GOOGLE_API_KEY=config.get("GOOGLE_API_KEY"),
     ADMIN_EMAIL=config.get("ADMIN_EMAIL", "admin@example.com"),
-    ADMIN_PASSWORD=config.get("ADMIN_PASSWORD", "supersecret")
+    ADMIN_PASSWORD=config.get("ADMIN_PASSWORD", "supersecret"),
+    UPLOAD_FOLDER=config.get("UPLOAD_FOLDER", "uploads"),
+    MAX_UPLOAD_BYTES=int(config.get("MAX_UPLOAD_BYTES", 25 * 1024 * 1024)),
+    ACTIVITY_LOG_ASYNC=config.get("ACTIVITY_LOG_ASYNC", "true"),
+    ACTIVITY_LOG_BATCH_SIZE=int(config.get("ACTIVITY_LOG_BATCH_SIZE", 100)),
+    ACTIVITY_LOG_FLUSH_INTERVAL=float(config.get("ACTIVITY_LOG_FLUSH_INTERVAL", 1.0)),
+    ACTIVITY_LOG_MAX_QUEUE=int(config.get("ACTIVITY_LOG_MAX_QUEUE", 10000)),
+    GENERATION_ADMISSION=config.get("GENERATION_ADMISSION", "true"),
+    GENERATION_RATE_LIMITS=config.get("GENERATION_RATE_LIMITS"),
+    GENERATION_MAX_CONCURRENCY=int(config.get("GENERATION_MAX_CONCURRENCY", 4)),
+    GENERATION_MAX_QUEUED_PER_USER=int(config.get("GENERATION_MAX_QUEUED_PER_USER", 1)),
+    GENERATION_QUEUE_TIMEOUT=float(config.get("GENERATION_QUEUE_TIMEOUT", 30)),
+    ADMISSION_REDIS_URL=config.get("ADMISSION_REDIS_URL"),
+    LLM_TIMEOUT_SECONDS=float(config.get("LLM_TIMEOUT_SECONDS", 60)),
+    LLM_MAX_RETRIES=int(config.get("LLM_MAX_RETRIES", 1)),
+    LLM_BREAKER_WINDOW=config.get("LLM_BREAKER_WINDOW"),
+    LLM_BREAKER_MIN_CALLS=config.get("LLM_BREAKER_MIN_CALLS"),
+    LLM_BREAKER_FAILURE_RATE=config.get("LLM_BREAKER_FAILURE_RATE"),
+    LLM_BREAKER_CONSECUTIVE_FAILURES=config.get("LLM_BREAKER_CONSECUTIVE_FAILURES"),
+    LLM_BREAKER_SLOW_CALL_SECONDS=config.get("LLM_BREAKER_SLOW_CALL_SECONDS"),
+    LLM_BREAKER_OPEN_SECONDS=config.get("LLM_BREAKER_OPEN_SECONDS"),
+    LLM_BREAKER_HALF_OPEN_PROBES=config.get("LLM_BREAKER_HALF_OPEN_PROBES"),
+    LLM_DEGRADED_MODE=config.get("LLM_DEGRADED_MODE", "true").lower() in ("1", "true", "yes"),
+    ACTIVITY_LOG_RETENTION_DAYS=int(config.get("ACTIVITY_LOG_RETENTION_DAYS", 90)),
+    ACTIVITY_LOG_ARCHIVE_DIR=config.get("ACTIVITY_LOG_ARCHIVE_DIR", "activity_archive"),
+    TRACE_FILE=config.get("TRACE_FILE", "traces/requests.jsonl"),
+    TRACE_SLOW_REQUEST_SECONDS=float(config.get("TRACE_SLOW_REQUEST_SECONDS", 1.0)),
+    METRICS_TOKEN=config.get("METRICS_TOKEN"),
+    PROMPT_PROFILE=config.get("PROMPT_PROFILE", "detailed"),
+    PLAN_VARIANTS=int(config.get("PLAN_VARIANTS", 1)),
+    PLAN_VARIANTS_MAX=int(config.get("PLAN_VARIANTS_MAX", 4)),
+    PLAN_VARIANT_TTL_SECONDS=int(config.get("PLAN_VARIANT_TTL_SECONDS", 3600)),
+    PROMPT_PROFILES_FILE=config.get("PROMPT_PROFILES_FILE"),
+    RETRIEVAL_SERVICE_URL=config.get("RETRIEVAL_SERVICE_URL"),
+    RETRIEVAL_SERVICE_TIMEOUT=float(config.get("RETRIEVAL_SERVICE_TIMEOUT", 120)),
+    SQL_INSTRUMENTATION=config.get("SQL_INSTRUMENTATION", "true"),
+    SQL_INSTRUMENTATION_HEADERS=config.get("SQL_INSTRUMENTATION_HEADERS", "").lower() in ("1", "true", "yes"),
+    SQL_NPLUSONE_THRESHOLD=int(config.get("SQL_NPLUSONE_THRESHOLD", 5)),
+    SQL_LOG_LEVEL=config.get("SQL_LOG_LEVEL", "INFO"),
+    PASSWORD_HASH_METHOD=config.get("PASSWORD_HASH_METHOD", "scrypt"),
+    PASSWORD_BCRYPT_ROUNDS=int(config.get("PASSWORD_BCRYPT_ROUNDS", 12)),
+    PASSWORD_HASH_WORKERS=int(config.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))),
+    DB_POOL_SIZE=int(config.get("DB_POOL_SIZE", 10)),
+    DB_MAX_OVERFLOW=int(config.get("DB_MAX_OVERFLOW", 20)),
+    DB_POOL_TIMEOUT=float(config.get("DB_POOL_TIMEOUT", 30)),
+    DB_POOL_RECYCLE=int(config.get("DB_POOL_RECYCLE", 1800)),
+    SQLITE_JOURNAL_MODE=config.get("SQLITE_JOURNAL_MODE", "WAL"),
+    SQLITE_SYNCHRONOUS=config.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    SQLITE_BUSY_TIMEOUT=int(config.get("SQLITE_BUSY_TIMEOUT", 5000))
 )
+# Reject oversized request bodies before werkzeug spools them; the exact file limit is enforced while streaming.
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_BYTES'] + 1024 * 1024
 
 if not app.config.get("GOOGLE_API_KEY"):
     print("\n\n" + "="*50); print("FATAL ERROR: GOOGLE_API_KEY not found in .env file or not loaded into app.config."); print(f"Attempted to load .env from: {dotenv_path}"); print("="*50 + "\n\n")
 
 CORS(app, supports_credentials=True, origins=["http://localhost:8501"])
-db.init_app(app); bcrypt = Bcrypt(app); login_manager = LoginManager(); login_manager.init_app(app)
+init_database(app); passwords.init_app(app); rag_setup.init_app(app); login_manager = LoginManager(); login_manager.init_app(app)
+activity_log = ActivityLogWriter(app); init_sql_instrumentation(app); init_tracing(app); admission = AdmissionController(app)
+llm_breaker = CircuitBreaker.from_config("llm", app.config, "LLM_BREAKER"); prompt_profiles = PromptRegistry.from_config(app.config)
 
 @login_manager.user_loader
 def load_user(user_id): return db.session.get(User, int(user_id))
@@ -46,9 +126,10 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def log_activity(action):
-    if current_user.is_authenticated:
-        log_entry = ActivityLog(action=action, user_id=current_user.id); db.session.add(log_entry); db.session.commit()
+def log_activity(action_code, payload=None, plan_id=None, rollup=None):
+    # Audit events are buffered and written off the request path; see ActivityLogWriter. Codes and payload fields are
+    # listed in events.EVENT_TYPES; `rollup` feeds the analytics counters.
+    if current_user.is_authenticated: activity_log.log(current_user.id, action_code, payload=payload, plan_id=plan_id, rollup=rollup, request_id=current_request_id())
 
 # ===============================================
 # ===         AUTHENTICATION ROUTES           ===
@@ -66,21 +147,23 @@ def register():
 def login():
     data = request.json; user = User.query.filter_by(email=data.get('email')).first()
     if user and user.check_password(data.get('password')):
-        login_user(user); log_activity("User logged in")
+        # Transparently upgrade hashes made with an older algorithm or cost while the plaintext is at hand.
+        if user.rehash_password_if_needed(data.get('password')): db.session.commit()
+        login_user(user); log_activity("auth.login")
         return jsonify({"message": "Login successful", "user": {"id": user.id, "email": user.email, "first_name": user.first_name, "role": user.role, "force_password_change": user.force_password_change}}), 200
     return jsonify({"message": "Invalid email or password"}), 401
 
 @app.route('/api/logout', methods=['POST'])
 @login_required
 def logout():
-    log_activity("User logged out"); logout_user(); return jsonify({"message": "Logout successful"}), 200
+    log_activity("auth.logout"); logout_user(); return jsonify({"message": "Logout successful"}), 200
 
 @app.route('/api/change-password', methods=['POST'])
 @login_required
 def change_password():
     data = request.json; new_password = data.get('new_password')
     if not new_password or len(new_password) < 6: return jsonify({"message": "Password must be at least 6 characters long"}), 400
-    current_user.set_password(new_password); current_user.force_password_change = False; db.session.commit(); log_activity("User changed password")
+    current_user.set_password(new_password); current_user.force_password_change = False; db.session.commit(); log_activity("auth.password_change")
     return jsonify({"message": "Password updated successfully"}), 200
 
 # ===============================================
@@ -89,51 +172,131 @@ def change_password():
 @app.route('/api/chatbot/options', methods=['GET'])
 @login_required
 def get_chatbot_options():
-    options = {"age_cohorts": {}, "play_types": {}}
-    age_cohorts = AgeCohort.query.order_by(AgeCohort.id).all()
-    domains = Domain.query.order_by(Domain.id).all()
-    for ac in age_cohorts:
-        options["age_cohorts"][ac.name] = {}
-        for d in domains:
-            components = Component.query.filter_by(age_cohort_id=ac.id, domain_id=d.id).all()
-            if components:
-                options["age_cohorts"][ac.name][d.name] = [c.name for c in components]
-                key = f"{ac.id}-{d.id}"
-                valid_play_types = PlayType.query.join(PlayType.age_cohorts).join(PlayType.domains).filter(AgeCohort.id == ac.id, Domain.id == d.id).all()
-                options["play_types"][key] = [pt.to_dict() for pt in valid_play_types]
-    return jsonify(options)
+    snapshot = get_curriculum_snapshot()
+    response = current_app.response_class(snapshot.body, mimetype='application/json'); response.set_etag(snapshot.etag)
+    return response.make_conditional(request)
     
+def serve_degraded(data, play_type_name, error):
+    """While the LLM circuit is open: the best stored guide for the same selections, marked as such, or a fast 503."""
+    fallback = best_stored_guide(data.get('age_cohort'), data.get('subject'), data.get('sub_domain'), play_type_name) if current_app.config['LLM_DEGRADED_MODE'] else None
+    if fallback is None:
+        GENERATIONS.inc(outcome="unavailable"); return jsonify({"error": f"The plan generator is temporarily unavailable. Please try again in {error.retry_after} seconds.", "retry_after": error.retry_after}), 503, {"Retry-After": str(error.retry_after)}
+    GENERATIONS.inc(outcome="degraded"); log_activity("plan.fallback", {"age_cohort": data.get('age_cohort'), "domain": data.get('subject'), "component": data.get('sub_domain'), "play_type": play_type_name, "source": fallback["source"]})
+    return jsonify({**fallback["guide"], "degraded": {"source": fallback["source"], "score": fallback["score"], "retry_after": error.retry_after}})
+
 @app.route('/api/generate-plan', methods=['POST'])
 @login_required
 def generate_plan_endpoint():
     data = request.json; play_type_obj = data.get('play_type', {})
     play_type_name = play_type_obj.get('name', 'Not specified'); play_type_context = play_type_obj.get('context', 'Standard')
-    api_key = current_app.config.get('GOOGLE_API_KEY')
-    guide_data_dict = generate_teacher_guide(
-        data.get('age_cohort'), data.get('subject'), data.get('sub_domain'), play_type_name, play_type_context, api_key=api_key
-    )
-    if "error" in guide_data_dict or not guide_data_dict.get('guide_title'):
-        error_message = guide_data_dict.get("error", "The LLM returned an empty or invalid plan. Please try again.")
-        return jsonify({"error": error_message}), 500
-    log_activity(f"Generated RAG plan for {data.get('age_cohort')}, '{data.get('sub_domain')}'"); return jsonify(guide_data_dict)
+    api_key = current_app.config.get('GOOGLE_API_KEY'); stats = {}
+    try: profile = prompt_profiles.get(data.get('prompt_profile'))
+    except UnknownPromptProfile as e: return jsonify({"error": str(e)}), 400
+    try: variants = max(1, min(int(data.get('variants') or current_app.config['PLAN_VARIANTS']), current_app.config['PLAN_VARIANTS_MAX'], admission.max_concurrency))
+    except (TypeError, ValueError): return jsonify({"error": "'variants' must be a whole number"}), 400
+    try:
+        # The breaker admits the call (claiming the probe while half-open) before the request takes a rate-limit token or a slot;
+        # it only measures the model call itself, inside generate_teacher_guides. A call refused by admission is given back.
+        # Per-user token bucket plus a global, fairly shared cap on in-flight LLM calls; see admission.py. Each variant is one more call.
+        queued_at = time.perf_counter()
+        with llm_breaker.admit() as llm_call, admission.generation_slot(current_user.id, current_user.role, cost=variants):
+            record_stage("admission_wait", time.perf_counter() - queued_at)
+            result = generate_teacher_guides(
+                data.get('age_cohort'), data.get('subject'), data.get('sub_domain'), play_type_name, play_type_context, api_key=api_key,
+                timeout=current_app.config['LLM_TIMEOUT_SECONDS'], max_retries=current_app.config['LLM_MAX_RETRIES'], profile=profile, stats=stats, variants=variants,
+                llm_call=llm_call
+            )
+    except AdmissionRejected as e:
+        GENERATIONS.inc(outcome="rate_limited"); return jsonify({"error": e.message, "retry_after": e.retry_after}), 429, {"Retry-After": str(e.retry_after)}
+    except CircuitOpen as e:
+        return serve_degraded(data, play_type_name, e)
+    guides = [guide for guide in result.get("guides", []) if guide.get('guide_title')]  # any valid variant will do, not only the first
+    if not guides:
+        error_message = result.get("error", "The LLM returned an empty or invalid plan. Please try again.")
+        GENERATIONS.inc(outcome="failed"); return jsonify({"error": error_message}), 500
+    GENERATIONS.inc(outcome="generated")
+    log_activity("plan.generate", {"age_cohort": data.get('age_cohort'), "domain": data.get('subject'), "component": data.get('sub_domain'), "play_type": play_type_name, **stats, "variants": len(guides)},
+                 rollup=generation_event(data.get('age_cohort'), data.get('subject'), data.get('sub_domain'), play_type_name))
+    # The other variants wait server-side for /api/generate-plan/next-variant; a new generation replaces any earlier batch.
+    previous = (session.pop('plan_variants', None) or {}).get("batch"); ttl_seconds = current_app.config['PLAN_VARIANT_TTL_SECONDS']
+    if len(guides) < 2:
+        discard_batch(current_user.id, previous, ttl_seconds=ttl_seconds); return jsonify(guides[0]), 200, {"X-Prompt-Profile": profile.key}
+    selections = {"age": data.get('age_cohort'), "domain": data.get('subject'), "sub_domain": data.get('sub_domain'), "play_type": play_type_obj}
+    batch = new_batch(current_user.id, profile.key, selections, guides, previous=previous, ttl_seconds=ttl_seconds)
+    session['plan_variants'] = {"batch": batch, "profile": profile.key}
+    return jsonify({**guides[0], "variants": {"remaining": len(guides) - 1}}), 200, {"X-Prompt-Profile": profile.key}
+
+@app.route('/api/generate-plan/next-variant', methods=['POST'])
+@login_required
+def next_plan_variant():
+    """Rejects the variant on screen (recorded as negative feedback) and serves the next stored variant of the same generation."""
+    state = session.get('plan_variants'); no_more = {"error": "There are no other versions of this plan. Generate a new one instead.", "variants": {"remaining": 0}}
+    if not state: return jsonify(no_more), 404
+    guide, selections, feedback, left = next_variant(current_user.id, state["batch"], state["profile"], ttl_seconds=current_app.config['PLAN_VARIANT_TTL_SECONDS'])
+    if feedback is not None:
+        log_activity("feedback.submit", {"rating": -1, "feedback_id": feedback.id, "source": "variant"}, rollup=rating_event(feedback.selections, -1))
+    if guide is None: session.pop('plan_variants', None); return jsonify(no_more), 404
+    GENERATIONS.inc(outcome="variant")
+    play_type = selections.get('play_type') or {}
+    log_activity("plan.variant", {"age_cohort": selections.get('age'), "domain": selections.get('domain'), "component": selections.get('sub_domain'),
+                                  "play_type": play_type.get('name') if isinstance(play_type, dict) else play_type, "prompt_profile": state["profile"], "remaining": left})
+    return jsonify({**guide, "variants": {"remaining": left}}), 200, {"X-Prompt-Profile": state["profile"]}
 
 @app.route('/api/my-plans', methods=['GET', 'POST'])
 @login_required
+@conditional("plans:{user_id}")
 def handle_plans():
     if request.method == 'GET':
-        plans = Plan.query.filter_by(user_id=current_user.id).order_by(Plan.created_at.desc()).all()
-        return jsonify([{"id": p.id, "title": p.title, "content": p.content, "age_cohort": p.age_cohort, "subject": p.subject, "play_type": p.play_type, "created_at": p.created_at.strftime('%Y-%m-%d %H:%M')} for p in plans])
+        try: return jsonify(list_plans_page(current_user.id, cursor=request.args.get('cursor'), limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)))
+        except InvalidCursor as e: return jsonify({"message": str(e)}), 400
     if request.method == 'POST':
-        data = request.json; new_plan = Plan(title=data.get('title', 'Untitled Plan'), content=data['content'], age_cohort=data['age_cohort'], subject=data['subject'], play_type=data['play_type'], user_id=current_user.id)
-        db.session.add(new_plan); db.session.commit(); log_activity(f"Saved plan '{new_plan.title}'"); return jsonify({"message": "Plan saved", "plan_id": new_plan.id}), 201
+        # Either the structured guide (rendered on read) or, for hand-edited plans, the markdown itself; both go to guide storage.
+        data = request.json
+        if isinstance(data.get('guide'), dict): document = data['guide']; selections = data.get('selections')
+        elif data.get('content'): document = {MARKDOWN_KEY: data['content']}; selections = None
+        else: return jsonify({"message": "A plan needs either 'guide' or 'content'"}), 400
+        if selections is not None and not isinstance(selections, dict): return jsonify({"message": "'selections' must be an object"}), 400
+        guide_id = store_document(document); store_search_text(db.session, [guide_id])  # indexed by plan search when the plan row is inserted
+        new_plan = Plan(title=data.get('title', 'Untitled Plan'), content="", guide_id=guide_id, selections=selections, age_cohort=data['age_cohort'], subject=data['subject'], play_type=data['play_type'], user_id=current_user.id)
+        db.session.add(new_plan); db.session.commit(); log_activity("plan.save", {"title": new_plan.title}, plan_id=new_plan.id); return jsonify({"message": "Plan saved", "plan_id": new_plan.id}), 201
+
+@app.route('/api/my-plans/search', methods=['GET'])
+@login_required
+@conditional("plans:{user_id}")
+def handle_plan_search():
+    args = request.args
+    return jsonify(search_plans(current_user.id, args.get('q', ''), age_cohort=args.get('age_cohort') or None, subject=args.get('subject') or None,
+                                page=args.get('page', 1, type=int), limit=args.get('limit', DEFAULT_PAGE_SIZE, type=int)))
+
+def _export_response(export_format, filters, after_id, max_id, with_author, file_stem):
+    """Streams the selected plans as a ZIP of markdown files or as JSON Lines; see export.py for resuming."""
+    max_id, count = export_bounds(filters, after_id, max_id)
+    log_activity("plan.export", {"count": count, "format": export_format, "filters": {k: str(v) for k, v in filters.items()}, "after_id": after_id})
+    rows = iter_export_rows(filters, after_id, max_id, with_author=with_author)
+    body = stream_zip(rows, with_author) if export_format == 'zip' else stream_jsonl(rows, with_author)
+    file_name = f"{file_stem}-{datetime.datetime.utcnow():%Y%m%d}{f'-after-{after_id}' if after_id else ''}.{export_format}"
+    headers = {"Content-Disposition": f"attachment; filename={file_name}", "X-Export-Max-Id": str(max_id), "X-Export-Count": str(count), "Cache-Control": "no-store"}
+    return current_app.response_class(stream_with_context(body), mimetype="application/zip" if export_format == 'zip' else "application/x-ndjson", headers=headers)
 
-@app.route('/api/plans/<int:plan_id>', methods=['DELETE'])
+@app.route('/api/my-plans/export', methods=['GET'])
 @login_required
-def delete_plan(plan_id):
+def export_my_plans():
+    try: export_format, filters, after_id, max_id = parse_export_args(request.args)
+    except InvalidExportRequest as e: return jsonify({"message": str(e)}), 400
+    return _export_response(export_format, {**filters, "user_id": current_user.id}, after_id, max_id, with_author=False, file_stem="my-plans")
+
+@app.route('/api/plans/<int:plan_id>', methods=['GET', 'DELETE'])
+@login_required
+@conditional("plans:{user_id}")
+def handle_plan_item(plan_id):
     plan = db.session.get(Plan, plan_id)
     if not plan: return jsonify({"message": "Plan not found"}), 404
     if plan.user_id != current_user.id: return jsonify({"message": "Unauthorized"}), 403
-    db.session.delete(plan); db.session.commit(); log_activity(f"Deleted plan ID {plan_id}"); return jsonify({"message": "Plan deleted"}), 200
+    if request.method == 'GET':
+        document = load_document(plan.guide_id) if plan.guide_id else None
+        guide = document if document and MARKDOWN_KEY not in document else None
+        return jsonify({**plan_metadata(plan), "content": plan_markdown(plan), "guide": guide, "selections": plan.selections})
+    db.session.delete(plan); db.session.commit(); log_activity("plan.delete", {"plan_id": plan_id}); return jsonify({"message": "Plan deleted"}), 200
 
 @app.route('/api/feedback', methods=['POST'])
 @login_required
@@ -141,9 +304,9 @@ def handle_feedback():
     data = request.json
     if 'rating' not in data or 'selections' not in data or 'generated_output' not in data:
         return jsonify({"message": "Missing required feedback data"}), 400
-    new_feedback = FeedbackLog(rating=data['rating'], selections=data['selections'], generated_output=data['generated_output'], user_id=current_user.id)
+    new_feedback = FeedbackLog(rating=data['rating'], selections=data['selections'], guide_id=store_document(data['generated_output']), generated_output=None, user_id=current_user.id)  # JSON null: the output lives in guide storage
     db.session.add(new_feedback); db.session.commit()
-    log_activity(f"Submitted feedback (Rating: {data['rating']})")
+    log_activity("feedback.submit", {"rating": data['rating'], "feedback_id": new_feedback.id}, rollup=rating_event(data['selections'], data['rating']))
     return jsonify({"message": "Feedback submitted successfully"}), 201
 
 # ===============================================
@@ -151,19 +314,120 @@ def handle_feedback():
 # ===============================================
 @app.route('/api/admin/users', methods=['GET'])
 @admin_required
+@conditional("users")
 def get_all_users():
-    return jsonify([{"id": u.id, "first_name": u.first_name, "last_name": u.last_name, "email": u.email, "role": u.role} for u in User.query.all()])
+    return jsonify(serialize_users())
 
 @app.route('/api/admin/activity-logs', methods=['GET'])
 @admin_required
+@conditional("activity_logs", "users")
 def get_activity_logs():
-    logs = db.session.query(ActivityLog, User.email).join(User, ActivityLog.user_id == User.id).order_by(ActivityLog.timestamp.desc()).limit(100).all()
-    return jsonify([{"id": log.id, "action": log.action, "timestamp": log.timestamp.strftime('%Y-%m-%d %H:%M:%S'), "user_email": email} for log, email in logs])
+    try: return jsonify(activity_log_page(request.args))
+    except InvalidCursor as e: return jsonify({"message": str(e)}), 400
+
+def activity_log_page(args):
+    # Newest first with a (timestamp, id) keyset cursor: every page is an index range scan, however long the history.
+    limit = max(1, min(args.get('limit', 100, type=int), 500))
+    query = db.session.query(ActivityLog, User.email).join(User, ActivityLog.user_id == User.id)
+    if args.get('user_id'): query = query.filter(ActivityLog.user_id == args.get('user_id', type=int))
+    if args.get('action_code'): query = query.filter(ActivityLog.action_code == args['action_code'])
+    if args.get('cursor'):
+        timestamp, log_id = decode_cursor(args['cursor'])
+        query = query.filter(or_(ActivityLog.timestamp < timestamp, and_(ActivityLog.timestamp == timestamp, ActivityLog.id < log_id)))
+    logs = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(limit + 1).all()
+    events = [{"id": log.id, "action": describe_event(log.action_code, log.payload, log.action), "action_code": log.action_code, "payload": log.payload,
+               "plan_id": log.plan_id, "request_id": log.request_id, "timestamp": log.timestamp.strftime('%Y-%m-%d %H:%M:%S'), "user_email": email} for log, email in logs[:limit]]
+    return {"events": events, "next_cursor": encode_cursor(logs[limit - 1][0].timestamp, logs[limit - 1][0].id) if len(logs) > limit else None}
+
+@app.route('/api/admin/bootstrap', methods=['GET'])
+@admin_required
+@conditional("users", "curriculum", "resources")
+def get_admin_bootstrap():
+    """
+    Every collection the admin panel shows, in one response: the same bodies as the individual collection endpoints.
+    The activity feed is not included: it changes with every request, which would invalidate this ETag each time.
+    """
+    return jsonify({"users": serialize_users(), "age_cohorts": serialize_named(AgeCohort), "domains": serialize_named(Domain),
+                    "play_types": serialize_play_types(), "components": serialize_components(), "resources": serialize_resources()})
+
+@app.route('/api/admin/plans/export', methods=['GET'])
+@admin_required
+def export_all_plans():
+    # Every teacher's plans (or one teacher's with ?user_id=), one folder per teacher in the ZIP.
+    try: export_format, filters, after_id, max_id = parse_export_args(request.args)
+    except InvalidExportRequest as e: return jsonify({"message": str(e)}), 400
+    return _export_response(export_format, filters, after_id, max_id, with_author=True, file_stem="all-plans")
+
+# --- Analytics (read only the rollup tables; see analytics.py) ---
+@app.route('/api/admin/analytics/usage', methods=['GET'])
+@admin_required
+@conditional("analytics")
+def get_usage_analytics():
+    group_by = [name for name in request.args.get('group_by', ','.join(DIMENSIONS)).split(',') if name]
+    if not group_by or any(name not in DIMENSIONS for name in group_by):
+        return jsonify({"message": f"group_by must be a comma-separated subset of {', '.join(DIMENSIONS)}"}), 400
+    try: start, end = parse_range(request.args.get('from'), request.args.get('to'))
+    except ValueError as e: return jsonify({"message": f"Invalid date range: {e}"}), 400
+    return jsonify({"from": start.isoformat(), "to": end.isoformat(), "group_by": group_by, "rows": usage_summary(start, end, group_by)})
+
+@app.route('/api/admin/analytics/daily', methods=['GET'])
+@admin_required
+@conditional("analytics")
+def get_daily_analytics():
+    try: start, end = parse_range(request.args.get('from'), request.args.get('to'))
+    except ValueError as e: return jsonify({"message": f"Invalid date range: {e}"}), 400
+    if (end - start).days >= 366: return jsonify({"message": "The daily series covers at most 366 days"}), 400
+    return jsonify({"from": start.isoformat(), "to": end.isoformat(), "days": daily_summary(start, end)})
+
+@REGISTRY.collector
+def _generation_gauges():
+    circuit = llm_breaker.snapshot()["state"]
+    return ["# HELP ltp_llm_circuit_state 1 for the LLM circuit breaker's current state.", "# TYPE ltp_llm_circuit_state gauge",
+            *(f'ltp_llm_circuit_state{{state="{state}"}} {int(state == circuit)}' for state in ("closed", "half_open", "open")),
+            "# HELP ltp_generations_in_flight Generations currently holding an admission slot.", "# TYPE ltp_generations_in_flight gauge",
+            f"ltp_generations_in_flight {admission.state.in_flight()}",
+            "# HELP ltp_generations_queued Generation requests waiting for a slot in this worker.", "# TYPE ltp_generations_queued gauge",
+            f"ltp_generations_queued {sum(admission.queued().values())}",
+            "# HELP ltp_activity_log_dropped_total Activity events dropped by the buffered writer.", "# TYPE ltp_activity_log_dropped_total counter",
+            f"ltp_activity_log_dropped_total {activity_log.dropped}"]
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics. With METRICS_TOKEN set, scrapers must send it as a bearer token."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}": return jsonify({"message": "Unauthorized"}), 401
+    return REGISTRY.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route('/api/admin/generation-status', methods=['GET'])
+@admin_required
+def get_generation_status():
+    """LLM circuit breaker and admission state of the worker that serves the request."""
+    return jsonify({"circuit": llm_breaker.snapshot(), "degraded_mode": current_app.config['LLM_DEGRADED_MODE'], "pid": os.getpid(),
+                    "admission": {"in_flight": admission.state.in_flight(), "max_concurrency": admission.max_concurrency,
+                                  "queued": sum(admission.queued().values())}})
+
+@app.route('/api/admin/prompt-profiles', methods=['GET'])
+@admin_required
+def get_prompt_profiles():
+    """The configured prompt profiles with this worker's per-profile LLM calls, mean tokens and mean latency."""
+    tokens = LLM_TOKENS.totals(); seconds = LLM_SECONDS.totals(); profiles = prompt_profiles.describe()
+    for p in profiles:
+        total, calls = seconds.get((p["key"],), (0.0, 0)); prompt = tokens.get(("prompt", p["key"]), (0, 0)); completion = tokens.get(("completion", p["key"]), (0, 0))
+        p["stats"] = {"calls": calls, "mean_llm_ms": round(total * 1000 / calls) if calls else None,
+                      "mean_prompt_tokens": round(prompt[0] / prompt[1]) if prompt[1] else None, "mean_completion_tokens": round(completion[0] / completion[1]) if completion[1] else None}
+    return jsonify({"default": prompt_profiles.default, "pid": os.getpid(), "profiles": profiles})
+
+def _deleted_body(obj, component_ids=None):
+    """DELETE responses carry the removed entity (and the components its cascade removed) so clients can patch their copies."""
+    body = {"message": "Deleted", "deleted": obj.to_dict()}
+    if component_ids is not None: body["deleted_component_ids"] = component_ids
+    return body
 
 @app.route('/api/admin/age-cohorts', methods=['GET', 'POST'])
 @admin_required
+@conditional("curriculum")
 def handle_age_cohorts_collection():
-    if request.method == 'GET': return jsonify([ac.to_dict() for ac in AgeCohort.query.order_by(AgeCohort.id).all()])
+    if request.method == 'GET': return jsonify(serialize_named(AgeCohort))
     if request.method == 'POST':
         data = request.json; name = data.get('name')
         if not name: return jsonify({"message": "Name is required"}), 400
@@ -176,12 +440,14 @@ def handle_age_cohort_item(ac_id):
     if not ac: return jsonify({"message": "Not Found"}), 404
     if request.method == 'PUT': data = request.json; ac.name = data.get('name', ac.name); db.session.commit(); return jsonify(ac.to_dict())
     if request.method == 'DELETE':
-        log_activity(f"Admin deleted Age Cohort: {ac.name}"); db.session.delete(ac); db.session.commit(); return jsonify({"message": "Deleted"}), 200
+        deleted = _deleted_body(ac, [c.id for c in ac.components])
+        log_activity("curriculum.delete", {"kind": "Age Cohort", "name": ac.name}); db.session.delete(ac); db.session.commit(); return jsonify(deleted), 200
 
 @app.route('/api/admin/domains', methods=['GET', 'POST'])
 @admin_required
+@conditional("curriculum")
 def handle_domains_collection():
-    if request.method == 'GET': return jsonify([d.to_dict() for d in Domain.query.order_by(Domain.id).all()])
+    if request.method == 'GET': return jsonify(serialize_named(Domain))
     if request.method == 'POST':
         data = request.json; name = data.get('name')
         if not name: return jsonify({"message": "Name is required"}), 400
@@ -194,12 +460,14 @@ def handle_domain_item(d_id):
     if not d: return jsonify({"message": "Not Found"}), 404
     if request.method == 'PUT': data = request.json; d.name = data.get('name', d.name); db.session.commit(); return jsonify(d.to_dict())
     if request.method == 'DELETE':
-        log_activity(f"Admin deleted Domain: {d.name}"); db.session.delete(d); db.session.commit(); return jsonify({"message": "Deleted"}), 200
+        deleted = _deleted_body(d, [c.id for c in d.components])
+        log_activity("curriculum.delete", {"kind": "Domain", "name": d.name}); db.session.delete(d); db.session.commit(); return jsonify(deleted), 200
 
 @app.route('/api/admin/play-types', methods=['GET', 'POST'])
 @admin_required
+@conditional("curriculum")
 def handle_play_types_collection():
-    if request.method == 'GET': return jsonify([pt.to_dict() for pt in PlayType.query.order_by(PlayType.id).all()])
+    if request.method == 'GET': return jsonify(serialize_play_types())
     if request.method == 'POST':
         data = request.json
         if not all([data.get('name'), data.get('context')]): return jsonify({"message": "Name and context are required"}), 400
@@ -221,12 +489,14 @@ def handle_play_type_item(pt_id):
         pt.age_cohorts = age_cohorts; pt.domains = domains
         db.session.commit(); return jsonify(pt.to_dict())
     if request.method == 'DELETE':
-        log_activity(f"Admin deleted Play Type: {pt.name}"); db.session.delete(pt); db.session.commit(); return jsonify({"message": "Deleted"}), 200
+        deleted = _deleted_body(pt)
+        log_activity("curriculum.delete", {"kind": "Play Type", "name": pt.name}); db.session.delete(pt); db.session.commit(); return jsonify(deleted), 200
         
 @app.route('/api/admin/components', methods=['GET', 'POST'])
 @admin_required
+@conditional("curriculum")
 def handle_components_collection():
-    if request.method == 'GET': return jsonify([c.to_dict() for c in Component.query.order_by(Component.id).all()])
+    if request.method == 'GET': return jsonify(serialize_components())
     if request.method == 'POST':
         data = request.json
         if not all([data.get('name'), data.get('age_cohort_id'), data.get('domain_id')]): return jsonify({"message": "All fields are required"}), 400
@@ -240,61 +510,176 @@ def handle_component_item(c_id):
     if not c: return jsonify({"message": "Not Found"}), 404
     if request.method == 'PUT': data = request.json; c.name = data.get('name', c.name); db.session.commit(); return jsonify(c.to_dict())
     if request.method == 'DELETE':
-        log_activity(f"Admin deleted Component: {c.name}"); db.session.delete(c); db.session.commit(); return jsonify({"message": "Deleted"}), 200
+        deleted = _deleted_body(c)
+        log_activity("curriculum.delete", {"kind": "Component", "name": c.name}); db.session.delete(c); db.session.commit(); return jsonify(deleted), 200
+
+# --- Bulk curriculum writes: validate every item first, then insert all of them in one transaction ---
+def _batch_items():
+    """Returns the JSON array posted to a :batch endpoint, or None if the body is not a non-empty list."""
+    items = request.get_json(silent=True)
+    return items if isinstance(items, list) and items and all(isinstance(i, dict) for i in items) else None
+
+def _is_name(value): return isinstance(value, str) and bool(value.strip())
+def _is_id(value): return isinstance(value, int) and not isinstance(value, bool)
+def _is_id_list(value): return isinstance(value, list) and all(_is_id(v) for v in value)
+
+def _batch_response(created, label, serialize):
+    db.session.add_all(created); db.session.flush(); ids = [obj.id for obj in created]; db.session.commit()
+    log_activity("curriculum.bulk_add", {"count": len(created), "kind": label})
+    return jsonify({"ids": ids, "items": serialize(ids)}), 201
+
+def _batch_errors(errors):
+    return jsonify({"message": "Validation failed; nothing was saved.", "errors": errors}), 400
+
+def _batch_named(model, label):
+    items = _batch_items()
+    if items is None: return jsonify({"message": "Expected a non-empty JSON array"}), 400
+    names = [i['name'].strip() if _is_name(i.get('name')) else None for i in items]
+    existing = {n for (n,) in db.session.query(model.name).filter(model.name.in_([n for n in names if n]))}
+    errors = []; seen = set()
+    for index, name in enumerate(names):
+        if not name: errors.append({"index": index, "message": "Name is required and must be a non-empty string"})
+        elif name in existing or name in seen: errors.append({"index": index, "message": f"'{name}' already exists"})
+        seen.add(name)
+    if errors: return _batch_errors(errors)
+    return _batch_response([model(name=name) for name in names], label, lambda ids: [o.to_dict() for o in model.query.filter(model.id.in_(ids)).order_by(model.id)])
+
+@app.route('/api/admin/age-cohorts:batch', methods=['POST'])
+@admin_required
+def batch_create_age_cohorts(): return _batch_named(AgeCohort, "age cohorts")
+
+@app.route('/api/admin/domains:batch', methods=['POST'])
+@admin_required
+def batch_create_domains(): return _batch_named(Domain, "domains")
+
+@app.route('/api/admin/components:batch', methods=['POST'])
+@admin_required
+def batch_create_components():
+    items = _batch_items()
+    if items is None: return jsonify({"message": "Expected a non-empty JSON array"}), 400
+    ac_ids = {ac_id for (ac_id,) in db.session.query(AgeCohort.id).filter(AgeCohort.id.in_([i.get('age_cohort_id') for i in items if _is_id(i.get('age_cohort_id'))]))}
+    d_ids = {d_id for (d_id,) in db.session.query(Domain.id).filter(Domain.id.in_([i.get('domain_id') for i in items if _is_id(i.get('domain_id'))]))}
+    errors = []
+    for index, item in enumerate(items):
+        if not all([item.get('name'), item.get('age_cohort_id'), item.get('domain_id')]): errors.append({"index": index, "message": "All fields are required"})
+        elif not _is_name(item['name']): errors.append({"index": index, "message": "Name must be a non-empty string"})
+        elif not (_is_id(item['age_cohort_id']) and _is_id(item['domain_id'])): errors.append({"index": index, "message": "age_cohort_id and domain_id must be integers"})
+        elif item['age_cohort_id'] not in ac_ids: errors.append({"index": index, "message": f"Unknown age cohort {item['age_cohort_id']}"})
+        elif item['domain_id'] not in d_ids: errors.append({"index": index, "message": f"Unknown domain {item['domain_id']}"})
+    if errors: return _batch_errors(errors)
+    return _batch_response([Component(name=i['name'].strip(), age_cohort_id=i['age_cohort_id'], domain_id=i['domain_id']) for i in items], "components", serialize_components)
+
+@app.route('/api/admin/play-types:batch', methods=['POST'])
+@admin_required
+def batch_create_play_types():
+    items = _batch_items()
+    if items is None: return jsonify({"message": "Expected a non-empty JSON array"}), 400
+    errors = []
+    for index, item in enumerate(items):
+        if not (_is_name(item.get('name')) and _is_name(item.get('context'))): errors.append({"index": index, "message": "Name and context are required and must be non-empty strings"})
+        if not isinstance(item.get('description', ''), str): errors.append({"index": index, "message": "Description must be a string"})
+        if not (_is_id_list(item.get('age_cohort_ids', [])) and _is_id_list(item.get('domain_ids', []))): errors.append({"index": index, "message": "age_cohort_ids and domain_ids must be lists of integers"})
+    if errors: return _batch_errors(errors)
+    age_cohorts = {ac.id: ac for ac in AgeCohort.query.filter(AgeCohort.id.in_({i for item in items for i in item.get('age_cohort_ids', [])}))}
+    domains = {d.id: d for d in Domain.query.filter(Domain.id.in_({i for item in items for i in item.get('domain_ids', [])}))}
+    for index, item in enumerate(items):
+        unknown = [i for i in item.get('age_cohort_ids', []) if i not in age_cohorts] + [i for i in item.get('domain_ids', []) if i not in domains]
+        if unknown: errors.append({"index": index, "message": f"Unknown age cohort or domain ids: {unknown}"})
+    if errors: return _batch_errors(errors)
+    created = [PlayType(name=i['name'], description=i.get('description', ''), context=i['context'],
+        age_cohorts=[age_cohorts[a] for a in i.get('age_cohort_ids', [])], domains=[domains[d] for d in i.get('domain_ids', [])]) for i in items]
+    return _batch_response(created, "play types", serialize_play_types)
+
+# --- Whole-curriculum import / export (JSON or CSV) ---
+@app.route('/api/admin/curriculum/export', methods=['GET'])
+@admin_required
+@conditional("curriculum")
+def export_curriculum_endpoint():
+    doc = export_curriculum()
+    if request.args.get('format') == 'csv':
+        return current_app.response_class(curriculum_to_csv(doc), mimetype='text/csv', headers={"Content-Disposition": "attachment; filename=curriculum.csv"})
+    return jsonify(doc)
+
+@app.route('/api/admin/curriculum/import', methods=['POST'])
+@admin_required
+def import_curriculum_endpoint():
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        upload = request.files.get('file')
+        if upload:
+            text = upload.read().decode('utf-8-sig')
+            doc = curriculum_from_csv(text) if upload.filename.lower().endswith('.csv') else json.loads(text)
+        else: doc = request.get_json(silent=True)
+        diff = import_curriculum(doc, dry_run=dry_run)
+    except CurriculumImportError as e: return jsonify({"message": "Validation failed; nothing was imported.", "errors": e.errors}), 400
+    except (ValueError, UnicodeDecodeError) as e: return jsonify({"message": f"Could not parse the uploaded file: {e}"}), 400
+    if not dry_run: log_activity("curriculum.import")
+    return jsonify({"dry_run": dry_run, "diff": diff}), 200
 
 @app.route('/api/admin/resources', methods=['GET', 'POST', 'DELETE'])
 @admin_required
+@conditional("resources", "curriculum")
 def handle_resources():
     if request.method == 'GET':
-        return jsonify([r.to_dict() for r in Resource.query.order_by(Resource.id).all()])
+        return jsonify(serialize_resources())
     if request.method == 'POST':
         title = request.form['title']; resource_type = request.form['resource_type']
         domain_ids = [int(i) for i in request.form.getlist('domain_ids[]')]
         age_cohort_ids = [int(i) for i in request.form.getlist('age_cohort_ids[]')]
-        content_path = ""
+        content_path = ""; content_hash = None
         if resource_type in ['Web Link', 'Text']: content_path = request.form['content_path']
         elif resource_type == 'PDF':
             file = request.files.get('file')
             if not file or not file.filename: return jsonify({"message": "No file uploaded"}), 400
-            upload_folder = 'uploads'; os.makedirs(upload_folder, exist_ok=True)
-            content_path = os.path.join(upload_folder, file.filename); file.save(content_path)
-        
+            try:
+                content_hash, content_path, _ = store_upload(file.stream, current_app.config['UPLOAD_FOLDER'], current_app.config['MAX_UPLOAD_BYTES'], suffix='.pdf')
+            except UploadTooLarge as e: return jsonify({"message": str(e)}), 413
+            existing = Resource.query.filter_by(content_hash=content_hash).first()
+            if existing: return _duplicate_resource_response(existing)
+
         domains = Domain.query.filter(Domain.id.in_(domain_ids)).all()
         age_cohorts = AgeCohort.query.filter(AgeCohort.id.in_(age_cohort_ids)).all()
-        new_resource = Resource(title=title, resource_type=resource_type, content_path=content_path, domains=domains, age_cohorts=age_cohorts)
-        db.session.add(new_resource); db.session.commit()
+        new_resource = Resource(title=title, resource_type=resource_type, content_path=content_path, content_hash=content_hash, domains=domains, age_cohorts=age_cohorts)
+        db.session.add(new_resource)
+        try: db.session.commit()
+        except IntegrityError:
+            # An identical file was committed by a concurrent upload between our lookup and insert.
+            db.session.rollback(); return _duplicate_resource_response(Resource.query.filter_by(content_hash=content_hash).first())
         add_resource_to_vectorstore(
             resource_id=new_resource.id, title=title, content_path=content_path,
             resource_type=resource_type, domain_names=[d.name for d in domains], age_cohort_names=[ac.name for ac in age_cohorts]
         )
-        log_activity(f"Admin uploaded resource: {title}"); return jsonify(new_resource.to_dict()), 201
+        log_activity("resource.upload", {"title": title, "resource_id": new_resource.id}); return jsonify(new_resource.to_dict()), 201
     if request.method == 'DELETE':
         res_id = request.args.get('id'); resource = db.session.get(Resource, res_id)
         if not resource: return jsonify({"message": "Not Found"}), 404
-        db.session.delete(resource); db.session.commit(); log_activity(f"Admin deleted resource: {resource.title}"); return jsonify({"message": "Deleted"}), 200
+        deleted = _deleted_body(resource); db.session.delete(resource); db.session.commit(); log_activity("resource.delete", {"title": resource.title}); return jsonify(deleted), 200
+
+def _duplicate_resource_response(resource):
+    """An identical file is already indexed: reuse its chunks instead of parsing and embedding it again."""
+    log_activity("resource.reupload", {"title": resource.title, "resource_id": resource.id})
+    return jsonify({**resource.to_dict(), "duplicate": True}), 200
 
 # ===============================================
 # ===         APP STARTUP LOGIC               ===
 # ===============================================
 def seed_database():
+    """Seeds each empty curriculum table from initial_data through the bulk import engine; re-running it is a no-op."""
     with app.app_context():
-        if AgeCohort.query.first() is None:
-            print("Seeding Age Cohorts..."); [db.session.add(AgeCohort(**d)) for d in AGE_COHORTS]; db.session.commit()
-        if Domain.query.first() is None:
-            print("Seeding Domains..."); [db.session.add(Domain(**d)) for d in DOMAINS]; db.session.commit()
+        doc = {}
+        if AgeCohort.query.first() is None: doc["age_cohorts"] = [d["name"] for d in AGE_COHORTS]
+        if Domain.query.first() is None: doc["domains"] = [d["name"] for d in DOMAINS]
         if PlayType.query.first() is None:
-            print("Seeding Play Types...")
-            for pt_data in PLAY_TYPES:
-                pt = PlayType(name=pt_data["name"], description=pt_data["description"], context=pt_data["context"])
-                pt.age_cohorts = AgeCohort.query.all(); pt.domains = Domain.query.all()
-                db.session.add(pt)
-            db.session.commit()
+            # Seeded play types are available for every age cohort and domain.
+            all_cohorts = [n for (n,) in db.session.query(AgeCohort.name)] + doc.get("age_cohorts", [])
+            all_domains = [n for (n,) in db.session.query(Domain.name)] + doc.get("domains", [])
+            doc["play_types"] = [{**pt, "age_cohorts": all_cohorts, "domains": all_domains} for pt in PLAY_TYPES]
         if Component.query.first() is None:
-            print("Seeding Components...")
-            for name, ac_name, d_name in COMPONENTS:
-                ac = AgeCohort.query.filter_by(name=ac_name).first(); d = Domain.query.filter_by(name=d_name).first()
-                if ac and d: db.session.add(Component(name=name, age_cohort_id=ac.id, domain_id=d.id))
-            db.session.commit(); print("Components seeded.")
+            doc["components"] = [{"name": name, "age_cohort": ac_name, "domain": d_name} for name, ac_name, d_name in COMPONENTS]
+        if not doc: return
+        print(f"Seeding {', '.join(doc)}...")
+        diff = import_curriculum(doc)
+        print("Curriculum seeded: " + ", ".join(f"{len(v['added'])} {k}" for k, v in diff.items()) + " added.")
 
 def create_admin_user_if_not_exists():
     with app.app_context():
@@ -304,9 +689,32 @@ def create_admin_user_if_not_exists():
             if User.query.filter_by(email=admin_email).first(): return
             admin = User(first_name='Admin', last_name='User', email=admin_email, role='admin', force_password_change=False); admin.set_password(admin_password); db.session.add(admin); db.session.commit(); print(f"Admin '{admin_email}' created.")
 
-if __name__ == '__main__':
+def prepare_database():
+    """Schema upgrade, admin account and curriculum seed. Run once per deployment, not once per worker."""
     with app.app_context():
-        db.create_all()
+        upgrade_schema(); migrate_plan_storage(); migrate_activity_log(); backfill_rollups()
     create_admin_user_if_not_exists()
     seed_database()
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Upgrades the schema and seeds the database (used by gunicorn.conf.py before workers start)."""
+    prepare_database()
+
+@app.cli.command("archive-activity")
+@click.option("--days", type=int, default=None, help="Keep this many days in the database (default ACTIVITY_LOG_RETENTION_DAYS).")
+def archive_activity_command(days):
+    """Moves activity log rows past the retention period into compressed monthly archive files. Safe to run from cron."""
+    with app.app_context():
+        archive_activity_logs(app.config['ACTIVITY_LOG_ARCHIVE_DIR'], app.config['ACTIVITY_LOG_RETENTION_DAYS'] if days is None else days)
+
+@app.cli.command("rebuild-analytics")
+def rebuild_analytics_command():
+    """Recomputes the rating and activity rollups from the raw logs (e.g. after events were dropped under load)."""
+    with app.app_context():
+        feedback_rows, days = rebuild_rollups()
+    print(f"Rebuilt analytics rollups from {feedback_rows} feedback rows and {days} days of activity.")
+
+if __name__ == '__main__':
+    prepare_database()
     app.run(port=5001, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# ==============================================================================
+# ===                      CIRCUIT BREAKER FOR THE LLM                       ===
+# ==============================================================================
+# The breaker records the outcome of the last `window` calls. A call is bad if it failed or took longer
+# than `slow_call_seconds`. The circuit OPENS when at least `min_calls` are recorded and the share of
+# bad calls reaches `failure_rate`, or when the last `consecutive_failures` calls were all bad (so a
+# sudden outage is caught even when the window is still full of healthy calls). While open, calls are
+# refused at once with CircuitOpen instead of waiting for the provider to time out. After `open_seconds` it turns HALF-OPEN and lets up to `half_open_probes`
+# calls through. If a probe succeeds the circuit CLOSES and the window starts afresh; if it fails the
+# circuit opens again for another `open_seconds`.
+# State is per process, like the in-process admission state: each gunicorn worker learns about an
+# outage from its own calls.
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpen(Exception):
+    """Raised when the circuit refuses a call; `retry_after` is the seconds until it will probe again."""
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable"); self.retry_after = max(1, int(retry_after + 0.999))
+
+class AdmittedCall:
+    """A call admitted by CircuitBreaker.admit()."""
+    def __init__(self, breaker): self.breaker = breaker; self.measured = False
+
+    @contextmanager
+    def measure(self):
+        """`with call.measure() as outcome: ...` records the block as a failure if it raises or sets outcome["ok"] = False, and times only the block."""
+        if self.measured: raise RuntimeError("an admitted call is measured once")
+        self.measured = True; outcome = {"ok": True, "error": None}; start = time.monotonic()
+        try: yield outcome
+        except Exception as e:
+            outcome.update(ok=False, error=str(e)); raise
+        finally: self.breaker.record(outcome["ok"], time.monotonic() - start, outcome["error"])
+
+class CircuitBreaker:
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, consecutive_failures=5, slow_call_seconds=30.0, open_seconds=30.0, half_open_probes=1):
+        self.name = name; self.window = window; self.min_calls = min_calls; self.failure_rate = failure_rate; self.consecutive_failures = consecutive_failures
+        self.slow_call_seconds = slow_call_seconds; self.open_seconds = open_seconds; self.half_open_probes = half_open_probes
+        self._lock = threading.Lock(); self._outcomes = deque(maxlen=window)  # True for a bad call
+        self._state = CLOSED; self._opened_at = 0.0; self._probes = 0; self._streak = 0; self._changed_at = time.time(); self._rejected = 0; self._last_error = None
+
+    @classmethod
+    def from_config(cls, name, config, prefix):
+        """Builds a breaker from <prefix>_WINDOW, _MIN_CALLS, _FAILURE_RATE, _CONSECUTIVE_FAILURES, _SLOW_CALL_SECONDS, _OPEN_SECONDS and _HALF_OPEN_PROBES."""
+        keys = {"window": int, "min_calls": int, "failure_rate": float, "consecutive_failures": int, "slow_call_seconds": float, "open_seconds": float, "half_open_probes": int}
+        return cls(name, **{key: cast(config[f"{prefix}_{key.upper()}"]) for key, cast in keys.items() if config.get(f"{prefix}_{key.upper()}") is not None})
+
+    def _transition(self, state):
+        if state != self._state:
+            print(f"Circuit '{self.name}': {self._state} -> {state}"); self._state = state; self._changed_at = time.time()
+        if state == OPEN: self._opened_at = time.monotonic(); self._probes = 0
+        if state == CLOSED: self._outcomes.clear(); self._probes = 0; self._streak = 0
+
+    def before_call(self):
+        """Admits a call or raises CircuitOpen. Every admitted call must be followed by record() or, if it never reached the provider, cancel()."""
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0: self._rejected += 1; raise CircuitOpen(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes: self._rejected += 1; raise CircuitOpen(self.name, 1)
+                self._probes += 1
+
+    def cancel(self):
+        """Gives back an admitted call that was never made (refused by admission control, or failed before the provider call) without recording an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0: self._probes -= 1
+
+    def record(self, ok, duration, error=None):
+        bad = not ok or duration > self.slow_call_seconds
+        with self._lock:
+            if bad: self._last_error = error or f"slow call ({duration:.1f} s)"
+            if self._state == HALF_OPEN:
+                self._transition(OPEN if bad else CLOSED); return
+            self._outcomes.append(bad); self._streak = self._streak + 1 if bad else 0
+            if self._state == CLOSED and (self._streak >= self.consecutive_failures or
+                                          (len(self._outcomes) >= self.min_calls and sum(self._outcomes) >= self.failure_rate * len(self._outcomes))):
+                self._transition(OPEN)
+
+    @contextmanager
+    def admit(self):
+        """`with breaker.admit() as call: ...` admits a call up front (raising CircuitOpen) so a half-open probe is claimed before the
+        caller queues for anything else. Only the provider request goes in `with call.measure():`; a call left unmeasured is cancelled."""
+        self.before_call(); call = AdmittedCall(self)
+        try: yield call
+        finally:
+            if not call.measured: self.cancel()
+
+    @contextmanager
+    def call(self):
+        """`with breaker.call() as outcome: ...` admits and measures the block in one go."""
+        with self.admit() as call, call.measure() as outcome: yield outcome
+
+    def snapshot(self):
+        """The breaker's state for the admin endpoint."""
+        with self._lock:
+            state = self._state; retry_in = max(0.0, self._opened_at + self.open_seconds - time.monotonic()) if state == OPEN else 0.0
+            return {"name": self.name, "state": state, "since": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._changed_at)),
+                    "probe_in_seconds": round(retry_in, 1), "recent_calls": len(self._outcomes), "recent_bad_calls": sum(self._outcomes),
+                    "rejected_calls": self._rejected, "last_error": self._last_error,
+                    "thresholds": {"window": self.window, "min_calls": self.min_calls, "failure_rate": self.failure_rate, "consecutive_failures": self.consecutive_failures,
+                                   "slow_call_seconds": self.slow_call_seconds, "open_seconds": self.open_seconds, "half_open_probes": self.half_open_probes}}
+
+    def reset(self):
+        with self._lock: self._transition(CLOSED)
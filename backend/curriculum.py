@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from collections import defaultdict, namedtuple
+from flask import current_app
+from sqlalchemy import select
+
+from .models import db, AgeCohort, Domain, Component, PlayType, playtype_agecohort_association, playtype_domain_association
+from .versioning import get_version
+
+# An immutable, pre-serialized view of the chatbot options tree.
+CurriculumSnapshot = namedtuple('CurriculumSnapshot', ['version', 'etag', 'body'])
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def build_chatbot_options():
+    """
+    Builds the {"age_cohorts": ..., "play_types": ..., "age_cohort_ids": ..., "domain_ids": ...} tree served by /api/chatbot/options
+    from a fixed number of bulk queries, independent of the size of the cohort x domain matrix.
+    """
+    age_cohorts = db.session.execute(select(AgeCohort.id, AgeCohort.name).order_by(AgeCohort.id)).all()
+    domains = db.session.execute(select(Domain.id, Domain.name).order_by(Domain.id)).all()
+    components = db.session.execute(select(Component.name, Component.age_cohort_id, Component.domain_id).order_by(Component.id)).all()
+    play_types = db.session.execute(select(PlayType.id, PlayType.name, PlayType.description, PlayType.context).order_by(PlayType.id)).all()
+    pt_age_cohorts = defaultdict(list); pt_domains = defaultdict(list)
+    pt_ac = playtype_agecohort_association.c; pt_d = playtype_domain_association.c
+    for pt_id, ac_id in db.session.execute(select(pt_ac.play_type_id, pt_ac.age_cohort_id).order_by(pt_ac.play_type_id, pt_ac.age_cohort_id)):
+        pt_age_cohorts[pt_id].append(ac_id)
+    for pt_id, d_id in db.session.execute(select(pt_d.play_type_id, pt_d.domain_id).order_by(pt_d.play_type_id, pt_d.domain_id)):
+        pt_domains[pt_id].append(d_id)
+
+    components_by_pair = defaultdict(list)
+    for name, ac_id, d_id in components: components_by_pair[(ac_id, d_id)].append(name)
+    play_type_dicts = [{"id": pt.id, "name": pt.name, "description": pt.description, "context": pt.context,
+        "age_cohort_ids": pt_age_cohorts[pt.id], "domain_ids": pt_domains[pt.id]} for pt in play_types]
+
+    # Name -> id maps let the chat wizard build the "<age cohort id>-<domain id>" play type key without the admin endpoints.
+    options = {"age_cohorts": {}, "play_types": {}, "age_cohort_ids": {ac.name: ac.id for ac in age_cohorts}, "domain_ids": {d.name: d.id for d in domains}}
+    for ac in age_cohorts:
+        options["age_cohorts"][ac.name] = {}
+        for d in domains:
+            names = components_by_pair.get((ac.id, d.id))
+            if names:
+                options["age_cohorts"][ac.name][d.name] = names
+                options["play_types"][f"{ac.id}-{d.id}"] = [pt for pt in play_type_dicts if ac.id in pt["age_cohort_ids"] and d.id in pt["domain_ids"]]
+    return options
+
+def get_curriculum_snapshot():
+    """
+    Returns the current CurriculumSnapshot, rebuilding it only when the "curriculum" version
+    has moved since the last build. The version is read before the data, so a snapshot is never
+    tagged with a newer version than the data it contains.
+    """
+    global _snapshot
+    version = get_version(db.session, "curriculum"); snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version: return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            body = current_app.json.dumps(build_chatbot_options()).encode('utf-8')
+            _snapshot = CurriculumSnapshot(version=version, etag=hashlib.sha1(body).hexdigest(), body=body)
+        return _snapshot
@@ -0,0 +1,176 @@
+import io
+import csv
+from collections import defaultdict
+from sqlalchemy import select, insert, update, delete
+
+from .models import db, AgeCohort, Domain, Component, PlayType, playtype_agecohort_association, playtype_domain_association
+from .versioning import bump_versions
+
+# ==============================================================================
+# ===                 CURRICULUM IMPORT / EXPORT ENGINE                      ===
+# ==============================================================================
+# A curriculum document references everything by name:
+#   {"age_cohorts": ["0-1 years", ...], "domains": ["Mathematics", ...],
+#    "components": [{"name": ..., "age_cohort": ..., "domain": ...}, ...],
+#    "play_types": [{"name": ..., "description": ..., "context": ..., "age_cohorts": [...], "domains": [...]}, ...]}
+# Every section is optional. Cohorts and domains referenced by components or play types are created if missing.
+# Play types are matched by name: their description, context and links are replaced by the document's.
+
+CSV_COLUMNS = ["kind", "name", "age_cohort", "domain", "description", "context", "age_cohorts", "domains"]
+CSV_LIST_SEPARATOR = "|"
+
+class CurriculumImportError(ValueError):
+    """Raised when a curriculum document fails validation. `errors` lists every problem found."""
+    def __init__(self, errors):
+        super().__init__("; ".join(errors)); self.errors = errors
+
+def _load_state():
+    """Loads the current curriculum into name-keyed maps with six bulk queries."""
+    cohorts = dict(db.session.execute(select(AgeCohort.name, AgeCohort.id)).all())
+    domains = dict(db.session.execute(select(Domain.name, Domain.id)).all())
+    components = set(db.session.execute(select(Component.name, Component.age_cohort_id, Component.domain_id)).all())
+    play_types = {}
+    for pt in db.session.execute(select(PlayType.id, PlayType.name, PlayType.description, PlayType.context).order_by(PlayType.id)):
+        play_types.setdefault(pt.name, pt)
+    pt_cohorts = defaultdict(set); pt_domains = defaultdict(set)
+    for pt_id, ac_id in db.session.execute(select(playtype_agecohort_association.c.play_type_id, playtype_agecohort_association.c.age_cohort_id)): pt_cohorts[pt_id].add(ac_id)
+    for pt_id, d_id in db.session.execute(select(playtype_domain_association.c.play_type_id, playtype_domain_association.c.domain_id)): pt_domains[pt_id].add(d_id)
+    return cohorts, domains, components, play_types, pt_cohorts, pt_domains
+
+def _is_name(value): return isinstance(value, str) and bool(value.strip())
+
+def _validate(doc):
+    errors = []
+    if not isinstance(doc, dict): raise CurriculumImportError(["The curriculum document must be a JSON object"])
+    for section in ("age_cohorts", "domains", "components", "play_types"):
+        if not isinstance(doc.get(section) or [], list): errors.append(f"{section} must be a list")
+    if errors: raise CurriculumImportError(errors)
+    for section in ("age_cohorts", "domains"):
+        for index, name in enumerate(doc.get(section) or []):
+            if not _is_name(name): errors.append(f"{section}[{index}]: name must be a non-empty string")
+    for index, c in enumerate(doc.get("components") or []):
+        if not isinstance(c, dict) or not all(_is_name(c.get(k)) for k in ("name", "age_cohort", "domain")):
+            errors.append(f"components[{index}]: name, age_cohort and domain are required")
+    for index, pt in enumerate(doc.get("play_types") or []):
+        if not isinstance(pt, dict) or not _is_name(pt.get("name")):
+            errors.append(f"play_types[{index}]: name is required"); continue
+        for key in ("description", "context"):
+            if pt.get(key) is not None and not isinstance(pt[key], str): errors.append(f"play_types[{index}].{key} must be a string")
+        for key in ("age_cohorts", "domains"):
+            names = pt.get(key, [])
+            if not isinstance(names, list): errors.append(f"play_types[{index}].{key} must be a list of names"); continue
+            errors.extend(f"play_types[{index}].{key}[{i}]: name must be a non-empty string" for i, name in enumerate(names) if not _is_name(name))
+    if errors: raise CurriculumImportError(errors)
+
+def import_curriculum(doc, dry_run=False):
+    """
+    Upserts a curriculum document in a single transaction and returns a diff of what changed.
+    Names are resolved against in-memory maps built from a handful of bulk queries, and rows are
+    written with multi-row INSERTs, so the cost does not grow with per-row lookups.
+    With dry_run=True the diff is computed and the transaction is rolled back.
+    """
+    _validate(doc)
+    cohorts, domains, components, play_types, pt_cohorts, pt_domains = _load_state()
+    components_doc = [{k: c[k].strip() for k in ("name", "age_cohort", "domain")} for c in doc.get("components") or []]
+    play_types_doc = list({pt["name"].strip(): pt for pt in doc.get("play_types") or []}.values())  # last entry per name wins
+
+    def referenced(section, key, list_key):
+        names = [n.strip() for n in doc.get(section) or []] + [c[key] for c in components_doc]
+        names += [n.strip() for pt in play_types_doc for n in pt.get(list_key, [])]
+        return list(dict.fromkeys(names))
+    diff = {}
+    for section, model, existing, names in (("age_cohorts", AgeCohort, cohorts, referenced("age_cohorts", "age_cohort", "age_cohorts")),
+                                             ("domains", Domain, domains, referenced("domains", "domain", "domains"))):
+        added = [n for n in names if n not in existing]
+        if added:
+            db.session.execute(insert(model), [{"name": n} for n in added])
+            existing.update(db.session.execute(select(model.name, model.id).where(model.name.in_(added))).all())
+        diff[section] = {"added": added, "unchanged": len(names) - len(added)}
+
+    new_components = []; seen = set(components)
+    for c in components_doc:
+        key = (c["name"], cohorts[c["age_cohort"]], domains[c["domain"]])
+        if key in seen: continue
+        seen.add(key); new_components.append(key)
+    if new_components:
+        db.session.execute(insert(Component), [{"name": n, "age_cohort_id": ac, "domain_id": d} for n, ac, d in new_components])
+    added_keys = set(new_components)
+    diff["components"] = {"added": [c for c in components_doc if (c["name"], cohorts[c["age_cohort"]], domains[c["domain"]]) in added_keys],
+                          "unchanged": len(components_doc) - len(new_components)}
+
+    pt_diff = {"added": [], "updated": [], "unchanged": 0}; links_to_replace = {}
+    new_pts = []
+    for pt in play_types_doc:
+        name = pt["name"].strip(); description = pt.get("description", ""); context = pt.get("context") or "Standard"
+        ac_ids = {cohorts[n.strip()] for n in pt.get("age_cohorts", [])}; d_ids = {domains[n.strip()] for n in pt.get("domains", [])}
+        current = play_types.get(name)
+        if current is None:
+            new_pts.append((name, description, context, ac_ids, d_ids)); pt_diff["added"].append(name); continue
+        is_updated = (current.description or "") != (description or "") or current.context != context
+        if is_updated: db.session.execute(update(PlayType).where(PlayType.id == current.id).values(description=description, context=context))
+        if ac_ids != pt_cohorts[current.id] or d_ids != pt_domains[current.id]:
+            links_to_replace[current.id] = (ac_ids, d_ids); is_updated = True
+        if is_updated: pt_diff["updated"].append(name)
+        else: pt_diff["unchanged"] += 1
+    if new_pts:
+        db.session.execute(insert(PlayType), [{"name": n, "description": desc, "context": ctx} for n, desc, ctx, _, _ in new_pts])
+        ids = dict(db.session.execute(select(PlayType.name, PlayType.id).where(PlayType.name.in_([p[0] for p in new_pts]))).all())
+        for name, _, _, ac_ids, d_ids in new_pts: links_to_replace[ids[name]] = (ac_ids, d_ids)
+    if links_to_replace:
+        pt_ids = list(links_to_replace)
+        db.session.execute(delete(playtype_agecohort_association).where(playtype_agecohort_association.c.play_type_id.in_(pt_ids)))
+        db.session.execute(delete(playtype_domain_association).where(playtype_domain_association.c.play_type_id.in_(pt_ids)))
+        ac_rows = [{"play_type_id": p, "age_cohort_id": a} for p, (acs, _) in links_to_replace.items() for a in sorted(acs)]
+        d_rows = [{"play_type_id": p, "domain_id": d} for p, (_, ds) in links_to_replace.items() for d in sorted(ds)]
+        if ac_rows: db.session.execute(insert(playtype_agecohort_association), ac_rows)
+        if d_rows: db.session.execute(insert(playtype_domain_association), d_rows)
+    diff["play_types"] = pt_diff
+
+    # Core statements bypass the ORM flush events, so the curriculum version is bumped explicitly.
+    changed = any(diff[s]["added"] for s in diff) or pt_diff["updated"]
+    if dry_run or not changed: db.session.rollback()
+    else: bump_versions(db.session.connection(), ["curriculum"]); db.session.commit()
+    return diff
+
+def export_curriculum():
+    """Returns the whole curriculum as a name-referenced document that import_curriculum() accepts."""
+    cohort_rows = db.session.execute(select(AgeCohort.id, AgeCohort.name).order_by(AgeCohort.id)).all()
+    domain_rows = db.session.execute(select(Domain.id, Domain.name).order_by(Domain.id)).all()
+    cohort_names = dict(cohort_rows); domain_names = dict(domain_rows)
+    _, _, _, play_types, pt_cohorts, pt_domains = _load_state()
+    components = db.session.execute(select(Component.name, Component.age_cohort_id, Component.domain_id).order_by(Component.id)).all()
+    return {
+        "age_cohorts": [name for _, name in cohort_rows],
+        "domains": [name for _, name in domain_rows],
+        "components": [{"name": n, "age_cohort": cohort_names[ac], "domain": domain_names[d]} for n, ac, d in components],
+        "play_types": [{"name": pt.name, "description": pt.description or "", "context": pt.context,
+            "age_cohorts": [cohort_names[i] for i in sorted(pt_cohorts[pt.id])], "domains": [domain_names[i] for i in sorted(pt_domains[pt.id])]}
+            for pt in sorted(play_types.values(), key=lambda pt: pt.id)],
+    }
+
+def curriculum_to_csv(doc):
+    """Flattens a curriculum document into one CSV with a `kind` column per row."""
+    out = io.StringIO(); writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS); writer.writeheader()
+    for name in doc.get("age_cohorts", []): writer.writerow({"kind": "age_cohort", "name": name})
+    for name in doc.get("domains", []): writer.writerow({"kind": "domain", "name": name})
+    for c in doc.get("components", []): writer.writerow({"kind": "component", **c})
+    for pt in doc.get("play_types", []):
+        writer.writerow({"kind": "play_type", "name": pt["name"], "description": pt.get("description", ""), "context": pt.get("context", ""),
+            "age_cohorts": CSV_LIST_SEPARATOR.join(pt.get("age_cohorts", [])), "domains": CSV_LIST_SEPARATOR.join(pt.get("domains", []))})
+    return out.getvalue()
+
+def curriculum_from_csv(text):
+    """Parses the CSV produced by curriculum_to_csv() back into a curriculum document."""
+    doc = {"age_cohorts": [], "domains": [], "components": [], "play_types": []}; errors = []
+    split = lambda value: [v.strip() for v in (value or "").split(CSV_LIST_SEPARATOR) if v.strip()]
+    for line, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        kind = (row.get("kind") or "").strip()
+        if kind == "age_cohort": doc["age_cohorts"].append(row.get("name") or "")
+        elif kind == "domain": doc["domains"].append(row.get("name") or "")
+        elif kind == "component": doc["components"].append({k: row.get(k) or "" for k in ("name", "age_cohort", "domain")})
+        elif kind == "play_type":
+            doc["play_types"].append({"name": row.get("name") or "", "description": row.get("description") or "", "context": row.get("context") or "Standard",
+                "age_cohorts": split(row.get("age_cohorts")), "domains": split(row.get("domains"))})
+        else: errors.append(f"line {line}: unknown kind '{kind}'")
+    if errors: raise CurriculumImportError(errors)
+    return doc
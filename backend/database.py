@@ -0,0 +1,47 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .models import db
+
+# ==============================================================================
+# ===                     DATABASE ENGINE CONFIGURATION                      ===
+# ==============================================================================
+# Pool settings (server databases):
+#   DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (s), DB_POOL_RECYCLE (s)
+# SQLite settings, applied to every new connection by a connect-event hook:
+#   SQLITE_JOURNAL_MODE  "WAL" lets readers run alongside the single writer
+#   SQLITE_SYNCHRONOUS   "NORMAL" is safe with WAL and skips an fsync per commit
+#   SQLITE_BUSY_TIMEOUT  ms a writer waits for the lock before "database is locked"
+# Foreign keys are always enforced on SQLite, as they are on the server databases.
+
+def engine_options(app):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database. Call before `db.init_app(app)`."""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'): return {}
+        # The driver's own lock timeout is in seconds; keep it in step with busy_timeout.
+        options = {"connect_args": {"timeout": int(app.config.get('SQLITE_BUSY_TIMEOUT', 5000)) / 1000}}
+    else:
+        options = {"pool_pre_ping": True}
+    options.update(pool_size=int(app.config.get('DB_POOL_SIZE', 10)), max_overflow=int(app.config.get('DB_MAX_OVERFLOW', 20)),
+                   pool_timeout=float(app.config.get('DB_POOL_TIMEOUT', 30)), pool_recycle=int(app.config.get('DB_POOL_RECYCLE', 1800)))
+    return options
+
+def init_database(app):
+    """Applies the engine options, initialises Flask-SQLAlchemy and installs the SQLite pragmas."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite': return
+    journal_mode = app.config.get('SQLITE_JOURNAL_MODE', 'WAL'); synchronous = app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode: cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous: cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
@@ -0,0 +1,122 @@
+import os
+import re
+import gzip
+import json
+import datetime
+from sqlalchemy import select, update, delete, bindparam
+
+from .models import db, ActivityLog
+from .versioning import bump_versions
+
+# ==============================================================================
+# ===                        STRUCTURED EVENT TYPES                          ===
+# ==============================================================================
+# Activity is logged as an action code plus a small JSON payload instead of a sentence. The sentence
+# admins see is rendered from these templates when the feed is read, so changing the wording never
+# touches stored rows. Rows written before the codes existed are converted by migrate_activity_log().
+
+EVENT_TYPES = {
+    "auth.login": "User logged in",
+    "auth.logout": "User logged out",
+    "auth.password_change": "User changed password",
+    "plan.generate": "Generated RAG plan for {age_cohort}, '{component}'",
+    "plan.fallback": "Served stored guide for {age_cohort}, '{component}' while the generator was unavailable",
+    "plan.variant": "Switched to another generated version for {age_cohort}, '{component}'",
+    "plan.save": "Saved plan '{title}'",
+    "plan.delete": "Deleted plan ID {plan_id}",
+    "plan.export": "Exported {count} plans as {format}",
+    "feedback.submit": "Submitted feedback (Rating: {rating})",
+    "curriculum.delete": "Admin deleted {kind}: {name}",
+    "curriculum.bulk_add": "Admin added {count} {kind} in bulk",
+    "curriculum.import": "Admin imported curriculum",
+    "resource.upload": "Admin uploaded resource: {title}",
+    "resource.reupload": "Admin re-uploaded existing resource: {title}",
+    "resource.delete": "Admin deleted resource: {title}",
+}
+LEGACY_CODE = "legacy"
+
+class _Blank(dict):
+    def __missing__(self, key): return ""
+
+def describe_event(action_code, payload, action=""):
+    """The human-readable description of an event (legacy rows keep their original text)."""
+    template = EVENT_TYPES.get(action_code)
+    if action or template is None: return action or action_code
+    return template.format_map(_Blank(payload or {}))
+
+def _template_pattern(template):
+    parts = re.split(r"\{(\w+)\}", template)
+    return re.compile("".join(re.escape(part) if i % 2 == 0 else f"(?P<{part}>.*)" for i, part in enumerate(parts)) + "$")
+
+# Most specific first: exact texts, then templates with the most literal text ("Admin deleted resource: ..." before "Admin deleted {kind}: ...").
+_LEGACY_PATTERNS = [(code, _template_pattern(template)) for code, template in
+                    sorted(EVENT_TYPES.items(), key=lambda item: ("{" in item[1], -len(re.sub(r"\{\w+\}", "", item[1]))))]
+
+def classify_legacy_action(action):
+    """(action_code, payload) for a free-form legacy description, or (LEGACY_CODE, None) if it matches no event type."""
+    for code, pattern in _LEGACY_PATTERNS:
+        match = pattern.match(action or "")
+        if match:
+            payload = {k: int(v) if re.fullmatch(r"-?\d+", v) else v for k, v in match.groupdict().items()}
+            return code, payload or None
+    return LEGACY_CODE, None
+
+def migrate_activity_log(batch_size=1000):
+    """
+    Gives rows written before structured events an action code and payload, clearing the text it was parsed from.
+    Unrecognised descriptions are kept as they are under the "legacy" code. Idempotent. Returns the number of rows converted.
+    """
+    table = ActivityLog.__table__; converted = 0; last_id = 0
+    while True:
+        rows = db.session.execute(select(table.c.id, table.c.action).where(table.c.id > last_id, table.c.action_code.is_(None))
+                                  .order_by(table.c.id).limit(batch_size)).all()
+        if not rows: break
+        last_id = rows[-1].id; params = []
+        for row in rows:
+            code, payload = classify_legacy_action(row.action)
+            params.append({"event_id": row.id, "code": code, "payload": payload, "text": row.action if code == LEGACY_CODE else ""})
+        db.session.execute(update(table).where(table.c.id == bindparam("event_id")).values(action_code=bindparam("code"), payload=bindparam("payload"), action=bindparam("text")), params)
+        db.session.commit(); converted += len(rows)
+    if converted: print(f"Converted {converted} activity log rows to structured events.")
+    return converted
+
+# ==============================================================================
+# ===                       RETENTION AND ARCHIVING                          ===
+# ==============================================================================
+# Rows older than the retention period are appended to gzip-compressed JSON Lines files, one per month
+# (activity-YYYY-MM.jsonl.gz), and deleted from the hot table. Each batch is written as its own gzip
+# member and fsync'd before its rows are deleted, so an interrupted run can at worst archive a batch twice
+# (duplicates share their `id`); it never loses rows. The analytics rollups already hold the counts,
+# so dashboards are unaffected.
+
+ARCHIVE_PATTERN = "activity-{month}.jsonl.gz"
+
+def archive_record(row):
+    return {"id": row.id, "timestamp": row.timestamp.isoformat(), "user_id": row.user_id, "action_code": row.action_code,
+            "payload": row.payload, "plan_id": row.plan_id, "request_id": row.request_id, "action": row.action or None}
+
+def archive_activity_logs(archive_dir, retention_days, batch_size=2000, now=None):
+    """Moves events from before midnight (UTC) `retention_days` days ago into the archive. Returns the number of rows moved."""
+    cutoff = datetime.datetime.combine((now or datetime.datetime.utcnow()).date() - datetime.timedelta(days=retention_days), datetime.time())
+    os.makedirs(archive_dir, exist_ok=True); table = ActivityLog.__table__; moved = 0
+    while True:
+        rows = db.session.execute(select(table).where(table.c.timestamp < cutoff).order_by(table.c.timestamp, table.c.id).limit(batch_size)).all()
+        if not rows: break
+        by_month = {}
+        for row in rows: by_month.setdefault(row.timestamp.strftime("%Y-%m"), []).append(archive_record(row))
+        for month, records in by_month.items():
+            with open(os.path.join(archive_dir, ARCHIVE_PATTERN.format(month=month)), "ab") as f:
+                f.write(gzip.compress("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")))
+                f.flush(); os.fsync(f.fileno())
+        conn = db.session.connection()
+        conn.execute(delete(table).where(table.c.id.in_([row.id for row in rows]))); bump_versions(conn, ["activity_logs"])
+        db.session.commit(); moved += len(rows)
+    if moved: print(f"Archived {moved} activity log rows older than {cutoff:%Y-%m-%d} to {archive_dir}.")
+    return moved
+
+def iter_archive(archive_dir):
+    """Yields archived events, oldest month first (multi-member gzip files are read transparently)."""
+    if not os.path.isdir(archive_dir): return
+    for name in sorted(n for n in os.listdir(archive_dir) if re.fullmatch(r"activity-\d{4}-\d{2}\.jsonl\.gz", n)):
+        with gzip.open(os.path.join(archive_dir, name), "rt", encoding="utf-8") as f:
+            for line in f: yield json.loads(line)
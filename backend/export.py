@@ -0,0 +1,138 @@
+import re
+import json
+import zlib
+import struct
+import datetime
+from sqlalchemy import select, func
+
+from .models import db, Plan, User, GuideBlob
+from .guides import decode_blob, render_markdown, MARKDOWN_KEY
+
+# ==============================================================================
+# ===                       STREAMING PLAN EXPORT                            ===
+# ==============================================================================
+# Exports are produced by generators that read plans in id order, `EXPORT_CHUNK_SIZE` at a time, and
+# hand each rendered file to the response as soon as it is compressed. Memory stays constant apart from
+# the ZIP central directory (about 100 bytes per file, see ZipStream). The session is closed after every
+# chunk, so a slow download never holds a pooled connection or a long read transaction.
+#
+# Resuming: responses carry X-Export-Max-Id, the newest plan id when the export started. A client whose
+# download broke re-requests with after_id=<last id it received complete> and the same max_id, and gets
+# exactly the remaining plans; plan ids are in every file name and JSONL record.
+
+EXPORT_CHUNK_SIZE = 200
+EXPORT_FORMATS = ("zip", "jsonl")
+STREAM_BLOCK_SIZE = 64 * 1024  # bytes handed to the WSGI server at a time
+
+class InvalidExportRequest(ValueError):
+    """Raised when export filters or range parameters cannot be parsed."""
+
+def parse_export_args(args):
+    """Validates the query string shared by the user and admin export endpoints."""
+    try:
+        filters = {name: args[name] for name in ("age_cohort", "subject", "play_type") if args.get(name)}
+        if args.get('user_id'): filters['user_id'] = int(args['user_id'])
+        if args.get('from'): filters['created_from'] = datetime.datetime.fromisoformat(args['from'])
+        if args.get('to'): filters['created_to'] = datetime.datetime.fromisoformat(args['to'])
+        after_id = int(args.get('after_id', 0)); max_id = int(args['max_id']) if args.get('max_id') else None
+    except ValueError as e:
+        raise InvalidExportRequest(f"Invalid export parameter: {e}") from e
+    export_format = args.get('format', 'zip')
+    if export_format not in EXPORT_FORMATS: raise InvalidExportRequest(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return export_format, filters, after_id, max_id
+
+def _filtered(stmt, filters):
+    for name in ("age_cohort", "subject", "play_type", "user_id"):
+        if name in filters: stmt = stmt.where(getattr(Plan, name) == filters[name])
+    if 'created_from' in filters: stmt = stmt.where(Plan.created_at >= filters['created_from'])
+    if 'created_to' in filters: stmt = stmt.where(Plan.created_at <= filters['created_to'])
+    return stmt
+
+def export_bounds(filters, after_id=0, max_id=None):
+    """(max_id, count) of the plans an export will contain; fixes the snapshot a resumed download continues."""
+    if max_id is None: max_id = db.session.execute(select(func.max(Plan.id))).scalar() or 0
+    count = db.session.execute(_filtered(select(func.count(Plan.id)).where(Plan.id > after_id, Plan.id <= max_id), filters)).scalar()
+    return max_id, count
+
+def iter_export_rows(filters, after_id, max_id, with_author=False):
+    """Yields (plan row, markdown, document) for the selected plans in id order, reading one chunk at a time."""
+    columns = [Plan.id, Plan.title, Plan.content, Plan.selections, Plan.age_cohort, Plan.subject, Plan.play_type, Plan.created_at, Plan.user_id, GuideBlob.data]
+    if with_author: columns.append(User.email)
+    stmt = _filtered(select(*columns).outerjoin(GuideBlob, GuideBlob.id == Plan.guide_id), filters).order_by(Plan.id).limit(EXPORT_CHUNK_SIZE)
+    if with_author: stmt = stmt.join(User, User.id == Plan.user_id)
+    last_id = after_id
+    while True:
+        rows = db.session.execute(stmt.where(Plan.id > last_id, Plan.id <= max_id)).all()
+        db.session.close()
+        if not rows: return
+        for row in rows:
+            document = decode_blob(row.data) if row.data is not None else {MARKDOWN_KEY: row.content}
+            yield row, render_markdown(document, row.selections), document
+        last_id = rows[-1].id
+
+def _slug(text, limit=60):
+    return re.sub(r"[^\w]+", "-", text or "").strip("-")[:limit] or "plan"
+
+def export_file_name(row, with_author=False):
+    name = f"{row.created_at:%Y-%m-%d}-{row.id}-{_slug(row.title)}.md"
+    return f"{_slug(row.email, 120)}/{name}" if with_author else name
+
+def export_record(row, markdown, document, with_author=False):
+    record = {"id": row.id, "title": row.title, "age_cohort": row.age_cohort, "subject": row.subject, "play_type": row.play_type,
+              "created_at": row.created_at.isoformat(), "selections": row.selections, "content": markdown,
+              "guide": None if MARKDOWN_KEY in document else document}
+    if with_author: record["user_id"] = row.user_id; record["user_email"] = row.email
+    return record
+
+# --- ZIP writer ---
+# zipfile keeps a ZipInfo object (about 1 KB) per entry until the archive is closed. This writer keeps only
+# each entry's packed central-directory record (about 100 bytes). Plans are small, so every file is
+# compressed whole and its CRC and sizes go straight into the local header; Zip64 records are added when
+# the archive passes 65535 files or 4 GiB.
+ZIP64_LIMIT = 0xFFFFFFFF
+
+def _dos_time(moment):
+    return (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2), ((max(moment.year, 1980) - 1980) << 9) | (moment.month << 5) | moment.day
+
+class ZipStream:
+    def __init__(self): self.offset = 0; self.central = []
+
+    def add(self, name, data, modified):
+        """Returns the bytes of one deflated file entry."""
+        name = name.encode("utf-8"); compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        packed = compressor.compress(data) + compressor.flush(); crc = zlib.crc32(data)
+        mod_time, mod_date = _dos_time(modified); flags = 0x800  # UTF-8 names
+        header = struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, 8, mod_time, mod_date, crc, len(packed), len(data), len(name), 0) + name
+        extra = struct.pack("<HHQ", 1, 8, self.offset) if self.offset >= ZIP64_LIMIT else b""
+        self.central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 0x0314 if not extra else 0x032D, 20 if not extra else 45, flags, 8, mod_time, mod_date,
+                                        crc, len(packed), len(data), len(name), len(extra), 0, 0, 0, 0o644 << 16, min(self.offset, ZIP64_LIMIT)) + name + extra)
+        self.offset += len(header) + len(packed)
+        return header + packed
+
+    def finish(self):
+        """Returns the central directory and end records."""
+        directory = b"".join(self.central); count = len(self.central); start = self.offset; self.central = []
+        tail = b""
+        if count >= 0xFFFF or start >= ZIP64_LIMIT or len(directory) >= ZIP64_LIMIT:
+            zip64_end = start + len(directory)
+            tail = struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, len(directory), start) + struct.pack("<IIQI", 0x07064B50, 0, zip64_end, 1)
+        end = struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF), min(len(directory), ZIP64_LIMIT), min(start, ZIP64_LIMIT), 0)
+        return directory + tail + end
+
+def stream_zip(rows, with_author=False):
+    """Yields a ZIP archive with one markdown file per plan, in blocks of about STREAM_BLOCK_SIZE bytes."""
+    archive = ZipStream(); block = []; size = 0
+    for row, markdown, _ in rows:
+        entry = archive.add(export_file_name(row, with_author), markdown.encode("utf-8"), row.created_at)
+        block.append(entry); size += len(entry)
+        if size >= STREAM_BLOCK_SIZE: yield b"".join(block); block = []; size = 0
+    block.append(archive.finish()); yield b"".join(block)
+
+def stream_jsonl(rows, with_author=False):
+    """Yields one JSON object per line per plan."""
+    block = []; size = 0
+    for row, markdown, document in rows:
+        line = (json.dumps(export_record(row, markdown, document, with_author), ensure_ascii=False) + "\n").encode("utf-8")
+        block.append(line); size += len(line)
+        if size >= STREAM_BLOCK_SIZE: yield b"".join(block); block = []; size = 0
+    if block: yield b"".join(block)
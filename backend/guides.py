@@ -0,0 +1,192 @@
+import json
+import zlib
+import hashlib
+from functools import lru_cache
+from sqlalchemy import select, insert, update, bindparam, func, exists
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, Plan, FeedbackLog, GuideBlob, GuideSearchText
+from .metrics import CACHE_EVENTS
+
+# ==============================================================================
+# ===                   STRUCTURED, COMPRESSED GUIDE STORAGE                 ===
+# ==============================================================================
+# Generated guides are stored once as zlib-compressed canonical JSON in `guide_blob`, keyed by their
+# SHA-256. Plans and feedback rows only reference a blob, so the same guide saved by several teachers
+# and rated in feedback takes the space of one. A blob holds either a structured TeacherGuide dict or,
+# for plans the teacher edited by hand, {"markdown": "..."}.
+# Markdown is rendered on the server when a plan is read. Blobs are immutable, so renders are cached
+# by blob id and selections and never need invalidating. Blobs that saved plans reference also get one
+# `guide_search_text` row with the text that plan search indexes (see search.py).
+
+MARKDOWN_KEY = "markdown"
+COMPRESSION_LEVEL = 9
+
+def canonical_json(doc):
+    return json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _encode(doc):
+    raw = canonical_json(doc)
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, COMPRESSION_LEVEL), len(raw)
+
+def compress_document(doc):
+    """The zlib-compressed canonical JSON of `doc`, the format of GuideBlob.data, for documents kept outside guide storage."""
+    return zlib.compress(canonical_json(doc), COMPRESSION_LEVEL)
+
+def decode_blob(data):
+    return json.loads(zlib.decompress(data))
+
+def store_document(doc):
+    """Returns the id of the blob holding `doc`, creating it in the current transaction if it is new."""
+    sha, data, raw_size = _encode(doc)
+    blob_id = db.session.execute(select(GuideBlob.id).where(GuideBlob.sha256 == sha)).scalar()
+    if blob_id is not None: return blob_id
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(insert(GuideBlob).values(sha256=sha, data=data, raw_size=raw_size).returning(GuideBlob.id)).scalar()
+    except IntegrityError:  # stored concurrently by another request
+        return db.session.execute(select(GuideBlob.id).where(GuideBlob.sha256 == sha)).scalar_one()
+
+def store_documents(docs):
+    """Bulk variant of store_document(): returns one blob id per document, with a constant number of queries."""
+    encoded = [_encode(doc) for doc in docs]; shas = list({sha for sha, _, _ in encoded})
+    ids = {}
+    for start in range(0, len(shas), 500):
+        ids.update(db.session.execute(select(GuideBlob.sha256, GuideBlob.id).where(GuideBlob.sha256.in_(shas[start:start + 500]))).all())
+    new = {sha: {"sha256": sha, "data": data, "raw_size": raw_size} for sha, data, raw_size in encoded if sha not in ids}
+    if new:
+        db.session.execute(insert(GuideBlob), list(new.values()))
+        for start in range(0, len(new), 500):
+            ids.update(db.session.execute(select(GuideBlob.sha256, GuideBlob.id).where(GuideBlob.sha256.in_(list(new)[start:start + 500]))).all())
+    return [ids[sha] for sha, _, _ in encoded]
+
+def store_search_text(conn, blob_ids):
+    """
+    Writes the searchable text of the given blobs that have none yet. Call it before a plan starts referencing a blob:
+    the search index reads the text when the plan row is written. `conn` is a Session or Connection. Returns the count.
+    """
+    texts = GuideSearchText.__table__; blobs = GuideBlob.__table__
+    rows = conn.execute(select(blobs.c.id, blobs.c.data).where(blobs.c.id.in_(set(blob_ids)), ~exists().where(texts.c.guide_id == blobs.c.id))).all()
+    if not rows: return 0
+    try:
+        with conn.begin_nested(): conn.execute(insert(texts), [{"guide_id": row.id, "text": searchable_text(decode_blob(row.data))} for row in rows])
+    except IntegrityError:  # written concurrently for the same blob by another request
+        return 0
+    return len(rows)
+
+@lru_cache(maxsize=1024)
+def load_document(blob_id):
+    """The decoded document of a blob. Cached, so callers must treat the result as read-only."""
+    data = db.session.execute(select(GuideBlob.data).where(GuideBlob.id == blob_id)).scalar()
+    return None if data is None else decode_blob(data)
+
+def best_stored_guide(age_cohort, domain, component, play_type_name, candidates=5):
+    """
+    The best structured guide already stored for these selections, or None; served while the LLM is unavailable.
+    Guides with the highest net feedback rating come first, then the guides saved by the most plans, newest first on ties.
+    """
+    rated = (select(FeedbackLog.guide_id, func.sum(FeedbackLog.rating).label("score"), func.max(FeedbackLog.timestamp).label("latest"))
+             .where(FeedbackLog.guide_id.is_not(None), FeedbackLog.selections['age'].as_string() == age_cohort, FeedbackLog.selections['domain'].as_string() == domain,
+                    FeedbackLog.selections['sub_domain'].as_string() == component, FeedbackLog.selections[('play_type', 'name')].as_string() == play_type_name)
+             .group_by(FeedbackLog.guide_id).having(func.sum(FeedbackLog.rating) > 0).order_by(func.sum(FeedbackLog.rating).desc(), func.max(FeedbackLog.timestamp).desc()).limit(candidates))
+    saved = (select(Plan.guide_id, func.count(Plan.id).label("score"), func.max(Plan.created_at).label("latest"))
+             .where(Plan.guide_id.is_not(None), Plan.age_cohort == age_cohort, Plan.subject == domain, Plan.play_type == play_type_name,
+                    Plan.selections['sub_domain'].as_string() == component)
+             .group_by(Plan.guide_id).order_by(func.count(Plan.id).desc(), func.max(Plan.created_at).desc()).limit(candidates))
+    for source, stmt in (("rated", rated), ("saved", saved)):
+        for row in db.session.execute(stmt):
+            document = load_document(row.guide_id)
+            if document and MARKDOWN_KEY not in document: return {"source": source, "score": int(row.score), "guide": dict(document)}
+    return None
+
+# ==============================================================================
+# ===                         MARKDOWN RENDERING                             ===
+# ==============================================================================
+def render_markdown(doc, selections=None, header=True):
+    """Renders a stored document as the markdown teachers see (the same layout the chatbot page uses). header=False leaves out the selection lines."""
+    if not isinstance(doc, dict): return ""
+    if MARKDOWN_KEY in doc: return doc[MARKDOWN_KEY]
+    s = selections or {}; play_type = s.get('play_type') if isinstance(s.get('play_type'), dict) else {}
+    parts = [f"### {doc.get('guide_title', 'Untitled Plan')}"]
+    if header: parts.extend([f"**Age Cohort:** {s.get('age')} | **Domain:** {s.get('domain')} | **Component:** {s.get('sub_domain')}",
+                             f"**Play Type:** {play_type.get('name')} | **Context:** {play_type.get('context')}"])
+    parts.extend(["\n---", "### Learning Outcomes", "**Cognitive:**"])
+    parts.extend([f"- {item}" for item in doc.get('cognitive_outcomes', [])])
+    parts.append("\n**Socio-Emotional:**"); parts.extend([f"- {item}" for item in doc.get('socio_emotional_outcomes', [])])
+    parts.extend(["\n---", "### Activities", f"**{doc.get('activity_name', '')}**", doc.get('activity_description', ''), "\n---", "### Recommended Content from Oak API"])
+    parts.extend([f"- {item}" for item in doc.get('recommended_oak_content', [])])
+    parts.extend(["\n---", "### Step-by-Step Facilitation Guidance", f"**Setup:** {doc.get('setup_guidance', '')}", f"**Introduction:** {doc.get('introduction_guidance', '')}", f"**During Play (Facilitation):** {doc.get('during_play_guidance', '')}", f"**Conclusion/Reflection:** {doc.get('conclusion_guidance', '')}", "\n---", "### Materials"])
+    parts.extend([f"- {item}" for item in doc.get('materials', [])])
+    parts.extend(["\n---", "### Assessment Matrix and Rubric", doc.get('assessment_rubric', 'No rubric generated.')])
+    return "\n\n".join(parts)
+
+@lru_cache(maxsize=2048)
+def _render_blob(blob_id, selections_json):
+    return render_markdown(load_document(blob_id), json.loads(selections_json))
+
+def plan_markdown(plan):
+    """The markdown for a Plan row (ORM object or row with content, guide_id and selections)."""
+    if plan.guide_id is None: return plan.content
+    return _render_blob(plan.guide_id, json.dumps(plan.selections or {}, sort_keys=True))
+
+def searchable_text(doc):
+    """The text plan search indexes for a blob: its markdown without the selection lines, which differ between the plans sharing it."""
+    return render_markdown(doc, header=False)
+
+@CACHE_EVENTS.source
+def _cache_statistics():
+    counts = {}
+    for name, cached in (("guide_document", load_document), ("guide_markdown", _render_blob)):
+        info = cached.cache_info(); counts[(name, "hit")] = info.hits; counts[(name, "miss")] = info.misses
+    return counts
+
+# ==============================================================================
+# ===                      MIGRATION OF EXISTING ROWS                        ===
+# ==============================================================================
+def migrate_plan_storage(batch_size=500):
+    """
+    Moves feedback output and inline plan markdown into deduplicated blobs, batch by batch.
+    A legacy plan whose markdown is exactly the rendering of a rated guide is linked to that structured
+    guide, which recovers its structure. Other plans are stored as markdown documents.
+    Idempotent: rows that already reference a blob are skipped. Returns (plans migrated, feedback rows migrated).
+    """
+    feedback = FeedbackLog.__table__; plans = Plan.__table__  # Core executemany; the ORM would treat a parameter list as bulk-update-by-primary-key
+    migrated_plans = migrated_feedback = 0; last_id = 0
+    while True:
+        rows = db.session.execute(select(FeedbackLog.id, FeedbackLog.generated_output).where(FeedbackLog.id > last_id, FeedbackLog.guide_id.is_(None))
+                                  .order_by(FeedbackLog.id).limit(batch_size)).all()
+        if not rows: break
+        last_id = rows[-1].id; rows = [row for row in rows if row.generated_output is not None]
+        if not rows: continue
+        blob_ids = store_documents([row.generated_output for row in rows])
+        db.session.execute(update(feedback).where(feedback.c.id == bindparam("feedback_id")).values(guide_id=bindparam("blob_id"), generated_output=None),
+                           [{"feedback_id": row.id, "blob_id": blob_id} for row, blob_id in zip(rows, blob_ids)])
+        db.session.commit(); migrated_feedback += len(rows)
+
+    rendered = {}; last_id = 0  # sha256 of rendered markdown -> (guide blob id, selections)
+    legacy_plans = db.session.execute(select(Plan.id).where(Plan.guide_id.is_(None), Plan.content != "").limit(1)).first() is not None
+    while legacy_plans:
+        rows = db.session.execute(select(FeedbackLog.id, FeedbackLog.guide_id, FeedbackLog.selections, GuideBlob.data).join(GuideBlob, GuideBlob.id == FeedbackLog.guide_id)
+                                  .where(FeedbackLog.id > last_id).order_by(FeedbackLog.id).limit(batch_size)).all()
+        if not rows: break
+        last_id = rows[-1].id
+        for row in rows:
+            markdown = render_markdown(decode_blob(row.data), row.selections)
+            rendered.setdefault(hashlib.sha256(markdown.encode("utf-8")).hexdigest(), (row.guide_id, row.selections))
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(select(Plan.id, Plan.content).where(Plan.id > last_id, Plan.guide_id.is_(None), Plan.content != "")
+                                  .order_by(Plan.id).limit(batch_size)).all()
+        if not rows: break
+        last_id = rows[-1].id
+        matches = [rendered.get(hashlib.sha256(row.content.encode("utf-8")).hexdigest()) for row in rows]
+        unmatched = [row for row, match in zip(rows, matches) if match is None]
+        markdown_ids = dict(zip((row.id for row in unmatched), store_documents([{MARKDOWN_KEY: row.content} for row in unmatched])))
+        params = [{"plan_id": row.id, "blob_id": match[0], "selections": match[1]} if match else {"plan_id": row.id, "blob_id": markdown_ids[row.id], "selections": None}
+                  for row, match in zip(rows, matches)]
+        store_search_text(db.session, [param["blob_id"] for param in params])
+        db.session.execute(update(plans).where(plans.c.id == bindparam("plan_id")).values(guide_id=bindparam("blob_id"), selections=bindparam("selections"), content=""), params)
+        db.session.commit(); migrated_plans += len(rows)
+    if migrated_plans or migrated_feedback: print(f"Moved {migrated_plans} plans and {migrated_feedback} feedback rows into compressed guide storage.")
+    return migrated_plans, migrated_feedback
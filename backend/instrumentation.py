@@ -0,0 +1,106 @@
+import re
+import time
+import logging
+import contextlib
+from collections import Counter
+from flask import g, request, has_app_context
+from sqlalchemy import event
+
+from .models import db
+
+logger = logging.getLogger("backend.sql")
+
+# Collapses whitespace and variable-length IN (...) lists so that the same statement
+# issued with different parameter counts produces the same fingerprint.
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:\?|%\(\w+\)s|:\w+)(?:, (?:\?|%\(\w+\)s|:\w+))*\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+
+def fingerprint(statement):
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _POSTCOMPILE.sub("(?)", _IN_LIST.sub("IN (?)", statement))
+
+class QueryStats:
+    """Per-request SQL statistics: statement count, total DB time and how often each statement shape was issued."""
+    def __init__(self):
+        self.count = 0; self.total_time = 0.0; self.fingerprints = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1; self.total_time += elapsed; self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes issued more than `threshold` times — the signature of an N+1 lazy-load loop."""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n > threshold]
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+# Statistics collectors that are active outside of a request (see `track_queries`).
+_active_trackers = []
+
+def _current_collectors():
+    collectors = list(_active_trackers)
+    if has_app_context() and g.get('_sql_stats') is not None: collectors.append(g._sql_stats)
+    return collectors
+
+# The start time lives on the statement's execution context, which is discarded with the statement, so a
+# statement that raises (after_cursor_execute never runs) leaves nothing behind on the pooled connection.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None: context._ltp_query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_ltp_query_start', None); elapsed = time.perf_counter() - start if start is not None else 0.0
+    for stats in _current_collectors(): stats.record(statement, elapsed)
+
+@contextlib.contextmanager
+def track_queries(max_queries=None, nplusone_threshold=None):
+    """
+    Collects QueryStats for everything executed inside the block (any thread, any request).
+    Raises QueryBudgetExceeded if more than `max_queries` statements ran, or if a statement
+    shape repeated more than `nplusone_threshold` times. Intended for query-budget checks:
+
+        with track_queries(max_queries=5):
+            client.get('/api/admin/components')
+    """
+    stats = QueryStats(); _active_trackers.append(stats)
+    try: yield stats
+    finally: _active_trackers.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        raise QueryBudgetExceeded(f"{stats.count} queries issued, budget is {max_queries}")
+    if nplusone_threshold is not None and stats.repeated(nplusone_threshold):
+        raise QueryBudgetExceeded(f"Repeated statements (N+1): {stats.repeated(nplusone_threshold)}")
+
+def init_sql_instrumentation(app):
+    """
+    Records per-request query count, DB time and repeated statement fingerprints.
+    In debug mode (or with SQL_INSTRUMENTATION_HEADERS) they are returned as X-DB-* response headers;
+    otherwise a single log line per request is written, plus a warning when an N+1 pattern is detected.
+    """
+    if str(app.config.get('SQL_INSTRUMENTATION', True)).lower() in ('0', 'false', 'no'): return
+    threshold = int(app.config.get('SQL_NPLUSONE_THRESHOLD', 5))
+    if not logger.handlers:
+        handler = logging.StreamHandler(); handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(name)s: %(message)s"))
+        logger.addHandler(handler); logger.setLevel(app.config.get('SQL_LOG_LEVEL', 'INFO'))
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_query_stats():
+        g._sql_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop('_sql_stats', None)
+        if stats is None: return response
+        repeated = stats.repeated(threshold)
+        if app.debug or app.config.get('SQL_INSTRUMENTATION_HEADERS'):
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f"{stats.total_time * 1000:.2f}"
+            if repeated: response.headers['X-DB-N-Plus-One'] = str(len(repeated))
+        else:
+            logger.info("%s %s status=%s queries=%d db_ms=%.2f", request.method, request.path, response.status_code, stats.count, stats.total_time * 1000)
+        for fp, n in repeated:
+            logger.warning("Possible N+1 on %s %s: statement issued %d times: %s", request.method, request.path, n, fp[:300])
+        return response
@@ -0,0 +1,103 @@
+import math
+import threading
+
+# ==============================================================================
+# ===                     PROMETHEUS METRICS REGISTRY                        ===
+# ==============================================================================
+# A small in-process registry of counters and histograms, rendered in the Prometheus text exposition
+# format by GET /metrics. Values are per worker process: with several gunicorn workers, each scrape is
+# answered by one of them, so scrape the workers individually or run a single worker per port.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _number(value):
+    if value == math.inf: return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name; self.help = help_text; self.labels = tuple(labels); self._values = {}; self._sources = []; self._lock = threading.Lock()
+
+    def source(self, fn):
+        """Adds fn() -> {label values: count}, read at scrape time, for counts kept elsewhere (e.g. functools cache statistics)."""
+        self._sources.append(fn); return fn
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock: values = dict(self._values)
+        for fn in self._sources:
+            for key, value in fn().items(): values[key] = values.get(key, 0) + value
+        lines.extend(f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in sorted(values.items()))
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name; self.help = help_text; self.labels = tuple(labels); self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}; self._lock = threading.Lock()  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None: series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1; break
+            series[-2] += value; series[-1] += 1
+
+    def totals(self):
+        """{label values: (sum, count)} for every series observed so far."""
+        with self._lock: return {key: (series[-2], series[-1]) for key, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock: items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count; lines.append(f"{self.name}_bucket{_label_text(self.labels, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []; self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels); self._metrics.append(metric); return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets); self._metrics.append(metric); return metric
+
+    def collector(self, fn):
+        """Registers fn() -> lines, called at scrape time for values that live elsewhere (cache statistics, queue sizes)."""
+        self._collectors.append(fn); return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics: lines.extend(metric.render())
+        for fn in self._collectors: lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("ltp_stage_duration_seconds", "Duration of each plan-generation pipeline stage.", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("ltp_stage_errors_total", "Pipeline stages that raised an error.", ["stage"])
+LLM_TOKENS = REGISTRY.histogram("ltp_llm_tokens", "Tokens per LLM call by prompt profile.", ["kind", "profile"], TOKEN_BUCKETS)
+LLM_SECONDS = REGISTRY.histogram("ltp_llm_call_duration_seconds", "Duration of the plan-generation LLM call by prompt profile.", ["profile"])
+GENERATIONS = REGISTRY.counter("ltp_generations_total", "Plan generation requests by outcome.", ["outcome"])
+CACHE_EVENTS = REGISTRY.counter("ltp_cache_requests_total", "Cache lookups by result.", ["cache", "result"])
+HTTP_SECONDS = REGISTRY.histogram("ltp_http_request_duration_seconds", "HTTP request latency by endpoint.", ["method", "endpoint", "status"])
@@ -0,0 +1,32 @@
+from sqlalchemy import inspect, text
+
+from .models import db, PlanVariant
+from .search import ensure_search_index
+
+def upgrade_schema():
+    """
+    Brings an existing database up to date with the models.
+    `db.create_all()` only creates missing tables, so columns and indexes that were
+    added to existing models later are created here, as is the saved-plan search index.
+    Only additive changes are applied, except to plan_variant, whose rows live an hour at most:
+    a table with the earlier layout (guides in guide_blob) is dropped and recreated.
+    Must be called inside an application context.
+    """
+    inspector = inspect(db.engine)
+    if inspector.has_table(PlanVariant.__tablename__) and "guide_id" in {c['name'] for c in inspector.get_columns(PlanVariant.__tablename__)}:
+        print("Recreating table plan_variant"); PlanVariant.__table__.drop(db.engine)
+    db.create_all()
+    inspector = inspect(db.engine); quote = db.engine.dialect.identifier_preparer.quote
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns: continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                print(f"Adding column {table.name}.{column.name}")
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            existing_indexes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    print(f"Creating index {index.name}"); index.create(conn)
+        ensure_search_index(conn)
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
+from .passwords import hash_password, verify_password, needs_rehash
+
 db = SQLAlchemy()
 
 # --- Original User, Plan, and Logging Models (Unchanged) ---
@@ -11,7 +12,7 @@ class User(UserMixin, db.Model):
     first_name = db.Column(db.String(80), nullable=False)
     last_name = db.Column(db.String(80), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     city = db.Column(db.String(100))
     country = db.Column(db.String(100))
     role = db.Column(db.String(20), default='teacher', nullable=False)
@@ -21,20 +22,28 @@ class User(UserMixin, db.Model):
     activity_logs = db.relationship('ActivityLog', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """Re-hashes a just-verified password if it was stored with an outdated algorithm or cost. Returns True if it changed."""
+        if not needs_rehash(self.password_hash): return False
+        self.set_password(password); return True
 
 class Plan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=False, default="")  # Legacy inline markdown; empty once the plan lives in a GuideBlob
+    guide_id = db.Column(db.Integer, db.ForeignKey('guide_blob.id'), nullable=True, index=True)
+    selections = db.Column(db.JSON, nullable=True)  # The chatbot selections the guide was generated for, used to render it
     age_cohort = db.Column(db.String(50))
     subject = db.Column(db.String(100))
     play_type = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    __table_args__ = (db.Index('ix_plan_user_created', 'user_id', 'created_at', 'id'),)
 
 class KnowledgeBase(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,10 +51,16 @@ class KnowledgeBase(db.Model):
     content = db.Column(db.Text, nullable=False)
 
 class ActivityLog(db.Model):
+    """An audit event. The description shown to admins is rendered from `action_code` and `payload` (see events.py)."""
     id = db.Column(db.Integer, primary_key=True)
-    action = db.Column(db.String(200), nullable=False)
+    action = db.Column(db.String(200), nullable=False, default="")  # Legacy free-form description; empty for structured events
+    action_code = db.Column(db.String(40), nullable=False, default="legacy")
+    payload = db.Column(db.JSON, nullable=True)
+    plan_id = db.Column(db.Integer, db.ForeignKey('plan.id', ondelete='SET NULL'), nullable=True)
+    request_id = db.Column(db.String(64), nullable=True)  # X-Request-ID of the request that logged it; matches the trace_id in TRACE_FILE
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    __table_args__ = (db.Index('ix_activity_log_timestamp', 'timestamp'), db.Index('ix_activity_log_user_timestamp', 'user_id', 'timestamp'))
 
 # ==============================================================================
 # ===                  DYNAMIC DOMAIN BUILDER MODELS (V2)                    ===
@@ -90,8 +105,8 @@ class PlayType(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     context = db.Column(db.String(50), nullable=False, default="Standard")
-    age_cohorts = db.relationship('AgeCohort', secondary=playtype_agecohort_association, backref=db.backref('play_types', lazy='dynamic'))
-    domains = db.relationship('Domain', secondary=playtype_domain_association, backref=db.backref('play_types', lazy='dynamic'))
+    age_cohorts = db.relationship('AgeCohort', secondary=playtype_agecohort_association, order_by='AgeCohort.id', backref=db.backref('play_types', lazy='dynamic'))
+    domains = db.relationship('Domain', secondary=playtype_domain_association, order_by='Domain.id', backref=db.backref('play_types', lazy='dynamic'))
     def to_dict(self):
         return {"id": self.id, "name": self.name, "description": self.description, "context": self.context,
             "age_cohort_ids": [ac.id for ac in self.age_cohorts], "domain_ids": [d.id for d in self.domains]}
@@ -118,10 +133,11 @@ class Resource(db.Model):
     title = db.Column(db.String(200), nullable=False)
     resource_type = db.Column(db.String(50), nullable=False)  # e.g., "PDF", "Web Link", "Text"
     content_path = db.Column(db.String(255), nullable=True)  # Path to file or URL
+    content_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)  # SHA-256 of uploaded files
     
     # Many-to-Many relationships for tagging
-    domains = db.relationship('Domain', secondary=resource_domain_association, backref=db.backref('resources', lazy='dynamic'))
-    age_cohorts = db.relationship('AgeCohort', secondary=resource_age_cohort_association, backref=db.backref('resources', lazy='dynamic'))
+    domains = db.relationship('Domain', secondary=resource_domain_association, order_by='Domain.id', backref=db.backref('resources', lazy='dynamic'))
+    age_cohorts = db.relationship('AgeCohort', secondary=resource_age_cohort_association, order_by='AgeCohort.id', backref=db.backref('resources', lazy='dynamic'))
 
     def to_dict(self):
         return {
@@ -129,6 +145,7 @@ class Resource(db.Model):
             "title": self.title,
             "resource_type": self.resource_type,
             "content_path": self.content_path,
+            "content_hash": self.content_hash,
             "domain_ids": [d.id for d in self.domains],
             "age_cohort_ids": [ac.id for ac in self.age_cohorts]
         }
@@ -140,6 +157,83 @@ class FeedbackLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)  # 1 for good, -1 for bad
     selections = db.Column(db.JSON, nullable=False) # The inputs to the model
-    generated_output = db.Column(db.JSON, nullable=False) # The JSON output from the model
+    generated_output = db.Column(db.JSON, nullable=True) # Legacy inline copy of the model output; JSON null once it lives in a GuideBlob
+    guide_id = db.Column(db.Integer, db.ForeignKey('guide_blob.id'), nullable=True, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
\ No newline at end of file
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+class PlanVariant(db.Model):
+    """One guide of a multi-variant generation, held for the login session that asked for it (see variants.py)."""
+    __tablename__ = 'plan_variant'
+    id = db.Column(db.Integer, primary_key=True)
+    batch = db.Column(db.String(32), nullable=False, index=True)  # Random id of the generation, kept in the Flask session
+    position = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    profile_key = db.Column(db.String(100), nullable=False)  # The prompt profile ("name@version") that generated it
+    selections = db.Column(db.JSON, nullable=False)  # Same shape as FeedbackLog.selections
+    data = db.Column(db.LargeBinary, nullable=False)  # The guide as zlib-compressed JSON; it enters guide storage only once rated or saved
+    served_at = db.Column(db.DateTime, nullable=True)  # Set once the variant has been shown
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+# ==============================================================================
+# ===                  CONTENT-ADDRESSED GUIDE STORAGE                       ===
+# ==============================================================================
+class GuideBlob(db.Model):
+    """An immutable, zlib-compressed JSON document (a structured guide or a markdown plan), stored once per distinct content."""
+    __tablename__ = 'guide_blob'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, index=True, nullable=False)  # Hash of the canonical JSON
+    data = db.Column(db.LargeBinary, nullable=False)
+    raw_size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class GuideSearchText(db.Model):
+    """The searchable text of a blob that saved plans reference, stored once however many plans share the blob (see search.py)."""
+    __tablename__ = 'guide_search_text'
+    guide_id = db.Column(db.Integer, db.ForeignKey('guide_blob.id', ondelete='CASCADE'), primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+
+# ==============================================================================
+# ===                          ANALYTICS ROLLUPS                             ===
+# ==============================================================================
+# Maintained incrementally by the activity-log writer (see analytics.py); admin dashboards read only these.
+# On SQLite they are WITHOUT ROWID tables, so a date-range read walks the primary key without a second lookup per row.
+class UsageRollup(db.Model):
+    """Generations and ratings per day and curriculum selection. Unknown dimensions are stored as ''."""
+    __tablename__ = 'usage_rollup'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = db.Column(db.Date, primary_key=True)
+    age_cohort = db.Column(db.String(50), primary_key=True, default='')
+    domain = db.Column(db.String(100), primary_key=True, default='')
+    component = db.Column(db.String(200), primary_key=True, default='')
+    play_type = db.Column(db.String(100), primary_key=True, default='')
+    generations = db.Column(db.Integer, nullable=False, default=0)
+    positive_ratings = db.Column(db.Integer, nullable=False, default=0)
+    negative_ratings = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyActivity(db.Model):
+    """Distinct active users and logged events per day, plus the day's usage_rollup totals so that daily series read one row per day."""
+    __tablename__ = 'daily_activity'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = db.Column(db.Date, primary_key=True)
+    active_users = db.Column(db.Integer, nullable=False, default=0)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    generations = db.Column(db.Integer, nullable=False, default=0)
+    positive_ratings = db.Column(db.Integer, nullable=False, default=0)
+    negative_ratings = db.Column(db.Integer, nullable=False, default=0)
+
+class ActiveUserDay(db.Model):
+    """One row per user per day with activity; lets DailyActivity.active_users count each user once."""
+    __tablename__ = 'active_user_day'
+    __table_args__ = {'sqlite_with_rowid': False}
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+
+# ==============================================================================
+# ===                    CACHE INVALIDATION BOOKKEEPING                      ===
+# ==============================================================================
+class DataVersion(db.Model):
+    """A monotonically increasing version per cached collection, bumped in the same transaction as every write to it."""
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
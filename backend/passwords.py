@@ -0,0 +1,91 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# ==============================================================================
+# ===                     PASSWORD HASHING SERVICE                           ===
+# ==============================================================================
+# Password KDFs are deliberately CPU-heavy. Running them on request threads lets a login wave
+# starve every other endpoint, so hashes are computed in a bounded pool of worker processes.
+#
+#   PASSWORD_HASH_METHOD   "bcrypt", or any werkzeug method such as "scrypt" or "pbkdf2:sha256:600000"
+#   PASSWORD_BCRYPT_ROUNDS bcrypt cost factor (log2 of the work)
+#   PASSWORD_HASH_WORKERS  size of the process pool; 0 hashes inline on the calling thread
+#
+# Hashes made with another method or cost still verify, and `needs_rehash()` reports them
+# so that they can be upgraded after a successful login.
+
+_settings = {"method": "scrypt", "bcrypt_rounds": 12, "workers": min(4, os.cpu_count() or 1)}
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def init_app(app):
+    configure(method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+              bcrypt_rounds=int(app.config.get('PASSWORD_BCRYPT_ROUNDS', 12)),
+              workers=int(app.config.get('PASSWORD_HASH_WORKERS', _settings["workers"])))
+
+def configure(method=None, bcrypt_rounds=None, workers=None):
+    global _executor
+    if method is not None: _settings["method"] = method
+    if bcrypt_rounds is not None: _settings["bcrypt_rounds"] = bcrypt_rounds
+    if workers is not None and workers != _settings["workers"]:
+        _settings["workers"] = workers
+        with _executor_lock:
+            if _executor is not None: _executor.shutdown(wait=False); _executor = None
+    _current_prefix.cache_clear()
+
+# --- Work functions: top-level so they can be pickled into the worker processes ---
+def _hash(password, method, bcrypt_rounds):
+    if method == 'bcrypt': return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(bcrypt_rounds)).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+def _verify(password_hash, password):
+    if password_hash.startswith('$2'): return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+    return check_password_hash(password_hash, password)
+
+def _run(fn, *args):
+    if _settings["workers"] <= 0: return fn(*args)
+    return _get_executor().submit(fn, *args).result()
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Created lazily and per process, so forked web workers never share a pool.
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(max_workers=_settings["workers"], mp_context=_mp_context())
+                _executor_pid = os.getpid()
+    return _executor
+
+def _mp_context():
+    # Never fork the multi-threaded web server itself. The fork server imports the main module once
+    # and forks workers from that clean, single-threaded copy; Windows only has "spawn".
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+# --- Public API ---
+def hash_password(password):
+    return _run(_hash, password, _settings["method"], _settings["bcrypt_rounds"])
+
+def verify_password(password_hash, password):
+    if not password_hash or password is None: return False
+    return _run(_verify, password_hash, password)
+
+@lru_cache(maxsize=1)
+def _current_prefix():
+    """The parameter prefix that werkzeug writes for the configured method, e.g. 'scrypt:32768:8:1'."""
+    return generate_password_hash("", method=_settings["method"]).split('$', 1)[0]
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different algorithm or cost than the one currently configured."""
+    if not password_hash: return False
+    if password_hash.startswith('$2'):
+        return _settings["method"] != 'bcrypt' or int(password_hash.split('$')[2]) != _settings["bcrypt_rounds"]
+    if _settings["method"] == 'bcrypt': return True
+    return password_hash.split('$', 1)[0] != _current_prefix()
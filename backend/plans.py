@@ -0,0 +1,43 @@
+import base64
+import datetime
+from sqlalchemy import or_, and_, func
+
+from .models import db, Plan
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Columns returned by the listing; the (potentially large) content is only served by the detail endpoint.
+PLAN_METADATA_COLUMNS = (Plan.id, Plan.title, Plan.age_cohort, Plan.subject, Plan.play_type, Plan.created_at)
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+def encode_cursor(created_at, plan_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{plan_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        created_at, plan_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(plan_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+def plan_metadata(row):
+    return {"id": row.id, "title": row.title, "age_cohort": row.age_cohort, "subject": row.subject, "play_type": row.play_type, "created_at": row.created_at.strftime('%Y-%m-%d %H:%M')}
+
+def list_plans_page(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of a user's plans, newest first, as metadata only.
+    Uses keyset pagination on (created_at, id), served by the ix_plan_user_created index,
+    so every page costs the same regardless of how deep into the list it is.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.session.query(*PLAN_METADATA_COLUMNS).filter(Plan.user_id == user_id)
+    if cursor:
+        created_at, plan_id = decode_cursor(cursor)
+        query = query.filter(or_(Plan.created_at < created_at, and_(Plan.created_at == created_at, Plan.id < plan_id)))
+    rows = query.order_by(Plan.created_at.desc(), Plan.id.desc()).limit(limit + 1).all()
+    page = {"plans": [plan_metadata(r) for r in rows[:limit]], "next_cursor": encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None}
+    if not cursor: page["total"] = db.session.query(func.count(Plan.id)).filter(Plan.user_id == user_id).scalar()
+    return page
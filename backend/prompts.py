@@ -0,0 +1,122 @@
+import json
+from functools import lru_cache
+from collections import namedtuple
+from langchain.prompts import ChatPromptTemplate
+
+# ==============================================================================
+# ===                    VERSIONED PROMPT PROFILES                           ===
+# ==============================================================================
+# A profile is a named, versioned prompt template for plan generation. PROMPT_PROFILE picks the default;
+# a generate-plan request may name another one in "prompt_profile". PROMPT_PROFILES_FILE may point at a
+# JSON file of extra or replacement profiles, so prompts can be changed and rolled out without a code change:
+#
+#   {"lean": {"version": 2, "description": "...", "format_instructions": false, "template": "... {expert_context} ..."}}
+#
+# Templates may use the variables in TEMPLATE_VARIABLES. `format_instructions: true` appends the
+# PydanticOutputParser schema text. The model is already bound to the TeacherGuide tool, whose declaration
+# carries the same schema, so with that flag every call pays for the schema twice.
+# Any change to a template must come with a new version: `key` ("lean@2") identifies the prompt in generation
+# events, metrics and the X-Prompt-Profile response header, and it must be part of any cache of generated guides.
+
+DEFAULT_PROFILE = "detailed"
+TEMPLATE_VARIABLES = {"age_cohort", "subject", "sub_domain", "play_type_name", "play_type_context", "expert_context", "sources", "format_instructions"}
+
+class PromptProfile(namedtuple("PromptProfile", ["name", "version", "template", "format_instructions", "description"])):
+    @property
+    def key(self): return f"{self.name}@{self.version}"
+
+    def prompt_template(self): return _compile(self.template)
+
+@lru_cache(maxsize=32)
+def _compile(template): return ChatPromptTemplate.from_template(template)
+
+# The prompt as it was sent before profiles existed, byte for byte (including the schema text).
+DETAILED_TEMPLATE = """
+            You are an award-winning Early Childhood Education curriculum designer with 20 years of experience, specializing in play-based learning and socio-emotional development. Your task is to create an exceptionally detailed, practical, and comprehensive teacher guide. The user is a teacher who needs clear, step-by-step, actionable guidance. Your tone should be supportive, knowledgeable, and inspiring.
+
+            You MUST return a JSON object that strictly follows the provided schema.
+
+            **USER REQUEST:**
+            *   Age Cohort: {age_cohort}
+            *   Domain: {subject}
+            *   Component: {sub_domain}
+            *   Play Type: {play_type_name}
+            *   Special Context: {play_type_context}
+            
+            **EXPERT-WRITTEN CONTEXT FROM YOUR ORGANIZATION'S RESOURCE LIBRARY:**
+            ---
+            {expert_context}
+            ---
+
+            **CRITICAL INSTRUCTIONS FOR QUALITY:**
+            1.  **Prioritize the Expert Context:** You MUST base your generated activity, facilitation guidance, and outcomes on the information provided in the "EXPERT-WRITTEN CONTEXT". Do not use generic information unless no context is provided.
+            2.  **Cite Your Sources:** In the 'activity_description', you MUST mention which source document(s) from the context inspired the activity. The available sources are: {sources}.
+            3.  **Be Comprehensive and Step-by-Step:** Each section must be detailed. Avoid short, one-sentence answers. The facilitation guidance and setup instructions should be a clear sequence of actions.
+            4.  **Be Practical:** The materials should be low-cost. The facilitation guidance should include exact, open-ended questions a teacher can use.
+            5.  **Create a High-Quality Rubric:** The 'assessment_rubric' is crucial. The descriptions for 'Emerging', 'Developing', and 'Secure' MUST be concrete, observable behaviors (e.g., "Child points to one object when asked 'how many?'"), not abstract concepts (e.g., "Child understands numbers").
+            6.  **Context Integration:** If the Special Context is 'Green Play' or 'Climate Vulnerability', this theme MUST be deeply and creatively woven into the activity description, materials, and facilitation guidance.
+
+            **Output Schema:**
+            {format_instructions}
+"""
+
+LEAN_TEMPLATE = """You are an award-winning early childhood curriculum designer specializing in play-based learning and socio-emotional development. Write an exceptionally detailed, practical teacher guide with clear, step-by-step, actionable guidance, in a supportive and inspiring tone. Return it by calling the TeacherGuide tool.
+
+Request: age cohort {age_cohort}; domain {subject}; component {sub_domain}; play type {play_type_name}; special context {play_type_context}.
+
+Expert-written context from the organization's resource library:
+---
+{expert_context}
+---
+
+Rules:
+1. Base the activity, facilitation guidance and outcomes on the expert context; use general knowledge only if none is given.
+2. In activity_description, name the source document(s) that inspired the activity. Available sources: {sources}.
+3. Make every section detailed. Setup and facilitation guidance are numbered sequences of actions.
+4. Use low-cost materials and give the exact open-ended questions a teacher can ask.
+5. Rubric levels (Emerging, Developing, Secure) describe concrete, observable behaviours, e.g. "Child points to one object when asked 'how many?'", not abstract understanding.
+6. If the special context is 'Green Play' or 'Climate Vulnerability', weave it deeply into the activity, materials and facilitation.
+"""
+
+BUILTIN_PROFILES = {
+    "detailed": PromptProfile("detailed", 1, DETAILED_TEMPLATE, True, "Original long-form prompt, with the JSON schema repeated in the prompt text."),
+    "lean": PromptProfile("lean", 1, LEAN_TEMPLATE, False, "The same instructions, condensed; the schema comes only from the tool declaration."),
+}
+
+class UnknownPromptProfile(Exception):
+    pass
+
+class PromptRegistry:
+    def __init__(self, profiles, default):
+        self.profiles = dict(profiles)
+        if default not in self.profiles: raise ValueError(f"PROMPT_PROFILE '{default}' is not one of: {', '.join(sorted(self.profiles))}")
+        self.default = default
+
+    @classmethod
+    def from_config(cls, config):
+        """The built-in profiles, overridden or extended by PROMPT_PROFILES_FILE, with PROMPT_PROFILE as the default."""
+        profiles = dict(BUILTIN_PROFILES); path = config.get("PROMPT_PROFILES_FILE")
+        if path:
+            with open(path, encoding="utf-8") as f: profiles.update(parse_profiles(json.load(f)))
+        return cls(profiles, config.get("PROMPT_PROFILE") or DEFAULT_PROFILE)
+
+    def get(self, name=None):
+        if name is not None and not isinstance(name, str): raise UnknownPromptProfile(f"Prompt profile must be a name, got {type(name).__name__}")
+        profile = self.profiles.get(name or self.default)
+        if profile is None: raise UnknownPromptProfile(f"Unknown prompt profile '{name}'. Available: {', '.join(sorted(self.profiles))}")
+        return profile
+
+    def describe(self):
+        return [{"name": p.name, "version": p.version, "key": p.key, "description": p.description, "format_instructions": p.format_instructions, "default": p.name == self.default}
+                for p in sorted(self.profiles.values(), key=lambda p: p.name)]
+
+def parse_profiles(doc):
+    """{name: {"version", "template", "format_instructions", "description"}} -> {name: PromptProfile}. Raises ValueError on a bad entry."""
+    profiles = {}
+    for name, entry in doc.items():
+        if not isinstance(entry, dict) or not isinstance(entry.get("template"), str) or not isinstance(entry.get("version"), int):
+            raise ValueError(f"Prompt profile '{name}' needs an integer 'version' and a string 'template'")
+        unknown = set(_compile(entry["template"]).input_variables) - TEMPLATE_VARIABLES
+        if unknown: raise ValueError(f"Prompt profile '{name}' uses unknown variables: {', '.join(sorted(unknown))}")
+        profiles[name] = PromptProfile(name, entry["version"], entry["template"], bool(entry.get("format_instructions", False)), entry.get("description", ""))
+    return profiles
@@ -6,6 +6,9 @@ from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain_core.documents import Document
 import google.generativeai as genai
 
+from .tracing import stage, record_stage
+from .retrieval_service import RetrievalClient
+
 # --- Configuration ---
 VECTORSTORE_PATH = "./chroma_db"
 TEXT_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
@@ -14,6 +17,12 @@ TEXT_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=20
 # We use placeholders here. The actual objects will be created on demand.
 _vectorstore = None
 _embedding_model = None
+_service = None  # RetrievalClient when RETRIEVAL_SERVICE_URL is set; the index then lives in the retrieval service
+
+def init_app(app):
+    global _service
+    url = app.config.get('RETRIEVAL_SERVICE_URL')
+    _service = RetrievalClient(url, timeout=float(app.config.get('RETRIEVAL_SERVICE_TIMEOUT', 120))) if url else None
 
 def _initialize_rag():
     """
@@ -47,7 +56,13 @@ def get_vectorstore():
     return _vectorstore
 
 def add_resource_to_vectorstore(resource_id, title, content_path, resource_type, domain_names, age_cohort_names):
-    """Loads, chunks, and embeds a resource, then adds it to the vector store."""
+    """Loads, chunks, and embeds a resource, then adds it to the vector store (in the retrieval service, if one is configured)."""
+    resource = dict(resource_id=resource_id, title=title, content_path=content_path, resource_type=resource_type, domain_names=domain_names, age_cohort_names=age_cohort_names)
+    if _service is None: return add_resource_locally(**resource)
+    result = _service.ingest(**resource)
+    print(f"Retrieval service added {result['chunks']} chunks for resource '{title}'."); return result["chunks"]
+
+def add_resource_locally(resource_id, title, content_path, resource_type, domain_names, age_cohort_names):
     print(f"Processing resource for vector store: {title}")
     
     docs = []
@@ -61,7 +76,7 @@ def add_resource_to_vectorstore(resource_id, title, content_path, resource_type,
         docs = [Document(page_content=content_path)]
     
     if not docs:
-        print(f"Could not load document for resource: {title}. Skipping vectorization."); return
+        print(f"Could not load document for resource: {title}. Skipping vectorization."); return 0
 
     chunks = TEXT_SPLITTER.split_documents(docs)
     for chunk in chunks:
@@ -73,16 +88,43 @@ def add_resource_to_vectorstore(resource_id, title, content_path, resource_type,
     vectorstore = get_vectorstore()
     vectorstore.add_documents(chunks)
     print(f"Successfully added {len(chunks)} chunks for resource '{title}' to vector store.")
+    return len(chunks)
+
+def embed_queries(queries):
+    """Embeds several queries with one embedding call (the retrieval service's batches)."""
+    _initialize_rag()
+    return _embedding_model.embed_documents(list(queries), task_type="retrieval_query")
+
+def search_by_vector(embedding):
+    """MMR over the 20 nearest chunks, 4 returned."""
+    return get_vectorstore().max_marginal_relevance_search_by_vector(embedding, k=4, fetch_k=20)
+
+def assemble_context(docs):
+    context = "\n\n---\n\n".join([doc.page_content for doc in docs])
+    sources = list(set([doc.metadata.get('title', 'Unknown Source') for doc in docs]))
+    return context, sources
 
 def retrieve_relevant_context(query):
-    """Queries the vector store to find relevant context."""
-    vectorstore = get_vectorstore()
-    retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs={'k': 4})
-    
-    relevant_docs = retriever.invoke(query)
-    
-    context = "\n\n---\n\n".join([doc.page_content for doc in relevant_docs])
-    sources = list(set([doc.metadata.get('title', 'Unknown Source') for doc in relevant_docs]))
+    """Queries the vector store to find relevant context (MMR over the 20 nearest chunks, 4 returned)."""
+    if _service is not None: return _retrieve_from_service(query)
+    with stage("vector_store_init"): get_vectorstore()
+    # Embedding and search run as separate steps so that each is timed; together they are what the MMR retriever does.
+    with stage("embed_query", chars=len(query)): embedding = _embedding_model.embed_query(query)
+    with stage("vector_search", k=4, fetch_k=20) as span:
+        relevant_docs = search_by_vector(embedding)
+        span["chunks"] = len(relevant_docs)
+
+    with stage("context_assembly") as span:
+        context, sources = assemble_context(relevant_docs)
+        span.update(context_chars=len(context), sources=len(sources))
 
     print(f"Retrieved {len(relevant_docs)} chunks from sources: {sources}")
-    return context, sources
\ No newline at end of file
+    return context, sources
+
+def _retrieve_from_service(query):
+    with stage("retrieval_service", chars=len(query)) as span:
+        result = _service.query(query); timings = result["timings"]
+        span.update(batch=timings["batch"], chunks=timings["chunks"], sources=len(result["sources"]))
+    # The service's own timings go into the same stage histograms as a local retrieval.
+    record_stage("embed_query", timings["embed_query"], batch=timings["batch"]); record_stage("vector_search", timings["vector_search"], chunks=timings["chunks"])
+    return result["context"], result["sources"]
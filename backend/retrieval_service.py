@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# ==============================================================================
+# ===                  RETRIEVAL SERVICE (OPTIONAL, ONE PER HOST)            ===
+# ==============================================================================
+# By default every web worker opens ./chroma_db and its own embedding client, so memory grows with the
+# worker count and an ingest in one worker races with queries in the others. With RETRIEVAL_SERVICE_URL
+# set, a single process owns the index instead and the workers talk to it through RetrievalClient:
+#
+#   python -m backend.retrieval_service --listen unix:///run/ltp/retrieval.sock   (or http://127.0.0.1:5002)
+#
+#   POST /query   {"query": "..."}                            -> {"context", "sources", "timings"}
+#   POST /ingest  {the add_resource_to_vectorstore arguments} -> {"chunks", "timings"}
+#   GET  /health                                              -> status and batching counters
+#
+# Queries that arrive while an embedding call is in flight are embedded together in the next call
+# (up to --max-batch; --batch-window-ms waits a little longer for company). Searches run on the request
+# threads. Ingests are serialized, and they are the only writes to the index.
+
+class RetrievalServiceError(Exception):
+    pass
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout); self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); self.sock.settimeout(self.timeout); self.sock.connect(self.socket_path)
+
+class RetrievalClient:
+    """Thin client for the retrieval service; keeps one connection per calling thread."""
+    def __init__(self, url, timeout=120):
+        self.url = url; parts = urlsplit(url); self._local = threading.local()
+        if parts.scheme == "unix": self._connect = lambda: _UnixHTTPConnection(parts.path, timeout)
+        elif parts.scheme == "http": self._connect = lambda: http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+        else: raise ValueError(f"RETRIEVAL_SERVICE_URL must start with unix:// or http://, got {url!r}")
+
+    # A kept-alive connection the service has closed in the meantime fails like this before any response arrives.
+    STALE_CONNECTION = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def _request(self, method, path, payload=None, retry=True):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        for attempt in (1, 2):
+            conn = getattr(self._local, "conn", None); reused = conn is not None; response = None
+            if conn is None: conn = self._local.conn = self._connect()
+            try:
+                conn.request(method, path, body, {"Content-Type": "application/json"} if body else {})
+                response = conn.getresponse(); data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close(); self._local.conn = None
+                # Retried once on a fresh connection only when the request cannot have been processed yet: never after
+                # a timeout or once a response has started, since the service may still be working on (or have done) it.
+                if retry and reused and attempt == 1 and response is None and isinstance(e, self.STALE_CONNECTION): continue
+                raise RetrievalServiceError(f"Retrieval service at {self.url} is unreachable: {e}") from e
+            result = json.loads(data) if data else {}
+            if response.status != 200: raise RetrievalServiceError(result.get("error") or f"Retrieval service returned {response.status}")
+            return result
+
+    def query(self, query): return self._request("POST", "/query", {"query": query})
+    def ingest(self, **resource): return self._request("POST", "/ingest", resource, retry=False)  # not idempotent: a repeat would embed the resource twice
+    def health(self): return self._request("GET", "/health")
+
+class QueryBatcher:
+    """Embeds the queries waiting at the same moment with one embedding call, on a single background thread."""
+    def __init__(self, embed_many, max_batch=32, window=0.0):
+        self.embed_many = embed_many; self.max_batch = max_batch; self.window = window
+        self.queries = 0; self.batches = 0; self.largest_batch = 0
+        self._pending = []; self._cond = threading.Condition()
+        threading.Thread(target=self._run, name="query-batcher", daemon=True).start()
+
+    def embed(self, query):
+        """Returns (embedding, seconds spent in the embedding call, size of the batch it was part of)."""
+        item = {"query": query, "done": threading.Event()}
+        with self._cond: self._pending.append(item); self._cond.notify()
+        item["done"].wait()
+        if "error" in item: raise item["error"]
+        return item["embedding"], item["seconds"], item["batch"]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending: self._cond.wait()
+            if self.window: time.sleep(self.window)
+            with self._cond: batch = self._pending[:self.max_batch]; del self._pending[:self.max_batch]
+            start = time.perf_counter()
+            try:
+                embeddings = self.embed_many([item["query"] for item in batch]); seconds = time.perf_counter() - start
+                for item, embedding in zip(batch, embeddings): item.update(embedding=embedding, seconds=seconds, batch=len(batch))
+            except Exception as e:
+                for item in batch: item["error"] = e
+            finally:
+                self.queries += len(batch); self.batches += 1; self.largest_batch = max(self.largest_batch, len(batch))
+                for item in batch: item["done"].set()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: each web worker thread reuses its connection
+
+    def address_string(self): return self.client_address[0] if self.client_address else "unix"
+    def log_message(self, format, *args):
+        if self.server.verbose: super().log_message(format, *args)
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status); self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(data))); self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health": return self._reply(404, {"error": "Not Found"})
+        batcher = self.server.batcher
+        self._reply(200, {"status": "ok", "pid": os.getpid(), "queries": batcher.queries, "embedding_calls": batcher.batches, "largest_batch": batcher.largest_batch, "ingests": self.server.ingests})
+
+    def do_POST(self):
+        try: payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError: return self._reply(400, {"error": "Invalid JSON"})
+        try:
+            if self.path == "/query": return self._reply(200, self.server.query(payload["query"]))
+            if self.path == "/ingest": return self._reply(200, self.server.ingest(payload))
+            return self._reply(404, {"error": "Not Found"})
+        except KeyError as e: return self._reply(400, {"error": f"Missing field {e}"})
+        except Exception as e:
+            print(f"Retrieval service error on {self.path}: {e}"); return self._reply(500, {"error": str(e)})
+
+class _ServiceMixin:
+    daemon_threads = True
+
+    def setup_service(self, max_batch, window, verbose):
+        from . import rag_setup
+        self.rag = rag_setup; self.batcher = QueryBatcher(rag_setup.embed_queries, max_batch, window)
+        self.ingests = 0; self.verbose = verbose; self._write_lock = threading.Lock()
+
+    def query(self, query):
+        embedding, embed_seconds, batch = self.batcher.embed(query)
+        start = time.perf_counter(); docs = self.rag.search_by_vector(embedding); search_seconds = time.perf_counter() - start
+        context, sources = self.rag.assemble_context(docs)
+        return {"context": context, "sources": sources, "timings": {"embed_query": embed_seconds, "vector_search": search_seconds, "batch": batch, "chunks": len(docs)}}
+
+    def ingest(self, resource):
+        with self._write_lock:
+            start = time.perf_counter(); chunks = self.rag.add_resource_locally(**resource); self.ingests += 1
+        return {"chunks": chunks, "timings": {"ingest": time.perf_counter() - start}}
+
+class RetrievalHTTPServer(_ServiceMixin, ThreadingHTTPServer):
+    pass
+
+class RetrievalUnixServer(_ServiceMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    def server_bind(self):
+        if os.path.exists(self.server_address): os.unlink(self.server_address)  # a socket file left by a previous run
+        super().server_bind(); os.chmod(self.server_address, 0o660)
+
+def make_server(url, max_batch=32, window=0.0, verbose=False):
+    """Binds the service to `url` (unix:///path or http://host:port) without starting it."""
+    parts = urlsplit(url)
+    if parts.scheme == "unix": server = RetrievalUnixServer(parts.path, _Handler)
+    elif parts.scheme == "http": server = RetrievalHTTPServer((parts.hostname, parts.port or 80), _Handler)
+    else: raise ValueError(f"--listen must start with unix:// or http://, got {url!r}")
+    server.setup_service(max_batch, window, verbose); return server
+
+def main(argv=None):
+    from dotenv import dotenv_values
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    # The same precedence as the web app: real environment variables over the .env file.
+    config = {**dotenv_values(os.path.join(project_root, '.env')), **os.environ}
+    parser = argparse.ArgumentParser(description="Serve the resource index to the web workers.")
+    parser.add_argument("--listen", default=config.get("RETRIEVAL_SERVICE_URL"), help="unix:///path/to.sock or http://127.0.0.1:5002 (default RETRIEVAL_SERVICE_URL)")
+    parser.add_argument("--max-batch", type=int, default=int(config.get("RETRIEVAL_MAX_BATCH", 32)), help="most queries embedded in one call")
+    parser.add_argument("--batch-window-ms", type=float, default=float(config.get("RETRIEVAL_BATCH_WINDOW_MS", 0)), help="extra wait for queries to batch with")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if not args.listen: parser.error("--listen or RETRIEVAL_SERVICE_URL is required")
+    if config.get("GOOGLE_API_KEY"): os.environ.setdefault("GOOGLE_API_KEY", config["GOOGLE_API_KEY"])
+    server = make_server(args.listen, args.max_batch, args.batch_window_ms / 1000, args.verbose)
+    server.rag.get_vectorstore()  # load the index before accepting requests
+    print(f"Retrieval service listening on {args.listen} (pid {os.getpid()})"); sys.stdout.flush()
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+
+if __name__ == "__main__":
+    main()
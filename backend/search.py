@@ -0,0 +1,147 @@
+import re
+from sqlalchemy import text, or_, func, select, exists, inspect, literal_column
+from sqlalchemy.sql import table, column
+
+from .models import db, Plan, GuideSearchText
+from .guides import plan_markdown, store_search_text
+from .plans import plan_metadata, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PLAN_METADATA_COLUMNS
+
+# ==============================================================================
+# ===                      SAVED PLAN FULL-TEXT SEARCH                       ===
+# ==============================================================================
+# On SQLite, plans are indexed by an FTS5 table (`plan_fts`) over title and content. It is an
+# external-content index: the text is not stored twice. It reads from the `plan_search_source`
+# view, and triggers on `plan` and `guide_search_text` keep it in sync.
+# The view adds an `owner` column holding the token "u<user_id>". A user's search is then an
+# index intersection (`owner:u7 AND ...`) rather than a scan of every user's matching plans.
+# Other databases fall back to a case-insensitive LIKE scan of the user's plans.
+
+HIGHLIGHT_START = "**"; HIGHLIGHT_END = "**"
+SNIPPET_TOKENS = 24
+# bm25 column weights: a hit in the title counts ten times a hit in the body; owner is only a filter.
+RANK_FUNCTION = "bm25(10.0, 1.0, 0.0)"
+_TERM = re.compile(r"\w+", re.UNICODE)
+plan_fts = table("plan_fts", column("rowid"), column("rank"))
+
+# The indexed text of a plan is the guide_search_text row of its blob (it cannot be rendered in SQL from compressed
+# guide storage). That row is written once per blob, so plans sharing a guide share it too. Plans without one,
+# such as legacy inline plans, are indexed by their content; when the row is written later, the
+# guide_search_text triggers reindex every plan that references the blob.
+# The view and triggers are plain SQL, so any SQLite client can write these tables, and the FTS 'delete'
+# commands always see exactly the text that was indexed.
+PLAN_TEXT = "coalesce((SELECT text FROM guide_search_text WHERE guide_id = {t}.guide_id), {t}.content)"
+SEARCH_INDEX_OBJECTS = {"view": ["plan_search_source"], "trigger": ["plan_fts_insert", "plan_fts_delete", "plan_fts_update", "guide_text_fts_insert", "guide_text_fts_delete"]}
+SEARCH_INDEX_DDL = [
+    """CREATE VIEW IF NOT EXISTS plan_search_source AS SELECT plan.id, plan.title, coalesce(guide_search_text.text, plan.content) AS content, 'u' || plan.user_id AS owner
+       FROM plan LEFT JOIN guide_search_text ON guide_search_text.guide_id = plan.guide_id""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS plan_fts USING fts5(title, content, owner, content='plan_search_source', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER IF NOT EXISTS plan_fts_insert AFTER INSERT ON plan BEGIN
+        INSERT INTO plan_fts(rowid, title, content, owner) VALUES (new.id, new.title, {PLAN_TEXT.format(t='new')}, 'u' || new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS plan_fts_delete AFTER DELETE ON plan BEGIN
+        INSERT INTO plan_fts(plan_fts, rowid, title, content, owner) VALUES ('delete', old.id, old.title, {PLAN_TEXT.format(t='old')}, 'u' || old.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS plan_fts_update AFTER UPDATE OF title, guide_id, content, user_id ON plan BEGIN
+        INSERT INTO plan_fts(plan_fts, rowid, title, content, owner) VALUES ('delete', old.id, old.title, {PLAN_TEXT.format(t='old')}, 'u' || old.user_id);
+        INSERT INTO plan_fts(rowid, title, content, owner) VALUES (new.id, new.title, {PLAN_TEXT.format(t='new')}, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS guide_text_fts_insert AFTER INSERT ON guide_search_text BEGIN
+        INSERT INTO plan_fts(plan_fts, rowid, title, content, owner) SELECT 'delete', id, title, content, 'u' || user_id FROM plan WHERE guide_id = new.guide_id;
+        INSERT INTO plan_fts(rowid, title, content, owner) SELECT id, title, new.text, 'u' || user_id FROM plan WHERE guide_id = new.guide_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS guide_text_fts_delete AFTER DELETE ON guide_search_text BEGIN
+        INSERT INTO plan_fts(plan_fts, rowid, title, content, owner) SELECT 'delete', id, title, old.text, 'u' || user_id FROM plan WHERE guide_id = old.guide_id;
+        INSERT INTO plan_fts(rowid, title, content, owner) SELECT id, title, content, 'u' || user_id FROM plan WHERE guide_id = old.guide_id;
+    END""",
+]
+
+def backfill_search_text(conn, batch_size=500):
+    """Writes the guide_search_text rows missing for blobs that saved plans reference (plans written by bulk inserts or older versions). Returns the count."""
+    plans = Plan.__table__; texts = GuideSearchText.__table__; filled = 0; last_id = 0
+    while True:
+        blob_ids = conn.execute(select(plans.c.guide_id).distinct().where(plans.c.guide_id > last_id, ~exists().where(texts.c.guide_id == plans.c.guide_id))
+                                .order_by(plans.c.guide_id).limit(batch_size)).scalars().all()
+        if not blob_ids: return filled
+        last_id = blob_ids[-1]; filled += store_search_text(conn, blob_ids)
+
+def ensure_search_index(conn):
+    """Creates the FTS5 index, its source view and sync triggers if missing or outdated, and (re)indexes existing plans. The index is SQLite only."""
+    if "search_text" in {c['name'] for c in inspect(conn).get_columns("plan")}:
+        # Earlier versions kept a rendered copy of every plan in plan.search_text; guide_search_text replaces it.
+        if conn.dialect.name == 'sqlite':
+            for kind, names in SEARCH_INDEX_OBJECTS.items():
+                for name in names: conn.execute(text(f"DROP {kind.upper()} IF EXISTS {name}"))
+        print("Dropping column plan.search_text"); conn.execute(text("ALTER TABLE plan DROP COLUMN search_text"))
+    if conn.dialect.name != 'sqlite':
+        backfill_search_text(conn); return
+    indexed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'plan_fts'")).first()
+    view_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'plan_search_source'")).scalar()
+    outdated = indexed is not None and (view_sql is None or "guide_search_text" not in view_sql)
+    if outdated:
+        # Created by an earlier version (reading plan.content, plan.search_text or a Python SQL function): replace it.
+        for kind, names in SEARCH_INDEX_OBJECTS.items():
+            for name in names: conn.execute(text(f"DROP {kind.upper()} IF EXISTS {name}"))
+    filled = backfill_search_text(conn)  # with current triggers in place, each new row reindexes the plans that use its blob
+    for statement in SEARCH_INDEX_DDL: conn.execute(text(statement))
+    if not indexed:
+        conn.execute(text(f"INSERT INTO plan_fts(plan_fts, rank) VALUES ('rank', '{RANK_FUNCTION}')"))
+    if not indexed or outdated:
+        print("Building full-text index for saved plans")
+        conn.execute(text("INSERT INTO plan_fts(plan_fts) VALUES ('rebuild')"))
+    elif filled: print(f"Indexed the text of {filled} saved guides")
+
+def search_terms(query):
+    return _TERM.findall(query or "")[:16]
+
+def build_match_expression(user_id, terms):
+    """Turns free text into a safe FTS5 query: every term must match (the last one as a prefix, for search-as-you-type)."""
+    quoted = [f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*']
+    return f'owner:u{int(user_id)} AND {{title content}}: ({" ".join(quoted)})'
+
+def search_plans(user_id, query, age_cohort=None, subject=None, page=1, limit=DEFAULT_PAGE_SIZE):
+    """
+    Ranked full-text search over one user's plans.
+    Returns {"results": [metadata + "title_highlighted" + "snippet"], "total", "page", "next_page"}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE)); page = max(1, page); terms = search_terms(query)
+    if not terms: return {"results": [], "total": 0, "page": page, "next_page": None}
+    if db.engine.dialect.name == 'sqlite': results, total = _search_fts(user_id, terms, age_cohort, subject, page, limit)
+    else: results, total = _search_like(user_id, terms, age_cohort, subject, page, limit)
+    return {"results": results, "total": total, "page": page, "next_page": page + 1 if page * limit < total else None}
+
+def _search_fts(user_id, terms, age_cohort, subject, page, limit):
+    fts = literal_column("plan_fts")
+    conditions = [fts.op("MATCH")(build_match_expression(user_id, terms))]
+    if age_cohort: conditions.append(Plan.age_cohort == age_cohort)
+    if subject: conditions.append(Plan.subject == subject)
+    source = plan_fts.join(Plan, Plan.id == plan_fts.c.rowid)
+    rows = db.session.execute(select(*PLAN_METADATA_COLUMNS,
+            func.highlight(fts, 0, HIGHLIGHT_START, HIGHLIGHT_END).label("title_highlighted"),
+            func.snippet(fts, 1, HIGHLIGHT_START, HIGHLIGHT_END, "…", SNIPPET_TOKENS).label("snippet"))
+        .select_from(source).where(*conditions).order_by(plan_fts.c.rank).limit(limit).offset((page - 1) * limit)).all()
+    total = db.session.execute(select(func.count()).select_from(source).where(*conditions)).scalar()
+    return [_result(row, row.title_highlighted, row.snippet) for row in rows], total
+
+def _search_like(user_id, terms, age_cohort, subject, page, limit):
+    body = func.coalesce(GuideSearchText.text, Plan.content)
+    query = (db.session.query(*PLAN_METADATA_COLUMNS, Plan.content, Plan.guide_id, Plan.selections)
+             .outerjoin(GuideSearchText, GuideSearchText.guide_id == Plan.guide_id).filter(Plan.user_id == user_id))
+    for term in terms: query = query.filter(or_(Plan.title.ilike(f"%{term}%"), body.ilike(f"%{term}%")))
+    if age_cohort: query = query.filter(Plan.age_cohort == age_cohort)
+    if subject: query = query.filter(Plan.subject == subject)
+    total = query.with_entities(func.count(Plan.id)).scalar()
+    rows = query.order_by(Plan.created_at.desc(), Plan.id.desc()).offset((page - 1) * limit).limit(limit).all()
+    return [_result(row, _highlight(row.title, terms), _snippet(plan_markdown(row), terms)) for row in rows], total
+
+def _result(row, title_highlighted, snippet):
+    return {**plan_metadata(row), "title_highlighted": title_highlighted, "snippet": snippet}
+
+def _highlight(value, terms):
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    return pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", value or "")
+
+def _snippet(content, terms, width=160):
+    content = content or ""; lowered = content.lower()
+    positions = [p for p in (lowered.find(t.lower()) for t in terms) if p >= 0]
+    start = max(0, min(positions, default=0) - width // 4); end = start + width
+    return ("…" if start else "") + _highlight(content[start:end], terms) + ("…" if end < len(content) else "")
@@ -0,0 +1,30 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import db, User, Component, PlayType, Resource
+
+# Bulk serializers for the admin collections. Each one loads related rows with a fixed number
+# of queries (a JOIN for many-to-one, one SELECT ... IN per many-to-many relationship) and then
+# reuses the models' to_dict(), so the response shapes stay identical to per-row serialization.
+
+def serialize_components(ids=None):
+    query = Component.query.options(joinedload(Component.age_cohort), joinedload(Component.domain))
+    if ids is not None: query = query.filter(Component.id.in_(ids))
+    return [c.to_dict() for c in query.order_by(Component.id).all()]
+
+def serialize_play_types(ids=None):
+    query = PlayType.query.options(selectinload(PlayType.age_cohorts), selectinload(PlayType.domains))
+    if ids is not None: query = query.filter(PlayType.id.in_(ids))
+    return [pt.to_dict() for pt in query.order_by(PlayType.id).all()]
+
+def serialize_resources(ids=None):
+    query = Resource.query.options(selectinload(Resource.domains), selectinload(Resource.age_cohorts))
+    if ids is not None: query = query.filter(Resource.id.in_(ids))
+    return [r.to_dict() for r in query.order_by(Resource.id).all()]
+
+def serialize_users():
+    return [{"id": u.id, "first_name": u.first_name, "last_name": u.last_name, "email": u.email, "role": u.role}
+            for u in db.session.query(User.id, User.first_name, User.last_name, User.email, User.role).order_by(User.id)]
+
+def serialize_named(model):
+    """Age cohorts or domains: {"id", "name"} rows without loading the ORM objects."""
+    return [{"id": row.id, "name": row.name} for row in db.session.query(model.id, model.name).order_by(model.id)]
@@ -1,15 +1,20 @@
 import os
+import time
+from contextlib import nullcontext
 import requests
 import google.generativeai as genai
 
 # --- LANGCHAIN IMPORTS (Pydantic v2 compliant) ---
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from langchain.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser
 
 # --- RAG IMPORT ---
 from .rag_setup import retrieve_relevant_context
+from .tracing import stage
+from .metrics import LLM_TOKENS, LLM_SECONDS
+from .prompts import BUILTIN_PROFILES, DEFAULT_PROFILE
 
 # ==============================================================================
 # ===         LANGCHAIN STRUCTURED OUTPUT (ENHANCED SCHEMA)                  ===
@@ -39,7 +44,22 @@ class TeacherGuide(BaseModel):
 # ==============================================================================
 # ===             RAG-POWERED LANGCHAIN SERVICE FUNCTION                     ===
 # ==============================================================================
-def generate_teacher_guide(age_cohort, subject, sub_domain, play_type_name, play_type_context, api_key):
+def _usage_total(usages, field):
+    values = [usage[field] for usage in usages if usage.get(field) is not None]
+    return sum(values) if values else None
+
+def generate_teacher_guide(age_cohort, subject, sub_domain, play_type_name, play_type_context, api_key, timeout=None, max_retries=6, profile=None, stats=None):
+    """`profile` is a prompts.PromptProfile (default: the built-in default); `stats`, if given, receives the profile key, token counts and LLM time."""
+    result = generate_teacher_guides(age_cohort, subject, sub_domain, play_type_name, play_type_context, api_key, timeout, max_retries, profile, stats)
+    return result if "error" in result else result["guides"][0]
+
+def generate_teacher_guides(age_cohort, subject, sub_domain, play_type_name, play_type_context, api_key, timeout=None, max_retries=6, profile=None, stats=None, variants=1, llm_call=None):
+    """
+    {"guides": [...]} with up to `variants` guides for the same selections, or {"error": ...}.
+    The variants share one retrieval and one rendered prompt; their LLM calls run concurrently and differ through
+    sampling (temperature 0.7). Variants whose call or parsing fails are dropped, so fewer may come back.
+    `llm_call` is an admitted circuit breaker call (circuit.AdmittedCall); only the model request is measured with it.
+    """
     try:
         if not api_key or not isinstance(api_key, str):
             raise ValueError("GOOGLE_API_KEY is missing, None, or invalid.")
@@ -52,55 +72,51 @@ def generate_teacher_guide(age_cohort, subject, sub_domain, play_type_name, play
              sources = ["General Knowledge"]
 
         # --- STEP 2: AUGMENT & GENERATE ---
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite", temperature=0.7, google_api_key=api_key)
-        structured_llm = llm.with_structured_output(schema=TeacherGuide)
-
-        parser = PydanticOutputParser(pydantic_object=TeacherGuide)
-        format_instructions = parser.get_format_instructions()
-
-        # The prompt is updated with a stronger persona and more explicit instructions.
-        prompt_template = ChatPromptTemplate.from_template(
-            """
-            You are an award-winning Early Childhood Education curriculum designer with 20 years of experience, specializing in play-based learning and socio-emotional development. Your task is to create an exceptionally detailed, practical, and comprehensive teacher guide. The user is a teacher who needs clear, step-by-step, actionable guidance. Your tone should be supportive, knowledgeable, and inspiring.
-
-            You MUST return a JSON object that strictly follows the provided schema.
-
-            **USER REQUEST:**
-            *   Age Cohort: {age_cohort}
-            *   Domain: {subject}
-            *   Component: {sub_domain}
-            *   Play Type: {play_type_name}
-            *   Special Context: {play_type_context}
-            
-            **EXPERT-WRITTEN CONTEXT FROM YOUR ORGANIZATION'S RESOURCE LIBRARY:**
-            ---
-            {expert_context}
-            ---
-
-            **CRITICAL INSTRUCTIONS FOR QUALITY:**
-            1.  **Prioritize the Expert Context:** You MUST base your generated activity, facilitation guidance, and outcomes on the information provided in the "EXPERT-WRITTEN CONTEXT". Do not use generic information unless no context is provided.
-            2.  **Cite Your Sources:** In the 'activity_description', you MUST mention which source document(s) from the context inspired the activity. The available sources are: {sources}.
-            3.  **Be Comprehensive and Step-by-Step:** Each section must be detailed. Avoid short, one-sentence answers. The facilitation guidance and setup instructions should be a clear sequence of actions.
-            4.  **Be Practical:** The materials should be low-cost. The facilitation guidance should include exact, open-ended questions a teacher can use.
-            5.  **Create a High-Quality Rubric:** The 'assessment_rubric' is crucial. The descriptions for 'Emerging', 'Developing', and 'Secure' MUST be concrete, observable behaviors (e.g., "Child points to one object when asked 'how many?'"), not abstract concepts (e.g., "Child understands numbers").
-            6.  **Context Integration:** If the Special Context is 'Green Play' or 'Climate Vulnerability', this theme MUST be deeply and creatively woven into the activity description, materials, and facilitation guidance.
-
-            **Output Schema:**
-            {format_instructions}
-            """
-        )
-        
-        chain = prompt_template | structured_llm
-
-        response_obj = chain.invoke({
-            "age_cohort": age_cohort, "subject": subject, "sub_domain": sub_domain,
-            "play_type_name": play_type_name, "play_type_context": play_type_context,
-            "expert_context": expert_context,
-            "sources": sources,
-            "format_instructions": format_instructions,
-        })
-        
-        return response_obj.model_dump()
+        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-lite", temperature=0.7, google_api_key=api_key, timeout=timeout, max_retries=max_retries)
+        # What with_structured_output(TeacherGuide) builds, split so the LLM call and the parsing are timed separately.
+        tool_llm = llm.bind_tools([TeacherGuide], tool_choice=TeacherGuide.__name__)
+        tool_parser = PydanticToolsParser(tools=[TeacherGuide], first_tool_only=True)
+
+        profile = profile or BUILTIN_PROFILES[DEFAULT_PROFILE]
+        # Only profiles that ask for it repeat the schema in the prompt text; the tool declaration always carries it.
+        format_instructions = PydanticOutputParser(pydantic_object=TeacherGuide).get_format_instructions() if profile.format_instructions else ""
+
+        with stage("prompt_render", profile=profile.key) as span:
+            prompt_value = profile.prompt_template().invoke({
+                "age_cohort": age_cohort, "subject": subject, "sub_domain": sub_domain,
+                "play_type_name": play_type_name, "play_type_context": play_type_context,
+                "expert_context": expert_context,
+                "sources": sources,
+                "format_instructions": format_instructions,
+            })
+            span["prompt_chars"] = len(prompt_value.to_string())
+
+        with stage("llm", model=llm.model, profile=profile.key, variants=variants) as span, (llm_call.measure() if llm_call else nullcontext()):
+            started = time.perf_counter()
+            if variants == 1: messages = [tool_llm.invoke(prompt_value)]
+            else: messages = tool_llm.batch([prompt_value] * variants, config={"max_concurrency": variants}, return_exceptions=True)
+            llm_seconds = time.perf_counter() - started
+            failures = [m for m in messages if isinstance(m, Exception)]; messages = [m for m in messages if not isinstance(m, Exception)]
+            if not messages: raise failures[0]
+            usages = [getattr(message, "usage_metadata", None) or {} for message in messages]
+            prompt_tokens = _usage_total(usages, "input_tokens"); completion_tokens = _usage_total(usages, "output_tokens")
+            span.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, failed=len(failures))
+        LLM_SECONDS.observe(llm_seconds, profile=profile.key)
+        for usage in usages:
+            if usage.get("input_tokens") is not None: LLM_TOKENS.observe(usage["input_tokens"], kind="prompt", profile=profile.key)
+            if usage.get("output_tokens") is not None: LLM_TOKENS.observe(usage["output_tokens"], kind="completion", profile=profile.key)
+        if stats is not None: stats.update(prompt_profile=profile.key, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, llm_ms=round(llm_seconds * 1000))
+
+        with stage("parse"):
+            guides = []
+            for message in messages:
+                try: response_obj = tool_parser.invoke(message)
+                except Exception as e: failures.append(e); continue
+                if response_obj is not None: guides.append(response_obj.model_dump())
+            if not guides: raise failures[0] if failures else ValueError("The LLM response did not contain a TeacherGuide.")
+        if failures: print(f"Dropped {len(failures)} of {variants} plan variants: {failures[0]}")
+
+        return {"guides": guides}
 
     except Exception as e:
         print(f"FATAL Error in LangChain service: {e}")
@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import contextlib
+from contextvars import ContextVar
+from flask import g, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .metrics import STAGE_SECONDS, STAGE_ERRORS, HTTP_SECONDS
+
+# ==============================================================================
+# ===                    REQUEST IDS AND PIPELINE TRACING                    ===
+# ==============================================================================
+# Every request gets a request ID. It is taken from a well-formed X-Request-ID header or generated,
+# returned in the response header, and stored on the ActivityLog rows the request writes.
+# Code on the generation path wraps each step in `stage("name")`. This records the step's duration in
+# the ltp_stage_duration_seconds histogram and, inside a request, as a span of that request's trace.
+# A trace is appended to TRACE_FILE as JSON Lines, one span per line, when the request recorded at
+# least one stage or took longer than TRACE_SLOW_REQUEST_SECONDS. The root span carries the method,
+# path, status, user and the request's SQL statistics.
+
+_current_trace = ContextVar("ltp_trace", default=None)
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+class Trace:
+    def __init__(self, request_id):
+        self.request_id = request_id; self.spans = []; self.stack = []; self.staged = False; self.started = time.time(); self.start = time.perf_counter()
+
+    def add_span(self, name, started, duration, status="ok", attributes=None, span_id=None):
+        self.spans.append({"trace_id": self.request_id, "span_id": span_id or uuid.uuid4().hex[:16], "parent_id": self.stack[-1] if self.stack else self.request_id[:16],
+                           "name": name, "start": round(started, 6), "duration_ms": round(duration * 1000, 3), "status": status, "attributes": attributes or {}})
+
+def current_request_id():
+    trace = _current_trace.get(); return trace.request_id if trace else None
+
+@contextlib.contextmanager
+def stage(name, **attributes):
+    """Times one pipeline stage: `with stage("vector_search", k=4) as span: ...; span["chunks"] = n`. Errors are counted per stage."""
+    trace = _current_trace.get(); span_id = uuid.uuid4().hex[:16]; started = time.time(); start = time.perf_counter(); status = "ok"
+    if trace: trace.stack.append(span_id); trace.staged = True
+    try: yield attributes
+    except Exception as e:
+        status = "error"; attributes["error"] = str(e)[:300]; STAGE_ERRORS.inc(stage=name); raise
+    finally:
+        duration = time.perf_counter() - start; STAGE_SECONDS.observe(duration, stage=name)
+        if trace: trace.stack.pop(); trace.add_span(name, started, duration, status, attributes, span_id)
+
+def record_stage(name, duration, **attributes):
+    """Records a stage that was timed elsewhere (e.g. by SQLAlchemy events)."""
+    STAGE_SECONDS.observe(duration, stage=name); trace = _current_trace.get()
+    if trace: trace.add_span(name, time.time() - duration, duration, "ok", attributes)
+
+class TraceWriter:
+    """Appends finished traces to a JSONL file; one write per trace, serialised by a lock."""
+    def __init__(self, path):
+        self.path = path; self._lock = threading.Lock()
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, spans):
+        data = "".join(json.dumps(span, separators=(",", ":"), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f: f.write(data)
+
+def _before_commit(session):
+    session.info["_commit_start"] = time.perf_counter()
+
+def _after_commit(session):
+    start = session.info.pop("_commit_start", None)
+    if start is not None: record_stage("db_commit", time.perf_counter() - start)
+
+def init_tracing(app):
+    """Request IDs, HTTP latency metrics, commit timing and (with TRACE_FILE set) JSONL traces. Register after init_sql_instrumentation."""
+    path = app.config.get('TRACE_FILE'); writer = TraceWriter(path) if path else None
+    slow = float(app.config.get('TRACE_SLOW_REQUEST_SECONDS', 1.0))
+    event.listen(Session, "before_commit", _before_commit); event.listen(Session, "after_commit", _after_commit)
+
+    @app.before_request
+    def _start_trace():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if _REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex
+        g._trace_token = _current_trace.set(Trace(g.request_id))
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = _current_trace.get()
+        if trace is None: return response
+        duration = time.perf_counter() - trace.start; response.headers['X-Request-ID'] = trace.request_id
+        HTTP_SECONDS.observe(duration, method=request.method, endpoint=request.endpoint or "unmatched", status=response.status_code)
+        if writer and (trace.staged or duration >= slow):
+            stats = g.get('_sql_stats'); attributes = {"method": request.method, "path": request.path, "endpoint": request.endpoint, "status": response.status_code,
+                                                      "user_id": current_user.get_id() if current_user.is_authenticated else None}
+            if stats is not None: attributes.update(db_queries=stats.count, db_ms=round(stats.total_time * 1000, 3))
+            root = {"trace_id": trace.request_id, "span_id": trace.request_id[:16], "parent_id": None, "name": "request", "start": round(trace.started, 6),
+                    "duration_ms": round(duration * 1000, 3), "status": "ok" if response.status_code < 500 else "error", "attributes": attributes}
+            try: writer.write([root] + trace.spans)
+            except OSError as e: print(f"Could not write trace {trace.request_id}: {e}")
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        token = g.pop('_trace_token', None)
+        if token is not None: _current_trace.reset(token)
@@ -0,0 +1,42 @@
+import os
+import hashlib
+import tempfile
+
+# --- Configuration ---
+CHUNK_SIZE = 64 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised while streaming an upload that exceeds the configured size limit."""
+
+def blob_path(upload_folder, sha256, suffix=""):
+    """Returns the content-addressed location of a blob, fanned out as <aa>/<bb>/<sha256><suffix>."""
+    return os.path.join(upload_folder, sha256[:2], sha256[2:4], f"{sha256}{suffix}")
+
+def store_upload(stream, upload_folder, max_bytes=None, suffix=""):
+    """
+    Streams a file-like object into the content-addressed blob store.
+    The SHA-256 digest is computed while the bytes are written, so the file is read exactly once.
+    The size limit is enforced chunk by chunk and the partial file is discarded as soon as it is exceeded.
+    Returns (sha256, path, size). If an identical blob is already stored, the new copy is dropped.
+    """
+    tmp_dir = os.path.join(upload_folder, "tmp"); os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256(); size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk: break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes / (1024 * 1024):.1f} MB limit.")
+                digest.update(chunk); out.write(chunk)
+        sha256 = digest.hexdigest(); final_path = blob_path(upload_folder, sha256, suffix)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True); os.replace(tmp_path, final_path)
+        return sha256, final_path, size
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
@@ -0,0 +1,58 @@
+import uuid
+import datetime
+from sqlalchemy import select, delete, func
+
+from .models import db, PlanVariant, FeedbackLog
+from .guides import store_document, compress_document, decode_blob
+
+# ==============================================================================
+# ===                 MULTI-VARIANT GENERATION (INSTANT REGENERATE)          ===
+# ==============================================================================
+# With PLAN_VARIANTS > 1 (or "variants" in the request), POST /api/generate-plan generates several guides for the
+# same selections at once: one retrieval and one prompt, with concurrent LLM calls (services.generate_teacher_guides).
+# The first guide is returned. All of them are stored as plan_variant rows under a random batch id, and the Flask
+# session (the same cookie that carries the login) holds that id and the prompt profile key. Rows are only served
+# while both match, so a batch generated with one profile version is never served for another.
+# POST /api/generate-plan/next-variant records the guide on screen as negative feedback and serves the next one.
+# Only the database is involved, so it works whichever worker receives the request.
+# A variant row holds its guide compressed, outside guide storage: it becomes a GuideBlob only when it is rejected
+# (the feedback row references it) or saved as a plan, so the variants nobody kept leave nothing behind.
+# Every new generation deletes the session's previous batch, whether or not it stores a new one. It also purges
+# every user's batches older than PLAN_VARIANT_TTL_SECONDS, including those of sessions that never came back.
+
+def _purge(user_id, previous, now, ttl_seconds):
+    db.session.execute(delete(PlanVariant).where(PlanVariant.created_at < now - datetime.timedelta(seconds=ttl_seconds)))
+    if previous: db.session.execute(delete(PlanVariant).where(PlanVariant.user_id == user_id, PlanVariant.batch == previous))
+
+def discard_batch(user_id, previous, ttl_seconds=3600):
+    """Deletes the user's `previous` batch (a generation replaced it without storing a new one) and all expired batches."""
+    _purge(user_id, previous, datetime.datetime.utcnow(), ttl_seconds); db.session.commit()
+
+def new_batch(user_id, profile_key, selections, guides, previous=None, ttl_seconds=3600):
+    """Stores `guides` as a new batch whose first guide counts as shown, replacing `previous`. Returns the batch id."""
+    now = datetime.datetime.utcnow(); _purge(user_id, previous, now, ttl_seconds)
+    batch = uuid.uuid4().hex
+    db.session.add_all(PlanVariant(batch=batch, position=i, user_id=user_id, profile_key=profile_key, selections=selections, data=compress_document(guide),
+                                   served_at=now if i == 0 else None, created_at=now)
+                       for i, guide in enumerate(guides))
+    db.session.commit(); return batch
+
+def remaining(batch):
+    return db.session.execute(select(func.count()).select_from(PlanVariant).where(PlanVariant.batch == batch, PlanVariant.served_at.is_(None))).scalar()
+
+def next_variant(user_id, batch, profile_key, ttl_seconds=3600):
+    """
+    Rejects the batch's guide on screen (a -1 FeedbackLog row, returned for the activity log) and marks the next one as shown.
+    Returns (guide or None, its selections, feedback or None, variants still unseen). Both are None once the batch is used up or expired.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl_seconds)
+    rows = db.session.execute(select(PlanVariant).where(PlanVariant.batch == batch, PlanVariant.user_id == user_id, PlanVariant.profile_key == profile_key,
+                                                        PlanVariant.created_at >= cutoff).order_by(PlanVariant.position)).scalars().all()
+    shown = [row for row in rows if row.served_at is not None]; unseen = [row for row in rows if row.served_at is None]
+    feedback = None
+    if shown:
+        current = shown[-1]; feedback = FeedbackLog(rating=-1, selections=current.selections, guide_id=store_document(decode_blob(current.data)), generated_output=None, user_id=user_id)
+        db.session.add(feedback); db.session.delete(current)
+    if not unseen: db.session.commit(); return None, None, feedback, 0
+    served = unseen[0]; served.served_at = datetime.datetime.utcnow(); db.session.commit()
+    return decode_blob(served.data), served.selections, feedback, len(unseen) - 1
@@ -0,0 +1,50 @@
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import DataVersion, User, Plan, ActivityLog, AgeCohort, Domain, Component, PlayType, Resource
+
+# Maps each model to the cached collection(s) that a write to it invalidates.
+TRACKED_MODELS = {
+    AgeCohort: lambda obj: ["curriculum"],
+    Domain: lambda obj: ["curriculum"],
+    Component: lambda obj: ["curriculum"],
+    PlayType: lambda obj: ["curriculum"],
+    Resource: lambda obj: ["resources"],
+    User: lambda obj: ["users"],
+    ActivityLog: lambda obj: ["activity_logs"],
+    Plan: lambda obj: [f"plans:{obj.user_id}"],
+}
+
+def bump_versions(connection, names):
+    """Increments the version of each named collection using the given connection (i.e. inside the caller's transaction)."""
+    names = sorted(set(names))
+    if not names: return
+    table = DataVersion.__table__; dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = dialect_insert(table).values([{"name": n, "version": 1} for n in names])
+        connection.execute(stmt.on_conflict_do_update(index_elements=[table.c.name], set_={"version": table.c.version + 1}))
+        return
+    for name in names:
+        if connection.execute(update(table).where(table.c.name == name).values(version=table.c.version + 1)).rowcount == 0:
+            connection.execute(insert(table).values(name=name, version=1))
+
+def get_versions(session, names):
+    """Returns {name: version} for the given collections in a single query. Unknown collections are at version 0."""
+    rows = session.execute(select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(list(names)))).all()
+    versions = {name: 0 for name in names}; versions.update(dict(rows))
+    return versions
+
+def get_version(session, name):
+    return get_versions(session, [name])[name]
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions_after_flush(session, flush_context):
+    """ORM writes to tracked models bump their collections' versions as part of the same transaction."""
+    names = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        collections_for = TRACKED_MODELS.get(type(obj))
+        if collections_for: names.update(collections_for(obj))
+    if names: bump_versions(session.connection(), names)
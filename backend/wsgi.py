@@ -0,0 +1,9 @@
+"""
+Production entry point. Serve with gunicorn using the tuned profile in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py backend.wsgi:app
+
+The database is prepared once by the gunicorn master (`flask --app backend.app init-db`) before
+any worker starts, so workers only import the app.
+"""
+from .app import app
@@ -0,0 +1,62 @@
+"""
+Admin activity feed latency at growing history lengths, and retention-job throughput.
+
+Inserts structured events in stages up to `events` rows spread over two years and, after each stage,
+times the first feed page, a page 50 cursors deep and a per-user page. Then archives everything older
+than 90 days and reports the rows moved, the archive size and the feed latency afterwards.
+
+    python -m benchmarks.bench_activity_feed [events] [users]
+"""
+import os
+import sys
+import time
+import random
+import datetime
+from sqlalchemy import insert
+from .common import load_app, timed, login
+
+CODES = ["auth.login", "auth.logout", "plan.generate", "plan.save", "feedback.submit"]
+
+def synthetic_event(rng, user_ids, now):
+    code = rng.choice(CODES)
+    payload = {"age_cohort": "3-5 years", "domain": "Science", "component": "Water", "play_type": "Free Play"} if code == "plan.generate" else \
+              {"title": "Water play"} if code == "plan.save" else {"rating": 1} if code == "feedback.submit" else None
+    return {"user_id": rng.choice(user_ids), "action": "", "action_code": code, "payload": payload, "timestamp": now - datetime.timedelta(seconds=rng.randrange(730 * 86400))}
+
+def time_feed(client, user_id):
+    first, page = timed(lambda: client.get('/api/admin/activity-logs'), repeat=20)
+    cursor = page.json["next_cursor"]
+    for _ in range(50): cursor = client.get('/api/admin/activity-logs', query_string={"cursor": cursor}).json["next_cursor"]
+    deep, _ = timed(lambda: client.get('/api/admin/activity-logs', query_string={"cursor": cursor}), repeat=20)
+    by_user, _ = timed(lambda: client.get('/api/admin/activity-logs', query_string={"user_id": user_id}), repeat=20)
+    return first, deep, by_user
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    m = load_app(); app = m.app; rng = random.Random(5); now = datetime.datetime.utcnow()
+    with app.app_context():
+        m.create_admin_user_if_not_exists(); admin_id = m.User.query.filter_by(role='admin').one().id
+        m.db.session.execute(insert(m.User), [{"first_name": "T", "last_name": str(i), "email": f"t{i}@example.com", "password_hash": "x", "force_password_change": False} for i in range(n_users - 1)])
+        m.db.session.commit(); user_ids = [admin_id] + [u.id for u in m.User.query.filter(m.User.id != admin_id)]
+    client = login(app.test_client(), app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
+    print(f"{'events':>9} {'first page':>11} {'page 51':>10} {'one user':>10}")
+    written = 0
+    for stage in sorted({n for n in (10_000, 100_000, n_events) if n <= n_events}):
+        with app.app_context():
+            while written < stage:
+                batch = [synthetic_event(rng, user_ids, now) for _ in range(min(10_000, stage - written))]
+                m.db.session.execute(insert(m.ActivityLog), batch); m.db.session.commit(); written += len(batch)
+        first, deep, by_user = time_feed(client, user_ids[1])
+        print(f"{written:>9} {first * 1000:>8.2f} ms {deep * 1000:>7.2f} ms {by_user * 1000:>7.2f} ms")
+
+    with app.app_context():
+        archive_dir = os.path.join(os.path.dirname(m.db.engine.url.database), "archive")
+        start = time.perf_counter(); moved = m.archive_activity_logs(archive_dir, 90); elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(archive_dir, name)) for name in os.listdir(archive_dir))
+    print(f"archived {moved} rows in {elapsed:.1f} s ({moved / elapsed:,.0f} rows/s) into {len(os.listdir(archive_dir))} files, {size / 1e6:.1f} MB ({size / moved:.0f} bytes/row)")
+    first, deep, by_user = time_feed(client, user_ids[1])
+    print(f"{written - moved:>9} {first * 1000:>8.2f} ms {deep * 1000:>7.2f} ms {by_user * 1000:>7.2f} ms   (after archiving)")
+
+if __name__ == "__main__":
+    main()
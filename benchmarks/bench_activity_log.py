@@ -0,0 +1,63 @@
+"""
+Activity-log write throughput on SQLite under concurrent requests.
+
+Compares the old synchronous path (one ORM insert + commit per event on the request thread)
+with the buffered ActivityLogWriter (enqueue on the request thread, batched INSERTs in the background).
+
+    python -m benchmarks.bench_activity_log [threads] [events_per_thread]
+"""
+import sys
+import time
+import threading
+from .common import load_app
+
+def run_threads(n_threads, fn):
+    """Runs fn(thread_index) on n_threads threads; returns (wall seconds, sorted per-call latencies)."""
+    latencies = []; lock = threading.Lock()
+    def worker(i):
+        local = fn(i)
+        with lock: latencies.extend(local)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+def report(label, n_events, wall, latencies, errors=0):
+    p50 = latencies[len(latencies) // 2] * 1000; p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<12} {n_events / wall:>10.0f} ev/s   request-path p50 {p50:>7.3f} ms   p99 {p99:>7.3f} ms   errors {errors}")
+
+def main():
+    n_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    m = load_app(); app = m.app
+    with app.app_context():
+        m.create_admin_user_if_not_exists(); user_id = m.User.query.first().id
+    n_events = n_threads * per_thread; errors = [0]
+
+    def synchronous(i):
+        local = []
+        with app.app_context():
+            for k in range(per_thread):
+                start = time.perf_counter()
+                try:
+                    m.db.session.add(m.ActivityLog(action_code="plan.save", payload={"title": f"sync {i}/{k}"}, user_id=user_id)); m.db.session.commit()
+                except Exception:
+                    m.db.session.rollback(); errors[0] += 1
+                local.append(time.perf_counter() - start)
+        return local
+    wall, latencies = run_threads(n_threads, synchronous)
+    report("synchronous", n_events, wall, latencies, errors[0])
+
+    writer = m.ActivityLogWriter(); app.config['ACTIVITY_LOG_MAX_QUEUE'] = n_events; writer.init_app(app)
+    def buffered(i):
+        local = []
+        for k in range(per_thread):
+            start = time.perf_counter(); writer.log(user_id, "plan.save", {"title": f"buffered {i}/{k}"}); local.append(time.perf_counter() - start)
+        return local
+    start = time.perf_counter(); _, latencies = run_threads(n_threads, buffered); writer.stop(); wall = time.perf_counter() - start
+    report("buffered", n_events, wall, latencies, writer.dropped)
+    assert writer.written == n_events, (writer.written, n_events)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+First paint of the admin panel: the per-collection GETs it used to make one after another vs
+GET /api/admin/bootstrap fetched in parallel with the live widgets (generator status, analytics, activity feed).
+
+The app is served over real HTTP by a threaded werkzeug server. Every request pays a simulated network
+round trip of `rtt_ms` on the client side. The curriculum is the large one from bench_admin_serializers.
+Also reported: an edit before (POST, then every collection refetched) and after (POST, cache patched locally).
+
+    python -m benchmarks.bench_admin_bootstrap [rtt_ms]
+"""
+import sys
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import make_server
+from .common import load_app, timed
+from .bench_admin_serializers import seed
+
+PERIOD = "from=2026-01-01&to=2026-01-30"
+LIVE = ["generation-status", f"analytics/daily?{PERIOD}", f"analytics/usage?{PERIOD}&group_by=domain,play_type"]
+# What the panel requested on every load, in order (age cohorts and domains twice, for two different maps).
+SEQUENTIAL = ["users", *LIVE, "activity-logs", "age-cohorts", "domains", "play-types", "components",
+              "curriculum/export", "curriculum/export?format=csv", "resources", "domains", "age-cohorts"]
+COLLECTIONS = ["users", "activity-logs", "age-cohorts", "domains", "play-types", "components", "resources"]
+PARALLEL = ["bootstrap", *LIVE, "activity-logs"]
+
+def main():
+    rtt = (float(sys.argv[1]) if len(sys.argv) > 1 else 50) / 1000
+    m = load_app(); seed(m)
+    with m.app.app_context(): m.create_admin_user_if_not_exists()
+    server = make_server("127.0.0.1", 0, m.app, threaded=True); threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/api"
+    session = requests.Session(); session.post(f"{base}/login", json={"email": m.app.config['ADMIN_EMAIL'], "password": m.app.config['ADMIN_PASSWORD']}).raise_for_status()
+    sent = [0]
+
+    def get(path):
+        time.sleep(rtt); sent[0] += 1; response = session.get(f"{base}/admin/{path}"); response.raise_for_status(); return response.content
+    def sequential(): return [get(path) for path in SEQUENTIAL]
+    def bootstrap():
+        with ThreadPoolExecutor(max_workers=len(PARALLEL)) as pool: return list(pool.map(get, PARALLEL))
+    def add_then_refetch():
+        time.sleep(rtt); session.post(f"{base}/admin/age-cohorts", json={"name": f"cohort x{time.perf_counter_ns()}"}); return [get(path) for path in COLLECTIONS]
+    def add_then_patch():
+        time.sleep(rtt); return session.post(f"{base}/admin/age-cohorts", json={"name": f"cohort y{time.perf_counter_ns()}"}).json()
+
+    print(f"simulated round trip {rtt * 1000:.0f} ms")
+    print(f"{'operation':<34} {'requests':>9} {'median':>10} {'bytes':>10}")
+    for label, fn in (("first paint, sequential GETs", sequential), ("first paint, bootstrap + parallel", bootstrap),
+                      ("add cohort, refetch everything", add_then_refetch), ("add cohort, patch the cache", add_then_patch)):
+        sent[0] = 0; median, result = timed(fn, repeat=5); requests_per_call = sent[0] // 5 + (1 if label.startswith("add") else 0)
+        size = sum(map(len, result)) if isinstance(result, list) else 0
+        print(f"{label:<34} {requests_per_call:>9} {median * 1000:>7.0f} ms {size:>10}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
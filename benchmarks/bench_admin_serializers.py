@@ -0,0 +1,49 @@
+"""
+Latency of the admin collection serializers on a large curriculum, per-row to_dict() vs eager loading.
+
+    python -m benchmarks.bench_admin_serializers
+"""
+from .common import load_app, count_queries, timed
+from backend.serializers import serialize_components, serialize_play_types, serialize_resources
+
+N_COHORTS, N_DOMAINS, COMPONENTS_PER_PAIR = 10, 25, 2
+N_PLAY_TYPES, N_RESOURCES = 200, 300
+
+def seed(m):
+    with m.app.app_context():
+        cohorts = [m.AgeCohort(name=f"cohort {i}") for i in range(N_COHORTS)]
+        domains = [m.Domain(name=f"domain {j}") for j in range(N_DOMAINS)]
+        m.db.session.add_all(cohorts + domains); m.db.session.flush()
+        for ac in cohorts:
+            for d in domains:
+                m.db.session.add_all([m.Component(name=f"component {ac.id}/{d.id}/{k}", age_cohort_id=ac.id, domain_id=d.id) for k in range(COMPONENTS_PER_PAIR)])
+        for k in range(N_PLAY_TYPES):
+            m.db.session.add(m.PlayType(name=f"play type {k}", context="Standard", age_cohorts=cohorts[: 1 + k % N_COHORTS], domains=domains[: 1 + k % N_DOMAINS]))
+        for k in range(N_RESOURCES):
+            m.db.session.add(m.Resource(title=f"resource {k}", resource_type="Text", content_path="...", age_cohorts=cohorts[:3], domains=domains[:3]))
+        m.db.session.commit()
+
+def main():
+    m = load_app(); seed(m)
+    legacy = {
+        "components": lambda: [c.to_dict() for c in m.Component.query.order_by(m.Component.id).all()],
+        "play-types": lambda: [pt.to_dict() for pt in m.PlayType.query.order_by(m.PlayType.id).all()],
+        "resources": lambda: [r.to_dict() for r in m.Resource.query.order_by(m.Resource.id).all()],
+    }
+    bulk = {"components": serialize_components, "play-types": serialize_play_types, "resources": serialize_resources}
+    print(f"{'collection':<12} {'rows':>5} {'before q':>9} {'before ms':>10} {'after q':>8} {'after ms':>9}")
+    with m.app.app_context():
+        engine = m.db.engine
+        for name in legacy:
+            results = {}
+            for label, fn in (("before", legacy[name]), ("after", bulk[name])):
+                def cold():
+                    m.db.session.remove(); return fn()  # a fresh session, as in a real request
+                with count_queries(engine) as queries: rows = cold()
+                median, _ = timed(cold, repeat=10)
+                results[label] = (queries[0], median, rows)
+            assert results["before"][2] == results["after"][2], f"{name}: response shape changed"
+            print(f"{name:<12} {len(results['after'][2]):>5} {results['before'][0]:>9} {results['before'][1] * 1000:>10.1f} {results['after'][0]:>8} {results['after'][1] * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
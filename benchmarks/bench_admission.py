@@ -0,0 +1,82 @@
+"""
+Fairness and rate limiting of plan-generation admission control.
+
+The LLM call is replaced by a stub that sleeps `llm_seconds`, so only admission is measured. One heavy
+user keeps `heavy_threads` requests in flight (retrying as soon as a request is refused) while
+`light_users` users each send one request at a time. Reported per scheduler: generations completed per
+user, refusals, and the light users' latency.
+
+  fifo        admission disabled, LLM concurrency capped by a plain semaphore (first come, first served)
+  admission   the AdmissionController: at most one waiting request per user, slots handed out round-robin
+
+A last run sends a burst from a single teacher with the default limits and shows the 429s and Retry-After.
+
+    python -m benchmarks.bench_admission [seconds] [heavy_threads] [light_users] [llm_seconds]
+"""
+import os
+import sys
+import time
+import threading
+from .common import load_app, login
+
+PASSWORD = "benchmark-password"
+CONCURRENCY = 4
+REQUEST = {"age_cohort": "3-5 years", "subject": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+
+def percentile(samples, q):
+    samples = sorted(samples); return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else float("nan")
+
+def run(app, emails, heavy_threads, seconds):
+    """Returns ({email: completed}, {email: refused}, light-user latencies)."""
+    done = {e: 0 for e in emails}; refused = {e: 0 for e in emails}; latencies = []; lock = threading.Lock(); stop = time.monotonic() + seconds
+    def worker(email, light):
+        client = login(app.test_client(), email, PASSWORD)
+        while time.monotonic() < stop:
+            start = time.perf_counter(); status = client.post('/api/generate-plan', json=REQUEST).status_code
+            with lock:
+                if status == 200:
+                    done[email] += 1
+                    if light: latencies.append(time.perf_counter() - start)
+                else: refused[email] += 1
+            if status != 200: time.sleep(0.05)
+    threads = [threading.Thread(target=worker, args=(emails[0], False)) for _ in range(heavy_threads)]
+    threads += [threading.Thread(target=worker, args=(email, True)) for email in emails[1:]]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return done, refused, latencies
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    heavy_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    light_users = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    llm_seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 0.2
+    os.environ.update({"GENERATION_MAX_CONCURRENCY": str(CONCURRENCY), "GENERATION_RATE_LIMITS": '{"teacher": {"rate_per_minute": 6000, "burst": 100}}'})
+    m = load_app(); app = m.app; emails = [f"user{i}@example.com" for i in range(light_users + 1)]
+    m.passwords.configure(workers=0)
+    with app.app_context():
+        for email in emails + ["burst@example.com"]:
+            user = m.User(first_name="Bench", last_name="User", email=email, force_password_change=False); user.set_password(PASSWORD); m.db.session.add(user)
+        m.db.session.commit()
+
+    llm = threading.Semaphore(CONCURRENCY)
+    def stub_fifo(*args, **kwargs):
+        with llm: time.sleep(llm_seconds); return {"guides": [{"guide_title": "Benchmark guide"}]}
+    def stub(*args, **kwargs):
+        time.sleep(llm_seconds); return {"guides": [{"guide_title": "Benchmark guide"}]}
+
+    print(f"{heavy_threads} concurrent requests from one user, {light_users} light users, {CONCURRENCY} slots, {llm_seconds * 1000:.0f} ms per generation, {seconds:.0f} s")
+    print(f"{'scheduler':>10} {'heavy done':>11} {'light done (each)':>18} {'refused':>8} {'light p50':>10} {'light p95':>10}")
+    for name, fn, enabled in (("fifo", stub_fifo, False), ("admission", stub, True)):
+        m.generate_teacher_guides = fn; m.admission.enabled = enabled
+        done, refused, latencies = run(app, emails, heavy_threads, seconds)
+        light = " ".join(str(done[e]) for e in emails[1:])
+        print(f"{name:>10} {done[emails[0]]:>11} {light:>18} {sum(refused.values()):>8} {percentile(latencies, 0.5) * 1000:>7.0f} ms {percentile(latencies, 0.95) * 1000:>7.0f} ms")
+
+    m.admission.rate_limits = dict(m.admission.rate_limits, teacher={"rate_per_minute": 4, "burst": 6})
+    client = login(app.test_client(), "burst@example.com", PASSWORD)
+    responses = [client.post('/api/generate-plan', json=REQUEST) for _ in range(10)]
+    print("burst of 10 with the default teacher limit (4/min, burst 6):", ", ".join(
+        str(r.status_code) + (f" (Retry-After {r.headers['Retry-After']} s)" if r.status_code == 429 else "") for r in responses))
+
+if __name__ == "__main__":
+    main()
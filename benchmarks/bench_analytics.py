@@ -0,0 +1,98 @@
+"""
+Admin analytics latency as the activity and feedback logs grow.
+
+Writes synthetic events through the activity-log writer's batch path (which maintains the rollups) in
+stages up to `events` rows spread over a year, and after each stage times the rollup-backed analytics
+endpoints against the equivalent aggregation over the raw ActivityLog and FeedbackLog tables.
+Finally checks that rebuild_rollups() reproduces the incrementally maintained counters.
+
+    python -m benchmarks.bench_analytics [events] [users]
+"""
+import sys
+import time
+import random
+import datetime
+from collections import Counter
+from sqlalchemy import insert, select, func
+from .common import load_app, timed, login
+
+COHORTS = ["0-1 years", "1-3 years", "3-5 years", "5-8 years"]
+DOMAINS = {"Mathematics": ["Counting", "Shapes", "Measuring"], "Language": ["Listening", "Rhymes"], "Science": ["Water", "Light", "Plants"],
+           "Social-Emotional": ["Feelings", "Sharing", "Friendship"]}
+PLAY_TYPES = ["Free Play", "Guided Play", "Games", "Role Play"]
+
+def event(user_id, timestamp, action_code, payload, rollup):
+    """A row as ActivityLogWriter.log() queues it."""
+    return {"user_id": user_id, "action": "", "action_code": action_code, "payload": payload, "plan_id": None, "timestamp": timestamp, "rollup": rollup}
+
+def synthetic_events(rng, count, user_ids, analytics, start_day):
+    """Activity rows (with rollup events) and the feedback rows that go with the rating events."""
+    rows = []; feedback = []
+    for _ in range(count):
+        timestamp = datetime.datetime.combine(start_day, datetime.time()) + datetime.timedelta(seconds=rng.randrange(365 * 86400))
+        user_id = rng.choice(user_ids); kind = rng.random()
+        cohort = rng.choice(COHORTS); domain = rng.choice(list(DOMAINS)); component = rng.choice(DOMAINS[domain]); play_type = rng.choice(PLAY_TYPES)
+        if kind < 0.5:
+            rows.append(event(user_id, timestamp, "plan.generate", {"age_cohort": cohort, "domain": domain, "component": component, "play_type": play_type},
+                              analytics.generation_event(cohort, domain, component, {"name": play_type, "context": "Standard"})))
+        elif kind < 0.6:
+            selections = {"age": cohort, "domain": domain, "sub_domain": component, "play_type": {"name": play_type, "context": "Standard"}}
+            rating = 1 if rng.random() < 0.8 else -1
+            rows.append(event(user_id, timestamp, "feedback.submit", {"rating": rating}, analytics.rating_event(selections, rating)))
+            feedback.append({"rating": rating, "selections": selections, "generated_output": None, "timestamp": timestamp, "user_id": user_id})
+        else:
+            rows.append(event(user_id, timestamp, rng.choice(["auth.login", "auth.logout", "plan.delete"]), None, None))
+    return rows, feedback
+
+def raw_usage(m, start, end):
+    """What the usage endpoint would cost without rollups: ratings need the JSON selections of every feedback row in range."""
+    ratings = Counter()
+    for selections, rating in m.db.session.execute(select(m.FeedbackLog.selections, m.FeedbackLog.rating).where(m.FeedbackLog.timestamp.between(start, end))):
+        ratings[(selections.get("domain"), (selections.get("play_type") or {}).get("name"), rating > 0)] += 1
+    return ratings
+
+def raw_daily(m, start, end):
+    day = func.date(m.ActivityLog.timestamp)
+    return m.db.session.execute(select(day, func.count(func.distinct(m.ActivityLog.user_id)), func.count())
+                                .where(m.ActivityLog.timestamp.between(start, end)).group_by(day)).all()
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    m = load_app(); app = m.app; rng = random.Random(11); analytics = sys.modules["backend.analytics"]; writer = m.activity_log
+    start_day = datetime.date(2025, 1, 1); end_day = start_day + datetime.timedelta(days=364)
+    with app.app_context():
+        m.create_admin_user_if_not_exists(); admin_id = m.User.query.filter_by(role='admin').one().id
+        m.db.session.execute(insert(m.User), [{"first_name": "T", "last_name": str(i), "email": f"t{i}@example.com", "password_hash": "x", "force_password_change": False} for i in range(n_users - 1)])
+        m.db.session.commit(); user_ids = [admin_id] + [u.id for u in m.User.query.filter(m.User.id != admin_id)]
+    client = login(app.test_client(), app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
+    writer.flush()
+    period = {"from": start_day.isoformat(), "to": end_day.isoformat()}
+    stages = sorted({n for n in (10_000, 100_000, n_events) if n <= n_events}); written = 0; write_time = 0.0
+    print(f"{'events':>9} {'usage (rollup)':>15} {'daily (rollup)':>15} {'usage (raw scan)':>17} {'daily (raw scan)':>17}")
+    for stage in stages:
+        while written < stage:
+            rows, feedback = synthetic_events(rng, min(writer.batch_size * 50, stage - written), user_ids, analytics, start_day)
+            start = time.perf_counter()
+            with app.app_context():
+                if feedback: m.db.session.execute(insert(m.FeedbackLog), feedback); m.db.session.commit()
+            for i in range(0, len(rows), writer.batch_size): writer._write(rows[i:i + writer.batch_size])
+            write_time += time.perf_counter() - start; written += len(rows)
+        usage_time, usage = timed(lambda: client.get('/api/admin/analytics/usage', query_string={**period, "group_by": "domain,play_type"}), repeat=20)
+        daily_time, daily = timed(lambda: client.get('/api/admin/analytics/daily', query_string=period), repeat=20)
+        assert usage.status_code == 200 and daily.status_code == 200, (usage.status_code, daily.status_code)
+        with app.app_context():
+            bounds = (datetime.datetime.combine(start_day, datetime.time()), datetime.datetime.combine(end_day, datetime.time.max))
+            raw_usage_time, _ = timed(lambda: raw_usage(m, *bounds), repeat=3); raw_daily_time, _ = timed(lambda: raw_daily(m, *bounds), repeat=3)
+        print(f"{written:>9} {usage_time * 1000:>12.2f} ms {daily_time * 1000:>12.2f} ms {raw_usage_time * 1000:>14.1f} ms {raw_daily_time * 1000:>14.1f} ms")
+    print(f"writing {written} events through the batch path (log rows + rollups): {written / write_time:,.0f} events/s")
+
+    models = sys.modules["backend.models"]
+    with app.app_context():
+        snapshot = lambda: [m.db.session.execute(select(table).order_by(*table.primary_key.columns)).all() for table in (models.UsageRollup.__table__, models.DailyActivity.__table__, models.ActiveUserDay.__table__)]
+        incremental = snapshot(); start = time.perf_counter(); analytics.rebuild_rollups(); elapsed = time.perf_counter() - start
+        assert snapshot() == incremental, "rebuild_rollups() disagrees with the incrementally maintained rollups"
+    print(f"rebuild_rollups() from the raw logs: {elapsed:.1f} s, identical to the incremental counters")
+
+if __name__ == "__main__":
+    main()
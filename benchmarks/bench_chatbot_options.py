@@ -0,0 +1,56 @@
+"""
+Query-count and latency check for GET /api/chatbot/options.
+
+Grows the cohort x domain matrix and asserts that building the options snapshot costs the
+same number of SQL queries at every size, and that unchanged reloads are served as 304s.
+tests/test_chatbot_options.py asserts the same under pytest.
+
+    python -m benchmarks.bench_chatbot_options
+"""
+import sys
+from .common import load_app, count_queries, timed, login
+
+SIZES = [(2, 2), (5, 5), (10, 20), (20, 40)]
+
+def seed_matrix(backend_app, n_cohorts, n_domains, components_per_pair=3, n_play_types=10):
+    m = backend_app
+    with m.app.app_context():
+        for table in m.db.metadata.sorted_tables:
+            if table.name.startswith('playtype_'): m.db.session.execute(table.delete())
+        m.db.session.query(m.Component).delete(); m.db.session.query(m.PlayType).delete()
+        m.db.session.query(m.AgeCohort).delete(); m.db.session.query(m.Domain).delete(); m.db.session.commit()
+        cohorts = [m.AgeCohort(name=f"cohort {i}") for i in range(n_cohorts)]
+        domains = [m.Domain(name=f"domain {j}") for j in range(n_domains)]
+        m.db.session.add_all(cohorts + domains); m.db.session.flush()
+        for ac in cohorts:
+            for d in domains:
+                m.db.session.add_all([m.Component(name=f"component {ac.id}/{d.id}/{k}", age_cohort_id=ac.id, domain_id=d.id) for k in range(components_per_pair)])
+        for k in range(n_play_types):
+            m.db.session.add(m.PlayType(name=f"play type {k}", context="Standard", age_cohorts=cohorts, domains=domains))
+        m.db.session.commit()
+
+def main():
+    backend_app = load_app(); engine_app = backend_app.app
+    with engine_app.app_context():
+        backend_app.create_admin_user_if_not_exists()
+        engine = backend_app.db.engine
+    client = login(engine_app.test_client(), engine_app.config['ADMIN_EMAIL'], engine_app.config['ADMIN_PASSWORD'])
+
+    build_counts = set(); failed = False
+    print(f"{'matrix':>10} {'build queries':>14} {'cached queries':>15} {'cached ms':>10} {'304':>5}")
+    for n_cohorts, n_domains in SIZES:
+        seed_matrix(backend_app, n_cohorts, n_domains)
+        with count_queries(engine) as build: response = client.get('/api/chatbot/options')
+        assert response.status_code == 200
+        with count_queries(engine) as cached: client.get('/api/chatbot/options')
+        median, _ = timed(lambda: client.get('/api/chatbot/options'))
+        not_modified = client.get('/api/chatbot/options', headers={"If-None-Match": response.headers['ETag']}).status_code == 304
+        build_counts.add(build[0]); failed |= not not_modified
+        print(f"{n_cohorts:>4}x{n_domains:<5} {build[0]:>14} {cached[0]:>15} {median * 1000:>10.2f} {str(not_modified):>5}")
+
+    if len(build_counts) != 1 or failed:
+        print("FAIL: query count grows with the matrix size or conditional GET is broken."); sys.exit(1)
+    print("OK: constant number of queries regardless of matrix size.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Latency of plan generation through a provider outage, with and without the LLM circuit breaker.
+
+The LLM is a stub: healthy calls take `llm_seconds`, and during the outage every call fails after
+`timeout_seconds` (a provider that times out). One feedback row rates a stored guide for the benchmark
+selections, so degraded mode has something to serve. `clients` teachers send requests back to back
+through three phases (healthy, outage, recovered). Reported per phase: requests, HTTP statuses, degraded
+answers, median and p95 latency, and the breaker state at the end of the phase.
+
+    python -m benchmarks.bench_circuit_breaker [phase_seconds] [clients] [llm_seconds] [timeout_seconds]
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from .common import load_app, login
+
+PASSWORD = "benchmark-password"
+SELECTIONS = {"age": "3-5 years", "domain": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+REQUEST = {"age_cohort": "3-5 years", "subject": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+STORED_GUIDE = {"guide_title": "Stored water play guide", "activity_name": "Pouring stations", "materials": ["Jugs", "Funnels"]}
+
+def percentile(samples, q):
+    samples = sorted(samples); return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else float("nan")
+
+def run_phase(app, emails, seconds):
+    statuses = Counter(); latencies = []; degraded = [0]; lock = threading.Lock(); stop = time.monotonic() + seconds
+    def worker(email):
+        client = login(app.test_client(), email, PASSWORD)
+        while time.monotonic() < stop:
+            start = time.perf_counter(); response = client.post('/api/generate-plan', json=REQUEST); elapsed = time.perf_counter() - start
+            with lock:
+                statuses[response.status_code] += 1; latencies.append(elapsed)
+                if response.status_code == 200 and "degraded" in response.json: degraded[0] += 1
+            if response.status_code == 503: time.sleep(0.05)
+    threads = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return statuses, degraded[0], latencies
+
+def main():
+    phase_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 12
+    n_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    llm_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    timeout_seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 2.0
+    os.environ.update({"GENERATION_RATE_LIMITS": '{"teacher": {"rate_per_minute": 60000, "burst": 1000}}', "GENERATION_MAX_CONCURRENCY": str(n_clients),
+                       "LLM_BREAKER_OPEN_SECONDS": "2", "LLM_BREAKER_SLOW_CALL_SECONDS": str(timeout_seconds * 0.9)})
+    m = load_app(); app = m.app; emails = [f"teacher{i}@example.com" for i in range(n_clients)]
+    m.passwords.configure(workers=0); guides = sys.modules["backend.guides"]
+    with app.app_context():
+        for email in emails:
+            user = m.User(first_name="Bench", last_name="User", email=email, force_password_change=False); user.set_password(PASSWORD); m.db.session.add(user)
+        m.db.session.add(m.FeedbackLog(rating=1, selections=SELECTIONS, guide_id=guides.store_document(STORED_GUIDE), generated_output=None))
+        m.db.session.commit()
+
+    provider = {"down": False}
+    def stub(*args, llm_call=None, **kwargs):
+        # Stands in for generate_teacher_guides: the sleep is the model call, measured by the admitted breaker call as in services.py.
+        try:
+            with llm_call.measure():
+                if provider["down"]: time.sleep(timeout_seconds); raise TimeoutError("503 Service Unavailable")
+                time.sleep(llm_seconds)
+        except TimeoutError as e: return {"error": f"Could not generate guide. The API call failed: {e}"}
+        return {"guides": [{"guide_title": "Fresh guide"}]}
+    m.generate_teacher_guides = stub
+
+    print(f"{n_clients} clients, {phase_seconds:.0f} s per phase, healthy calls {llm_seconds * 1000:.0f} ms, failing calls time out after {timeout_seconds:.1f} s")
+    print(f"{'breaker':>8} {'phase':>10} {'requests':>9} {'statuses':>22} {'degraded':>9} {'p50':>9} {'p95':>9} {'state after':>12}")
+    for label, min_calls in (("off", 10 ** 9), ("on", 5)):
+        m.llm_breaker.min_calls = m.llm_breaker.consecutive_failures = min_calls; m.llm_breaker.reset()
+        for phase, down in (("healthy", False), ("outage", True), ("recovered", False)):
+            provider["down"] = down
+            statuses, degraded, latencies = run_phase(app, emails, phase_seconds)
+            shown = " ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+            print(f"{label:>8} {phase:>10} {len(latencies):>9} {shown:>22} {degraded:>9} {percentile(latencies, 0.5) * 1000:>6.0f} ms "
+                  f"{percentile(latencies, 0.95) * 1000:>6.0f} ms {m.llm_breaker.snapshot()['state']:>12}")
+
+if __name__ == "__main__":
+    main()
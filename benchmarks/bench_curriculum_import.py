@@ -0,0 +1,47 @@
+"""
+Time to seed a large curriculum: the old per-row seeding loop vs the bulk import engine.
+
+    python -m benchmarks.bench_curriculum_import [n_components]
+"""
+import sys
+import time
+from .common import load_app
+from .synthetic import synthetic_doc
+from backend.curriculum_io import import_curriculum
+
+def legacy_seed(m, doc):
+    """The seeding loop as it was: ORM adds plus two name lookups per component."""
+    for name in doc["age_cohorts"]: m.db.session.add(m.AgeCohort(name=name))
+    for name in doc["domains"]: m.db.session.add(m.Domain(name=name))
+    m.db.session.commit()
+    for pt in doc["play_types"]:
+        obj = m.PlayType(name=pt["name"], description=pt["description"], context=pt["context"])
+        obj.age_cohorts = m.AgeCohort.query.all(); obj.domains = m.Domain.query.all(); m.db.session.add(obj)
+    m.db.session.commit()
+    for c in doc["components"]:
+        ac = m.AgeCohort.query.filter_by(name=c["age_cohort"]).first(); d = m.Domain.query.filter_by(name=c["domain"]).first()
+        m.db.session.add(m.Component(name=c["name"], age_cohort_id=ac.id, domain_id=d.id))
+    m.db.session.commit()
+
+def clear(m):
+    for table in reversed(m.db.metadata.sorted_tables):
+        if table.name in ("component", "playtype_agecohort_association", "playtype_domain_association", "play_type", "age_cohort", "domain"):
+            m.db.session.execute(table.delete())
+    m.db.session.commit()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    m = load_app(); doc = synthetic_doc(n)
+    with m.app.app_context():
+        start = time.perf_counter(); legacy_seed(m, doc); legacy = time.perf_counter() - start
+        clear(m)
+        start = time.perf_counter(); diff = import_curriculum(doc); bulk = time.perf_counter() - start
+        start = time.perf_counter(); again = import_curriculum(doc); rerun = time.perf_counter() - start
+    assert len(diff["components"]["added"]) == n and not again["components"]["added"]
+    print(f"{n} components, {len(doc['play_types'])} play types")
+    print(f"  per-row seeding:        {legacy:8.3f} s")
+    print(f"  bulk import:            {bulk:8.3f} s")
+    print(f"  idempotent re-import:   {rerun:8.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Login throughput with concurrent clients, and how much a login wave slows down other endpoints.
+
+Runs the app on a threaded local HTTP server. `clients` threads log in repeatedly while one probe
+thread keeps requesting /api/chatbot/options. Each configuration is measured separately:
+hashing inline on the request threads (PASSWORD_HASH_WORKERS=0) and in the process pool.
+
+    python -m benchmarks.bench_login [clients] [logins_per_client] [pool_workers] [method]
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import requests
+from werkzeug.serving import make_server
+from .common import load_app
+
+PASSWORD = "benchmark-password"
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+
+def run(base_url, n_clients, per_client):
+    latencies = []; probe = []; errors = [0]; lock = threading.Lock(); done = threading.Event()
+    def client(i):
+        session = requests.Session(); local = []
+        for _ in range(per_client):
+            start = time.perf_counter()
+            r = session.post(f"{base_url}/api/login", json={"email": f"bench{i}@example.com", "password": PASSWORD})
+            local.append(time.perf_counter() - start)
+            if r.status_code != 200: errors[0] += 1
+        with lock: latencies.extend(local)
+    def prober():
+        session = requests.Session(); session.post(f"{base_url}/api/login", json={"email": "probe@example.com", "password": PASSWORD})
+        while not done.is_set():
+            start = time.perf_counter(); session.get(f"{base_url}/api/chatbot/options"); probe.append(time.perf_counter() - start)
+            time.sleep(0.01)
+    probe_thread = threading.Thread(target=prober); probe_thread.start()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - start; done.set(); probe_thread.join()
+    return wall, sorted(latencies), sorted(probe), errors[0]
+
+def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pool_workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    method = sys.argv[4] if len(sys.argv) > 4 else "scrypt"
+    m = load_app(); app = m.app
+    m.passwords.configure(method=method, workers=0)
+    with app.app_context():
+        m.seed_database()
+        for email in [f"bench{i}@example.com" for i in range(n_clients)] + ["probe@example.com"]:
+            user = m.User(first_name="Bench", last_name="User", email=email, force_password_change=False)
+            user.set_password(PASSWORD); m.db.session.add(user)
+        m.db.session.commit()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True); threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"{n_clients} clients x {per_client} logins, method={method}, cpus={os.cpu_count()}")
+    for label, workers in (("inline", 0), (f"pool({pool_workers})", pool_workers)):
+        m.passwords.configure(workers=workers)
+        if workers: m.passwords.hash_password("warm-up")  # start the pool outside the measurement
+        wall, latencies, probe, errors = run(base_url, n_clients, per_client)
+        print(f"{label:<10} {n_clients * per_client / wall:>7.1f} logins/s   login p50 {percentile(latencies, .5):>7.1f} ms  p99 {percentile(latencies, .99):>7.1f} ms"
+              f"   other-endpoint p50 {percentile(probe, .5):>6.1f} ms  p99 {percentile(probe, .99):>6.1f} ms   errors {errors}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
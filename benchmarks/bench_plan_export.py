@@ -0,0 +1,63 @@
+"""
+Memory and throughput of the streaming plan export.
+
+Stores `plans` saved plans (guides in compressed guide storage) and streams /api/admin/plans/export for
+growing id ranges, consuming the response chunk by chunk as a client would. Peak Python heap use is
+measured with tracemalloc and compared with building the same ZIP in memory.
+
+    python -m benchmarks.bench_plan_export [plans]
+"""
+import io
+import sys
+import time
+import random
+import zipfile
+import datetime
+import tracemalloc
+from sqlalchemy import insert
+from .common import load_app, login
+from .synthetic import synthetic_guide
+
+SELECTIONS = {"age": "3-5 years", "domain": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+
+def measure(fn):
+    tracemalloc.start(); start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start; peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    n_plans = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    m = load_app(); app = m.app; rng = random.Random(9); guides = sys.modules["backend.guides"]; export = sys.modules["backend.export"]
+    with app.app_context():
+        m.create_admin_user_if_not_exists(); admin_id = m.User.query.filter_by(role='admin').one().id
+        blob_ids = guides.store_documents([synthetic_guide(rng) for _ in range(min(n_plans, 2000))])
+        now = datetime.datetime(2026, 1, 1); batch = []
+        for i in range(n_plans):
+            batch.append({"title": f"Plan {i}", "content": "", "guide_id": blob_ids[i % len(blob_ids)], "selections": SELECTIONS, "age_cohort": "3-5 years",
+                          "subject": "Science", "play_type": "Free Play", "user_id": admin_id, "created_at": now + datetime.timedelta(minutes=i)})
+            if len(batch) == 5000: m.db.session.execute(insert(m.Plan), batch); batch = []
+        if batch: m.db.session.execute(insert(m.Plan), batch)
+        m.db.session.commit()
+    client = login(app.test_client(), app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
+
+    def stream(max_id, export_format):
+        response = client.get('/api/admin/plans/export', query_string={"format": export_format, "max_id": max_id}, buffered=False)
+        size = sum(len(chunk) for chunk in response.response); response.close(); return size
+
+    def in_memory(max_id):
+        with app.app_context():
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                for row, markdown, _ in export.iter_export_rows({}, 0, max_id, with_author=True): archive.writestr(export.export_file_name(row, True), markdown)
+            return len(buffer.getvalue())
+
+    print(f"{'plans':>7} {'format':>6} {'size':>9} {'time':>8} {'plans/s':>8} {'peak heap (streamed)':>21} {'peak heap (in-memory ZIP)':>26}")
+    for count in sorted({n for n in (1_000, 5_000, n_plans) if n <= n_plans}):
+        for export_format in ("zip", "jsonl"):
+            elapsed, peak, size = measure(lambda: stream(count, export_format))
+            baseline = f"{measure(lambda: in_memory(count))[1] / 1e6:>23.1f} MB" if export_format == "zip" else ""
+            print(f"{count:>7} {export_format:>6} {size / 1e6:>6.1f} MB {elapsed:>6.2f} s {count / elapsed:>8.0f} {peak / 1e6:>18.1f} MB {baseline}")
+
+if __name__ == "__main__":
+    main()
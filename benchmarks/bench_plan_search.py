@@ -0,0 +1,76 @@
+"""
+Saved-plan search latency over a large synthetic corpus.
+
+Inserts `plans` synthetic plans spread over `users` teachers (one "heavy" teacher owns `heavy` of them),
+then times /api/my-plans/search for common, rare, prefix and filtered queries. The LIKE scan used on
+non-SQLite databases is timed over the same data for comparison.
+
+    python -m benchmarks.bench_plan_search [plans] [users] [heavy]
+"""
+import sys
+import time
+import random
+import datetime
+from sqlalchemy import insert
+from .common import load_app, timed, login
+
+WORDS = ("water sand blocks paint music dance story puppet garden leaves counting shapes colours sorting pouring "
+         "splash bubbles river boats floating sinking measuring cups friends sharing turns feelings calm breathing "
+         "kindness teamwork rhythm drums scarves balance climbing rolling balls ramps mirrors shadows light torch "
+         "animals farm zoo market shop money numbers letters sounds rhymes clapping stamping painting clay dough").split()
+COHORTS = ["0-1 years", "1-3 years", "3-5 years", "5-8 years"]
+SUBJECTS = ["Mathematics", "Language", "Science", "Arts", "Physical"]
+QUERIES = [("common term", "water", {}), ("two terms", "water splash", {}), ("prefix", "bubb", {}),
+           ("rare term", "zebra", {}), ("filtered", "music", {"age_cohort": "3-5 years", "subject": "Arts"})]
+
+def build_vocabulary(rng, size=5000):
+    """Pseudo-words with Zipf-like weights, so that term frequencies resemble natural text."""
+    letters = "abcdefghijklmnoprstuvw"
+    words = list(dict.fromkeys("".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(size * 2)))[:size]
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+def synthetic_plan(rng, vocabulary, user_id, index, created):
+    """Each plan has a theme of four activity words that recur through otherwise generic text."""
+    words, weights = vocabulary; theme = rng.sample(WORDS, 4)
+    title = " ".join(theme[:3]).title()
+    paragraphs = []
+    for _ in range(5):
+        body = rng.choices(words, weights, k=60)
+        for _ in range(4): body[rng.randrange(len(body))] = rng.choice(theme)
+        paragraphs.append("## " + rng.choice(theme).title() + "\n" + " ".join(body))
+    if index % 997 == 0: paragraphs.append("A zebra visits the classroom.")
+    return {"title": title, "content": "\n\n".join(paragraphs), "age_cohort": rng.choice(COHORTS), "subject": rng.choice(SUBJECTS),
+            "play_type": "Guided Play", "user_id": user_id, "created_at": created}
+
+def main():
+    n_plans = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    heavy = int(sys.argv[3]) if len(sys.argv) > 3 else 2_000
+    m = load_app(); app = m.app; rng = random.Random(7); vocabulary = build_vocabulary(rng); search = sys.modules["backend.search"]
+    with app.app_context():
+        m.create_admin_user_if_not_exists()
+        admin_id = m.User.query.filter_by(role='admin').one().id
+        m.db.session.execute(insert(m.User), [{"first_name": "T", "last_name": str(i), "email": f"t{i}@example.com", "password_hash": "x", "force_password_change": False} for i in range(n_users - 1)])
+        user_ids = [admin_id] + [u.id for u in m.User.query.filter(m.User.id != admin_id)]
+        start = time.perf_counter(); now = datetime.datetime(2026, 1, 1); batch = []
+        for i in range(n_plans):
+            owner = admin_id if i < heavy else user_ids[1 + i % (len(user_ids) - 1)]
+            batch.append(synthetic_plan(rng, vocabulary, owner, i, now - datetime.timedelta(minutes=i)))
+            if len(batch) == 5000: m.db.session.execute(insert(m.Plan), batch); batch = []
+        if batch: m.db.session.execute(insert(m.Plan), batch)
+        m.db.session.commit()
+        print(f"Inserted {n_plans} plans (indexed by triggers) in {time.perf_counter() - start:.1f} s; heavy user owns {heavy}")
+
+    client = login(app.test_client(), app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
+    print(f"{'query':<13} {'hits':>6} {'FTS5 endpoint':>15} {'LIKE scan':>11}")
+    for label, q, filters in QUERIES:
+        params = {"q": q, **filters}
+        fts_time, response = timed(lambda: client.get('/api/my-plans/search', query_string=params), repeat=20)
+        with app.app_context():
+            like_time, _ = timed(lambda: search._search_like(admin_id, search.search_terms(q), filters.get("age_cohort"), filters.get("subject"), 1, 20), repeat=5)
+        print(f"{label:<13} {response.json['total']:>6} {fts_time * 1000:>12.2f} ms {like_time * 1000:>8.2f} ms")
+    page_time, _ = timed(lambda: client.get('/api/my-plans/search', query_string={"q": "water", "page": 20}), repeat=20)
+    print(f"page 20 of 'water': {page_time * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
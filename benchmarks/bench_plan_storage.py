@@ -0,0 +1,69 @@
+"""
+Database size and plan list/detail latency before and after moving plans to compressed guide storage.
+
+Builds a legacy database in which every saved plan stores its rendered markdown inline and every
+feedback row stores the full model output (each generated guide is saved by 1-3 teachers and rated
+once), measures it, runs migrate_plan_storage() and measures again.
+
+    python -m benchmarks.bench_plan_storage [distinct_guides]
+"""
+import os
+import sys
+import time
+import random
+import datetime
+from sqlalchemy import insert, text
+from .common import load_app, timed, login
+from .synthetic import synthetic_guide
+
+def database_size(m):
+    with m.db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)")); conn.execute(text("VACUUM"))
+    path = m.db.engine.url.database
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def measure(m, client, label, plan_ids, rng):
+    with m.app.app_context():
+        size = database_size(m)
+    list_time, _ = timed(lambda: client.get('/api/my-plans'), repeat=50)
+    sample = rng.sample(plan_ids, 200)
+    start = time.perf_counter()
+    for plan_id in sample: client.get(f'/api/plans/{plan_id}')
+    cold = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    for plan_id in sample: client.get(f'/api/plans/{plan_id}')
+    warm = (time.perf_counter() - start) / len(sample)
+    print(f"{label:<7} db {size / 1e6:>7.1f} MB   list {list_time * 1000:>6.2f} ms   detail (first read) {cold * 1000:>6.2f} ms   (repeat) {warm * 1000:>6.2f} ms")
+
+def main():
+    n_guides = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    m = load_app(); app = m.app; rng = random.Random(3); guides_module = sys.modules["backend.guides"]
+    with app.app_context():
+        m.create_admin_user_if_not_exists(); admin_id = m.User.query.filter_by(role='admin').one().id
+        m.db.session.execute(insert(m.User), [{"first_name": "T", "last_name": str(i), "email": f"t{i}@example.com", "password_hash": "x", "force_password_change": False} for i in range(199)])
+        user_ids = [admin_id] + [u.id for u in m.User.query.filter(m.User.id != admin_id)]
+        plans = []; feedback = []; now = datetime.datetime(2026, 1, 1)
+        for g in range(n_guides):
+            guide = synthetic_guide(rng); selections = {"age": "3-5 years", "domain": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+            markdown = guides_module.render_markdown(guide, selections)
+            feedback.append({"rating": 1, "selections": selections, "generated_output": guide, "user_id": rng.choice(user_ids)})
+            for owner in [admin_id if g < 300 else rng.choice(user_ids)] + rng.sample(user_ids, rng.randint(0, 2)):
+                plans.append({"title": guide["guide_title"], "content": markdown, "age_cohort": "3-5 years", "subject": "Science",
+                              "play_type": "Free Play", "user_id": owner, "created_at": now - datetime.timedelta(minutes=len(plans))})
+        for start in range(0, len(plans), 2000): m.db.session.execute(insert(m.Plan), plans[start:start + 2000])
+        for start in range(0, len(feedback), 2000): m.db.session.execute(insert(m.FeedbackLog), feedback[start:start + 2000])
+        m.db.session.commit()
+        plan_ids = [row[0] for row in m.db.session.execute(text("SELECT id FROM plan WHERE user_id = :u"), {"u": admin_id})]
+    print(f"{n_guides} distinct guides, {len(plans)} saved plans, {len(feedback)} feedback rows")
+    client = login(app.test_client(), app.config['ADMIN_EMAIL'], app.config['ADMIN_PASSWORD'])
+    measure(m, client, "before", plan_ids, rng)
+    with app.app_context():
+        start = time.perf_counter(); guides_module.migrate_plan_storage(); elapsed = time.perf_counter() - start
+        blobs = m.db.session.execute(text("SELECT count(*), sum(length(data)), sum(raw_size) FROM guide_blob")).one()
+        m.db.session.execute(text("INSERT INTO plan_fts(plan_fts, rank) VALUES ('integrity-check', 1)")); m.db.session.commit()  # raises if the search index drifted
+    print(f"migration {elapsed:.1f} s: {blobs[0]} blobs, {blobs[2] / 1e6:.1f} MB of JSON compressed to {blobs[1] / 1e6:.1f} MB")
+    guides_module.load_document.cache_clear(); guides_module._render_blob.cache_clear()
+    measure(m, client, "after", plan_ids, rng)
+
+if __name__ == "__main__":
+    main()
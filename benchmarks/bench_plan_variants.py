@@ -0,0 +1,43 @@
+"""
+"Try another version" by regenerating vs by serving a stored variant (backend/variants.py), offline.
+
+A teacher asks for a plan and then for `tries` other versions of it, either with a new POST /api/generate-plan
+each time or with POST /api/generate-plan/next-variant after a first request for `tries + 1` variants. The
+model and embeddings are the stubs from stubs.py, with a corpus of 500 chunks.
+Reported: latency of the first plan and of each other version, LLM calls and tokens, and embedding calls.
+
+    python -m benchmarks.bench_plan_variants [tries] [llm_latency_s] [embed_latency_s]
+"""
+import sys
+import time
+import random
+import argparse
+from .suite import setup, seed_corpus, latency, REQUEST
+
+def main():
+    tries = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    args = argparse.Namespace(llm_latency=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0, tokens_per_second=400.0,
+                              embed_latency=float(sys.argv[3]) if len(sys.argv) > 3 else 0.1)
+    m, admin, (embeddings, _) = setup(args); seed_corpus(embeddings, 500, random.Random(50))
+    m.app.config['PLAN_VARIANTS_MAX'] = max(m.app.config['PLAN_VARIANTS_MAX'], tries + 1)
+    model = sys.modules["backend.services"].ChatGoogleGenerativeAI; tokens = sys.modules["backend.metrics"].LLM_TOKENS
+
+    def post(path, body=None):
+        start = time.perf_counter(); response = admin.post(path, json=body); elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return elapsed, response.json
+
+    print(f"first plan + {tries} other versions; stub LLM {args.llm_latency:.1f} s + completion at {args.tokens_per_second:.0f} tokens/s, embedding call {args.embed_latency * 1000:.0f} ms")
+    print(f"{'strategy':<22} {'first plan':>11} {'other versions (mean)':>22} {'total':>9} {'LLM calls':>10} {'LLM tokens':>11} {'embed calls':>12}")
+    for label, variants in (("regenerate", 1), (f"{tries + 1} variants up front", tries + 1)):
+        calls, embeds = model.calls, embeddings.calls; tokens_before = sum(total for total, _ in tokens.totals().values())
+        first, body = post('/api/generate-plan', {**REQUEST, "variants": variants}); titles = {body["guide_title"]}; others = []
+        for _ in range(tries):
+            elapsed, body = post('/api/generate-plan/next-variant') if variants > 1 else post('/api/generate-plan', {**REQUEST, "variants": 1})
+            others.append(elapsed); titles.add(body["guide_title"])
+        used = sum(total for total, _ in tokens.totals().values()) - tokens_before
+        print(f"{label:<22} {first * 1000:>8.0f} ms {latency(others)['mean_ms']:>19.0f} ms {(first + sum(others)):>7.1f} s {model.calls - calls:>10} {used:>11.0f} {embeddings.calls - embeds:>12}"
+              + ("" if len(titles) == tries + 1 else f"  ({len(titles)} distinct guides)"))
+
+if __name__ == "__main__":
+    main()
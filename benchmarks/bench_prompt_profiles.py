@@ -0,0 +1,48 @@
+"""
+Tokens and latency per prompt profile (backend/prompts.py), offline.
+
+Every profile the app knows generates `requests` plans through POST /api/generate-plan with "prompt_profile"
+set. Each request uses different selections, so the prompts differ. The model is the stub from stubs.py. It
+counts the prompt text plus the bound TeacherGuide tool declaration as prompt tokens, as Gemini does. Its
+latency does not depend on prompt length, so real-model latency differences only show up in production,
+where ltp_llm_call_duration_seconds{profile} and GET /api/admin/prompt-profiles record them.
+
+Reported per profile:
+- the prompt tokens, completion tokens and LLM time that the app recorded (GET /api/admin/prompt-profiles)
+- request latency
+- the share of requests that came back as a valid guide
+
+    python -m benchmarks.bench_prompt_profiles [requests] [llm_latency_s]
+"""
+import sys
+import time
+import random
+import argparse
+from .suite import setup, seed_corpus, latency
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    args = argparse.Namespace(llm_latency=float(sys.argv[2]) if len(sys.argv) > 2 else 0.2, tokens_per_second=400.0, embed_latency=0.0)
+    m, admin, (embeddings, _) = setup(args); rng = random.Random(49)
+    seed_corpus(embeddings, 500, rng)
+    cohorts = ["0-2 years", "3-5 years", "5-8 years"]; domains = ["Science", "Numeracy", "Language", "Social Skills"]
+    play_types = [("Free Play", "Standard"), ("Guided Play", "Green Play"), ("Outdoor Play", "Climate Vulnerability")]
+
+    print(f"{n_requests} requests per profile, stub LLM latency {args.llm_latency:.2f} s + completion at {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'profile':<14} {'ok':>6} {'prompt tokens':>14} {'completion':>11} {'LLM mean':>10} {'p50':>9} {'p95':>9}")
+    for profile in admin.get('/api/admin/prompt-profiles').json["profiles"]:
+        samples = []; ok = 0; rng = random.Random(7)
+        for i in range(n_requests):
+            name, context = rng.choice(play_types)
+            body = {"age_cohort": rng.choice(cohorts), "subject": rng.choice(domains), "sub_domain": f"Component {i}",
+                    "play_type": {"name": name, "context": context}, "prompt_profile": profile["name"]}
+            start = time.perf_counter(); response = admin.post('/api/generate-plan', json=body); samples.append(time.perf_counter() - start)
+            assert response.headers.get("X-Prompt-Profile") == profile["key"], response.get_data(as_text=True)
+            ok += response.status_code == 200 and bool(response.json.get("guide_title"))
+        stats = next(p for p in admin.get('/api/admin/prompt-profiles').json["profiles"] if p["key"] == profile["key"])["stats"]
+        request_latency = latency(samples)
+        print(f"{profile['key']:<14} {ok:>3}/{n_requests:<2} {stats['mean_prompt_tokens']:>14} {stats['mean_completion_tokens']:>11} {stats['mean_llm_ms']:>7} ms "
+              f"{request_latency['p50_ms']:>6.0f} ms {request_latency['p95_ms']:>6.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Per-worker vector stores vs one retrieval service (backend/retrieval_service.py), offline.
+
+Embeddings are the stub from stubs.py: every embedding call costs `embed_ms`, however many texts it holds.
+The index holds `chunks` synthetic chunks.
+
+1. Batching: `threads` threads each send `queries` queries back to back. They go either to the local store
+   of this process, one embedding call per query, or through RetrievalClient to the service, which embeds
+   the queries waiting together in one call. Reported: embedding calls, throughput and latency.
+2. Memory: total RSS of `workers` web-worker processes that each load the index, vs the same workers as
+   thin clients plus the one service process.
+
+    python -m benchmarks.bench_retrieval_service [chunks] [threads] [queries] [workers] [embed_ms]
+"""
+import sys
+import time
+import random
+import tempfile
+import threading
+import subprocess
+from .stubs import install_stubs
+from .suite import seed_corpus, latency
+from .synthetic import sentence
+
+def rss_mb(pid="self"):
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+
+def load_index(chunks, embed_ms):
+    embeddings, store = install_stubs(embed_latency=embed_ms / 1000, embed_per_text_latency=0)
+    seed_corpus(embeddings, chunks, random.Random(5)); return embeddings, store
+
+def serve(url, chunks, embed_ms):
+    """Child process: the retrieval service over a stub index."""
+    load_index(chunks, embed_ms)
+    from backend.retrieval_service import make_server
+    server = make_server(url); print("ready", flush=True); server.serve_forever()
+
+def worker(mode, chunks, embed_ms):
+    """Child process: a web worker after its first retrieval, either with its own index or as a client."""
+    import backend.rag_setup as rag_setup
+    if mode == "local": load_index(chunks, embed_ms)
+    else:
+        from backend.retrieval_service import RetrievalClient
+        rag_setup._service = RetrievalClient(mode)
+    rag_setup.retrieve_relevant_context("Activity ideas for water play with children aged 3-5 years")
+    print(f"{rss_mb():.1f}", flush=True)
+
+def start_service(url, chunks, embed_ms):
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_retrieval_service", "--serve", url, str(chunks), str(embed_ms)], stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == "ready"
+    return process
+
+def run_queries(retrieve, n_threads, n_queries):
+    rng = random.Random(11); texts = [[sentence(rng, 14) for _ in range(n_queries)] for _ in range(n_threads)]; samples = []; lock = threading.Lock()
+    def run(batch):
+        for text in batch:
+            start = time.perf_counter(); retrieve(text); elapsed = time.perf_counter() - start
+            with lock: samples.append(elapsed)
+    threads = [threading.Thread(target=run, args=(batch,)) for batch in texts]; start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start, samples
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    n_workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    embed_ms = float(sys.argv[5]) if len(sys.argv) > 5 else 100
+    url = f"unix://{tempfile.mkdtemp(prefix='ltp-retrieval-')}/retrieval.sock"
+    import backend.rag_setup as rag_setup
+    from backend.retrieval_service import RetrievalClient
+
+    print(f"{n_chunks} chunks, {n_threads} threads x {n_queries} queries, embedding call {embed_ms:.0f} ms")
+    print(f"{'mode':<10} {'queries':>8} {'embed calls':>12} {'largest batch':>14} {'queries/s':>10} {'p50':>9} {'p95':>9}")
+    embeddings, _ = load_index(n_chunks, embed_ms); calls = embeddings.calls
+    elapsed, samples = run_queries(rag_setup.retrieve_relevant_context, n_threads, n_queries); stats = latency(samples)
+    print(f"{'local':<10} {len(samples):>8} {embeddings.calls - calls:>12} {1:>14} {len(samples) / elapsed:>10.1f} {stats['p50_ms']:>6.0f} ms {stats['p95_ms']:>6.0f} ms")
+    rag_setup._vectorstore = rag_setup._embedding_model = None
+
+    service = start_service(url, n_chunks, embed_ms)
+    try:
+        rag_setup._service = RetrievalClient(url)
+        elapsed, samples = run_queries(rag_setup.retrieve_relevant_context, n_threads, n_queries); stats = latency(samples); health = rag_setup._service.health()
+        print(f"{'service':<10} {health['queries']:>8} {health['embedding_calls']:>12} {health['largest_batch']:>14} {len(samples) / elapsed:>10.1f} {stats['p50_ms']:>6.0f} ms {stats['p95_ms']:>6.0f} ms")
+        rag_setup._service = None
+
+        print(f"\n{'workers':>8} {'own index, total RSS':>22} {'clients + service, total RSS':>30}")
+        run_worker = lambda mode: float(subprocess.run([sys.executable, "-m", "benchmarks.bench_retrieval_service", "--worker", mode, str(n_chunks), str(embed_ms)],
+                                                       capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+        local_rss = run_worker("local"); client_rss = run_worker(url); service_rss = rss_mb(service.pid)
+        for n in sorted({1, 2, n_workers}):
+            print(f"{n:>8} {local_rss * n:>19.0f} MB {client_rss * n + service_rss:>27.0f} MB")
+    finally: service.terminate(); service.wait()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve": serve(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--worker": worker(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else: main()
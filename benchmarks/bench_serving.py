@@ -0,0 +1,93 @@
+"""
+Concurrent write load against a file-backed SQLite database, per serving profile.
+
+Each profile starts a real server on a fresh copy of the same database. `clients` threads log in and
+then loop over save-plan, submit-feedback and list-plans requests. Reported per profile: requests/s,
+latency and the number of failed requests ("database is locked" surfaces as HTTP 500).
+
+  legacy        flask dev server, rollback journal, synchronous=FULL (the previous setup)
+  gunicorn      gunicorn.conf.py workers, still on the legacy pragmas
+  production    gunicorn.conf.py workers with WAL, synchronous=NORMAL and busy_timeout
+
+    python -m benchmarks.bench_serving [clients] [iterations_per_client] [gunicorn_workers]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import requests
+from .common import load_app
+
+PASSWORD = "benchmark-password"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LEGACY_PRAGMAS = {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def start_server(profile, db_path, workers):
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "SKIP_DB_INIT": "1", "GUNICORN_BIND": f"127.0.0.1:{port}",
+           "GUNICORN_WORKERS": str(workers), "GUNICORN_ACCESS_LOG": "", "ACTIVITY_LOG_FLUSH_INTERVAL": "0.2"}
+    if profile != "production": env.update(LEGACY_PRAGMAS)
+    if profile == "legacy": command = [sys.executable, "-m", "flask", "--app", "backend.app", "run", "--port", str(port)]
+    else: command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "backend.wsgi:app"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 300  # workers import LangChain at boot, which is slow on small machines
+    while time.monotonic() < deadline:
+        try: requests.get(f"{base_url}/api/chatbot/options", timeout=5); return process, base_url
+        except requests.RequestException: time.sleep(0.5)
+    process.kill(); raise RuntimeError(f"{profile} server did not start")
+
+def run_load(base_url, n_clients, iterations):
+    latencies = []; failures = [0]; lock = threading.Lock()
+    def client(i):
+        session = requests.Session(); local = []; failed = 0
+        session.post(f"{base_url}/api/login", json={"email": f"load{i}@example.com", "password": PASSWORD})
+        plan = {"title": f"Load {i}", "content": "# Plan\n" + "Lorem ipsum dolor sit amet. " * 200, "age_cohort": "3-5 years", "subject": "Mathematics", "play_type": "Free Play"}
+        feedback = {"rating": 1, "selections": {"age_cohort": "3-5 years"}, "generated_output": plan["content"]}
+        calls = (("post", "/api/my-plans", plan), ("post", "/api/feedback", feedback), ("get", "/api/my-plans", None))
+        for _ in range(iterations):
+            for method, path, body in calls:
+                start = time.perf_counter()
+                try: ok = getattr(session, method)(f"{base_url}{path}", json=body, timeout=60).status_code < 400
+                except requests.RequestException: ok = False
+                local.append(time.perf_counter() - start); failed += not ok
+        with lock: latencies.extend(local); failures[0] += failed
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start, sorted(latencies), failures[0]
+
+def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    # Cheap hashes: this measures database contention, not the password KDF.
+    os.environ.update(PASSWORD_HASH_METHOD="pbkdf2:sha256:1000", PASSWORD_HASH_WORKERS="0", SQL_INSTRUMENTATION="false")
+    workdir = tempfile.mkdtemp(prefix="ltp-serving-"); template = os.path.join(workdir, "template.db")
+    m = load_app(template)
+    with m.app.app_context():
+        m.seed_database()
+        for i in range(n_clients):
+            user = m.User(first_name="Load", last_name=str(i), email=f"load{i}@example.com", force_password_change=False); user.set_password(PASSWORD); m.db.session.add(user)
+        m.db.session.commit(); m.db.session.remove(); m.activity_log.stop(); m.db.engine.dispose()
+    print(f"{n_clients} clients x {iterations} iterations x 3 requests, gunicorn workers={workers}, cpus={os.cpu_count()}")
+    for profile in ("legacy", "gunicorn", "production"):
+        db_path = os.path.join(workdir, f"{profile}.db"); shutil.copy(template, db_path)
+        process, base_url = start_server(profile, db_path, workers)
+        try: wall, latencies, failures = run_load(base_url, n_clients, iterations)
+        finally: process.terminate(); process.wait(30)
+        p50 = latencies[len(latencies) // 2] * 1000; p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{profile:<11} {len(latencies) / wall:>7.1f} req/s   p50 {p50:>7.1f} ms   p99 {p99:>8.1f} ms   failed {failures}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
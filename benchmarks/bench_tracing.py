@@ -0,0 +1,47 @@
+"""
+Overhead of the request tracing and metrics instrumentation.
+
+Times an empty `stage()` block outside and inside a request trace, a request to a cheap endpoint with
+and without the tracing hooks, and rendering /metrics once `series` stage/endpoint series exist.
+
+    python -m benchmarks.bench_tracing [iterations]
+"""
+import os
+import sys
+import time
+import tempfile
+from .common import load_app, timed
+
+def per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations): fn()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    os.environ["TRACE_FILE"] = os.path.join(tempfile.mkdtemp(prefix="ltp-traces-"), "requests.jsonl")
+    m = load_app(); app = m.app; tracing = sys.modules["backend.tracing"]; metrics = sys.modules["backend.metrics"]
+
+    def empty_stage():
+        with tracing.stage("bench"): pass
+    print(f"stage() outside a request: {per_call(empty_stage, iterations) * 1e6:.2f} us")
+    with app.test_request_context('/'):
+        token = tracing._current_trace.set(tracing.Trace("bench"))
+        print(f"stage() inside a trace:    {per_call(empty_stage, iterations) * 1e6:.2f} us")
+        tracing._current_trace.reset(token)
+
+    client = app.test_client(); client.get('/api/chatbot/options')
+    traced, _ = timed(lambda: client.get('/api/chatbot/options'), repeat=500)
+    hooks = {key: list(funcs) for key, funcs in (("before", app.before_request_funcs[None]), ("after", app.after_request_funcs[None]))}
+    app.before_request_funcs[None] = [f for f in hooks["before"] if f.__name__ != "_start_trace"]
+    app.after_request_funcs[None] = [f for f in hooks["after"] if f.__name__ != "_finish_trace"]
+    untraced, _ = timed(lambda: client.get('/api/chatbot/options'), repeat=500)
+    app.before_request_funcs[None] = hooks["before"]; app.after_request_funcs[None] = hooks["after"]
+    print(f"GET /api/chatbot/options: {traced * 1000:.3f} ms traced, {untraced * 1000:.3f} ms without the tracing hooks")
+
+    for i in range(200): metrics.STAGE_SECONDS.observe(i / 100, stage=f"stage{i % 20}"); metrics.HTTP_SECONDS.observe(i / 1000, method="GET", endpoint=f"endpoint{i}", status=200)
+    render, text = timed(lambda: client.get('/metrics'), repeat=50)
+    print(f"GET /metrics with {len(text.get_data(as_text=True).splitlines())} lines: {render * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
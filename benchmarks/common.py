@@ -0,0 +1,44 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database. The database URL must be in the
+environment before `backend.app` is imported, so always go through `load_app()`.
+"""
+import os
+import time
+import tempfile
+import contextlib
+from sqlalchemy import event
+
+def load_app(db_path=None):
+    """Imports the Flask app bound to a fresh database file and returns the backend.app module."""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="ltp-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-key")
+    os.environ.setdefault("SQL_LOG_LEVEL", "ERROR")
+    from backend import app as backend_app
+    with backend_app.app.app_context():
+        backend_app.upgrade_schema()
+    return backend_app
+
+@contextlib.contextmanager
+def count_queries(engine):
+    """Counts the SQL statements executed on `engine` inside the block: `with count_queries(e) as counter: ...; counter[0]`."""
+    counter = [0]
+    def _count(*args): counter[0] += 1
+    event.listen(engine, "before_cursor_execute", _count)
+    try: yield counter
+    finally: event.remove(engine, "before_cursor_execute", _count)
+
+def timed(fn, repeat=20):
+    """Returns (median_seconds, result_of_last_call) over `repeat` calls of fn()."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter(); result = fn(); samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+def login(client, email, password):
+    response = client.post('/api/login', json={"email": email, "password": password})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return client
@@ -0,0 +1,61 @@
+"""
+Per-endpoint SQL query budgets.
+
+Seeds a curriculum large enough to expose lazy-load loops, calls each read endpoint once with
+a cold cache, and checks the number of statements against its budget and the N+1 detector.
+Endpoints with a budget of None are reported but not enforced. tests/test_query_budgets.py enforces
+the same budgets under pytest; this script prints the counts and DB time.
+
+    python -m benchmarks.query_budgets
+"""
+import sys
+from .common import load_app, login
+from backend.instrumentation import track_queries, QueryBudgetExceeded
+
+N_PLAY_TYPES = 40
+N_RESOURCES = 40
+NPLUSONE_THRESHOLD = 5
+
+# endpoint -> maximum number of statements, including the session user lookup and ETag version query.
+BUDGETS = {
+    "/api/chatbot/options": 10,
+    "/api/my-plans": 6,
+    "/api/admin/users": 4,
+    "/api/admin/activity-logs": 4,
+    "/api/admin/age-cohorts": 4,
+    "/api/admin/domains": 4,
+    "/api/admin/components": 4,
+    "/api/admin/play-types": 6,
+    "/api/admin/resources": 6,
+}
+
+def seed(m):
+    with m.app.app_context():
+        m.create_admin_user_if_not_exists()
+    m.seed_database()
+    with m.app.app_context():
+        cohorts = m.AgeCohort.query.all(); domains = m.Domain.query.all()
+        for k in range(N_PLAY_TYPES):
+            m.db.session.add(m.PlayType(name=f"extra play type {k}", context="Standard", age_cohorts=cohorts[: 1 + k % len(cohorts)], domains=domains[: 1 + k % len(domains)]))
+        for k in range(N_RESOURCES):
+            m.db.session.add(m.Resource(title=f"resource {k}", resource_type="Text", content_path="...", age_cohorts=cohorts[:2], domains=domains[:2]))
+        m.db.session.commit()
+
+def main():
+    m = load_app(); seed(m)
+    client = login(m.app.test_client(), m.app.config['ADMIN_EMAIL'], m.app.config['ADMIN_PASSWORD'])
+    failures = 0
+    print(f"{'endpoint':<28} {'queries':>8} {'budget':>7} {'db ms':>8}  result")
+    for endpoint, budget in BUDGETS.items():
+        result = "ok"
+        try:
+            with track_queries(max_queries=budget, nplusone_threshold=NPLUSONE_THRESHOLD if budget is not None else None) as stats:
+                assert client.get(endpoint).status_code == 200
+        except QueryBudgetExceeded as e:
+            result = f"FAIL: {e}"[:120]; failures += 1
+        if budget is None and stats.repeated(NPLUSONE_THRESHOLD): result = f"unbudgeted, N+1 x{stats.repeated(NPLUSONE_THRESHOLD)[0][1]}"
+        print(f"{endpoint:<28} {stats.count:>8} {str(budget):>7} {stats.total_time * 1000:>8.2f}  {result}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
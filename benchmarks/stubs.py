@@ -0,0 +1,93 @@
+"""
+Offline stand-ins for the Gemini chat model and embeddings, so benchmarks run without an API key or network.
+
+StubChatModel replaces ChatGoogleGenerativeAI where services.py builds it. It answers the TeacherGuide tool
+call with a synthetic guide seeded from the prompt and how often that prompt was sent before in this run, so
+runs are reproducible while repeated requests and the variants of one generation differ, as with sampling. Its
+latency is `latency` seconds plus the completion tokens at `tokens_per_second`, and it reports token usage
+like the real client (about 4 characters per token, tool declarations included).
+StubEmbeddings is a hashed bag-of-words embedding: texts that share words get similar vectors, so MMR
+search behaves realistically. Each call costs `latency` seconds plus `per_text_latency` per text.
+
+install_stubs() patches both into the imported backend and gives rag_setup a fresh vector store:
+Chroma in a temporary directory when chromadb is installed, otherwise LangChain's InMemoryVectorStore.
+"""
+import json
+import math
+import time
+import random
+import hashlib
+import tempfile
+import threading
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from .synthetic import synthetic_guide
+
+CHARS_PER_TOKEN = 4
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+class StubChatModel:
+    latency = 1.0
+    tokens_per_second = 400.0
+    calls = 0
+    samples = {}  # prompt -> calls so far
+    lock = threading.Lock()
+
+    def __init__(self, model="stub", **kwargs):
+        self.model = model; self.kwargs = kwargs
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        name = tool_choice or tools[0].__name__
+        # The tool declarations are sent with every call and billed as prompt tokens.
+        tool_tokens = math.ceil(len(json.dumps([convert_to_openai_tool(tool) for tool in tools])) / CHARS_PER_TOKEN)
+        return RunnableLambda(lambda prompt: self._respond(prompt, name, tool_tokens))
+
+    def _respond(self, prompt, tool_name, tool_tokens=0):
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        with self.lock: sample = self.samples[text] = self.samples.get(text, -1) + 1
+        guide = synthetic_guide(random.Random(_seed(text) + sample))
+        prompt_tokens = math.ceil(len(text) / CHARS_PER_TOKEN) + tool_tokens; completion_tokens = math.ceil(len(json.dumps(guide)) / CHARS_PER_TOKEN)
+        time.sleep(self.latency + completion_tokens / self.tokens_per_second); type(self).calls += 1
+        return AIMessage(content="", tool_calls=[{"name": tool_name, "args": guide, "id": f"call_{_seed(text) % 10 ** 8}"}],
+                         usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens})
+
+class StubEmbeddings(Embeddings):
+    def __init__(self, dimensions=256, latency=0.05, per_text_latency=0.002):
+        self.dimensions = dimensions; self.latency = latency; self.per_text_latency = per_text_latency; self.calls = 0; self.texts = 0
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            h = _seed(word.strip(".,'\"|")); vector[h % self.dimensions] += 1.0 if (h >> 20) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts, **kwargs):
+        time.sleep(self.latency + self.per_text_latency * len(texts)); self.calls += 1; self.texts += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def make_vectorstore(embeddings):
+    """(vector store, backend name) for the benchmarks."""
+    try:
+        from langchain_community.vectorstores import Chroma
+        import chromadb  # noqa: F401 - Chroma needs it at construction time
+        return Chroma(persist_directory=tempfile.mkdtemp(prefix="ltp-bench-chroma-"), embedding_function=embeddings), "chroma"
+    except ImportError:
+        from langchain_core.vectorstores import InMemoryVectorStore
+        return InMemoryVectorStore(embeddings), "in-memory"
+
+def install_stubs(llm_latency=1.0, tokens_per_second=400.0, embed_latency=0.05, embed_per_text_latency=0.002):
+    """Patches the stub model and embeddings into the imported backend. Returns (embeddings, vector store backend name)."""
+    import backend.services as services, backend.rag_setup as rag_setup
+    model = type("ConfiguredStubChatModel", (StubChatModel,), {"latency": llm_latency, "tokens_per_second": tokens_per_second, "calls": 0, "samples": {}})
+    services.ChatGoogleGenerativeAI = model
+    embeddings = StubEmbeddings(latency=embed_latency, per_text_latency=embed_per_text_latency)
+    rag_setup._embedding_model = embeddings; rag_setup._vectorstore, store = make_vectorstore(embeddings)
+    return embeddings, store
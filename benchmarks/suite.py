@@ -0,0 +1,235 @@
+"""
+Offline benchmark suite with machine-readable results.
+
+Runs without a network connection or API key: the chat model and embeddings are the deterministic stubs
+in stubs.py, and all data comes from synthetic.py. Each scenario runs in its own process against a fresh
+SQLite database, so caches and metrics never leak between scenarios.
+
+  chatbot_options     GET /api/chatbot/options on a large curriculum: first build, full reload, 304 revalidation
+  generate_plan       POST /api/generate-plan at increasing numbers of concurrent users, with per-stage means
+  resource_ingestion  POST /api/admin/resources (Text resources): documents and chunks embedded per second
+  retrieval           retrieve_relevant_context() and the bare vector search as the corpus grows
+  plan_listing        GET /api/my-plans first page, a deep cursor page (about page 21) and 304 revalidation
+
+Results are written as JSON (metric names ending in _ms are latencies, lower is better; names ending
+in _per_s are throughputs, higher is better). With --compare, every latency and throughput is checked
+against a previous results file and changes worse than --threshold are reported as regressions.
+
+    python -m benchmarks.suite [--scenarios a,b] [--quick] [--output results.json] [--compare baseline.json]
+                               [--threshold 0.2] [--fail-on-regression] [--llm-latency 0.5] [--tokens-per-second 2000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import datetime
+import threading
+import subprocess
+from .common import load_app, login
+
+PASSWORD = "benchmark-password"
+REQUEST = {"age_cohort": "3-5 years", "subject": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+SCENARIOS = {}
+
+def scenario(fn):
+    SCENARIOS[fn.__name__] = fn; return fn
+
+def latency(samples, prefix=""):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {f"{prefix}p50_ms": round(pick(0.5), 3), f"{prefix}p95_ms": round(pick(0.95), 3), f"{prefix}mean_ms": round(sum(samples) / len(samples) * 1000, 3)}
+
+def timed_calls(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter(); fn(); samples.append(time.perf_counter() - start)
+    return samples
+
+def setup(args, stubs=True):
+    """A fresh app with an admin client and, optionally, the offline model stubs installed."""
+    os.environ.update({"PASSWORD_HASH_WORKERS": "0", "GENERATION_RATE_LIMITS": '{"teacher": {"rate_per_minute": 600000, "burst": 100000}}', "TRACE_FILE": ""})
+    m = load_app(); m.passwords.configure(workers=0)
+    with m.app.app_context(): m.create_admin_user_if_not_exists()
+    installed = None
+    if stubs:
+        from .stubs import install_stubs
+        installed = install_stubs(args.llm_latency, args.tokens_per_second, args.embed_latency)
+    admin = login(m.app.test_client(), m.app.config['ADMIN_EMAIL'], m.app.config['ADMIN_PASSWORD'])
+    return m, admin, installed
+
+def seed_corpus(embeddings, chunks, rng):
+    """Adds `chunks` synthetic resource chunks straight to the vector store, without the embedding latency."""
+    from .synthetic import paragraph
+    rag_setup = sys.modules["backend.rag_setup"]; saved = (embeddings.latency, embeddings.per_text_latency); embeddings.latency = embeddings.per_text_latency = 0
+    for start in range(0, chunks, 500):
+        n = min(500, chunks - start)
+        rag_setup._vectorstore.add_texts([paragraph(rng, 5) for _ in range(n)], metadatas=[{"title": f"Resource {(start + i) // 10}"} for i in range(n)])
+    embeddings.latency, embeddings.per_text_latency = saved
+
+@scenario
+def chatbot_options(args):
+    from .synthetic import synthetic_doc
+    from backend.curriculum_io import import_curriculum
+    m, admin, _ = setup(args, stubs=False); n_components = 600 if args.quick else 2400
+    with m.app.app_context(): import_curriculum(synthetic_doc(n_components, n_cohorts=8, n_domains=25, n_play_types=50))
+    start = time.perf_counter(); response = admin.get('/api/chatbot/options'); build = time.perf_counter() - start
+    etag = response.headers["ETag"]; repeat = 50 if args.quick else 200
+    return {"components": n_components, "response_bytes": len(response.data), "first_build_ms": round(build * 1000, 3),
+            **latency(timed_calls(lambda: admin.get('/api/chatbot/options'), repeat), "reload_"),
+            **latency(timed_calls(lambda: admin.get('/api/chatbot/options', headers={"If-None-Match": etag}), repeat), "revalidate_")}
+
+@scenario
+def generate_plan(args):
+    from .synthetic import create_users
+    m, admin, (embeddings, store) = setup(args); rng = random.Random(45); stage_seconds = sys.modules["backend.metrics"].STAGE_SECONDS
+    seed_corpus(embeddings, 500, rng)
+    levels = [1, 4] if args.quick else [1, 4, 16]; per_user = 2 if args.quick else 3
+    emails = [f"gen{i}@example.com" for i in range(max(levels))]; create_users(m, len(emails), PASSWORD, prefix="gen")
+    clients = [login(m.app.test_client(), email, PASSWORD) for email in emails]
+    results = {"vector_store": store, "corpus_chunks": 500, "max_concurrency": m.admission.max_concurrency,
+               "llm_latency_s": args.llm_latency, "tokens_per_second": args.tokens_per_second}
+    for users in levels:
+        before = stage_seconds.totals()
+        samples = []; errors = [0]; lock = threading.Lock()
+        def worker(client):
+            for _ in range(per_user):
+                start = time.perf_counter(); status = client.post('/api/generate-plan', json=REQUEST).status_code; elapsed = time.perf_counter() - start
+                with lock:
+                    if status == 200: samples.append(elapsed)
+                    else: errors[0] += 1
+        threads = [threading.Thread(target=worker, args=(client,)) for client in clients[:users]]
+        start = time.perf_counter()
+        for t in threads: t.start()
+        for t in threads: t.join()
+        wall = time.perf_counter() - start; level = f"users={users}/"
+        results.update({f"{level}{k}": v for k, v in latency(samples).items()})
+        results[f"{level}throughput_per_s"] = round(len(samples) / wall, 3); results[f"{level}errors"] = errors[0]
+        for (name,), series in stage_seconds._series.items():
+            total, count = series[-2] - before.get((name,), (0.0, 0))[0], series[-1] - before.get((name,), (0.0, 0))[1]
+            if count: results[f"{level}stage/{name}/mean_ms"] = round(total / count * 1000, 3)
+    return results
+
+@scenario
+def resource_ingestion(args):
+    from .synthetic import resource_text
+    m, admin, (embeddings, store) = setup(args); rng = random.Random(46)
+    with m.app.app_context(): domain_ids = [d.id for d in m.Domain.query.limit(2)]; cohort_ids = [c.id for c in m.AgeCohort.query.limit(2)]
+    n_docs = 10 if args.quick else 50; texts = [resource_text(rng, 1500) for _ in range(n_docs)]; samples = []; embedded_before = embeddings.texts
+    for i, text in enumerate(texts):
+        form = {"title": f"Synthetic resource {i}", "resource_type": "Text", "content_path": text, "domain_ids[]": domain_ids, "age_cohort_ids[]": cohort_ids}
+        start = time.perf_counter(); response = admin.post('/api/admin/resources', data=form); samples.append(time.perf_counter() - start)
+        assert response.status_code == 201, response.get_data(as_text=True)
+    chunks = embeddings.texts - embedded_before; wall = sum(samples)
+    return {"vector_store": store, "documents": n_docs, "chunks": chunks, "docs_per_s": round(n_docs / wall, 3), "chunks_per_s": round(chunks / wall, 3),
+            "embed_latency_s": args.embed_latency, **latency(samples)}
+
+@scenario
+def retrieval(args):
+    m, admin, (embeddings, store) = setup(args); rng = random.Random(47); rag_setup = sys.modules["backend.rag_setup"]
+    sizes = [500, 2000] if args.quick else [500, 2000, 10000]; queries = [f"Activity ideas for {w} play with children" for w in ("water", "sand", "blocks", "music", "garden")]
+    results = {"vector_store": store, "embed_latency_s": args.embed_latency}; loaded = 0
+    with m.app.app_context():
+        for size in sizes:
+            seed_corpus(embeddings, size - loaded, rng); loaded = size
+            query_vectors = [embeddings._vector(q) for q in queries]; repeat = 4 if args.quick else 10
+            retrieve = timed_calls(lambda: [rag_setup.retrieve_relevant_context(q) for q in queries], repeat)
+            results.update(latency([s / len(queries) for s in retrieve], f"chunks={size}/retrieve_"))
+            search = timed_calls(lambda: [rag_setup._vectorstore.max_marginal_relevance_search_by_vector(v, k=4, fetch_k=20) for v in query_vectors], repeat)
+            results.update(latency([s / len(queries) for s in search], f"chunks={size}/search_"))
+    return results
+
+@scenario
+def plan_listing(args):
+    from .synthetic import create_users, create_plans
+    m, admin, _ = setup(args, stubs=False); rng = random.Random(48)
+    n_plans = 5000 if args.quick else 20000; user_ids = create_users(m, 10, PASSWORD, prefix="lister")
+    create_plans(m, rng, user_ids, n_plans)
+    client = login(m.app.test_client(), "lister0@example.com", PASSWORD); repeat = 30 if args.quick else 100
+    first = client.get('/api/my-plans'); cursor = first.json["next_cursor"]; pages = 1
+    while pages < 20 and cursor:
+        page = client.get('/api/my-plans', query_string={"cursor": cursor}).json; pages += 1
+        if page["next_cursor"]: cursor = page["next_cursor"]
+    return {"plans": n_plans, "plans_per_user": n_plans // len(user_ids), "deep_page": pages + 1,
+            **latency(timed_calls(lambda: client.get('/api/my-plans'), repeat), "first_page_"),
+            **latency(timed_calls(lambda: client.get('/api/my-plans', query_string={"cursor": cursor}), repeat), "deep_page_"),
+            **latency(timed_calls(lambda: client.get('/api/my-plans', headers={"If-None-Match": first.headers["ETag"]}), repeat), "revalidate_")}
+
+# --- Running and comparing ---
+def metadata(args):
+    try: commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError: commit = None
+    return {"suite": "ltp-offline", "format": 1, "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"), "git_commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(), "quick": args.quick,
+            "llm_latency_s": args.llm_latency, "tokens_per_second": args.tokens_per_second, "embed_latency_s": args.embed_latency}
+
+def run_isolated(name, args):
+    """Runs one scenario in a child process and returns its result dict (or {"error": ...})."""
+    out = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+    command = [sys.executable, "-m", "benchmarks.suite", "--run-scenario", name, "--scenario-output", out, "--llm-latency", str(args.llm_latency),
+               "--tokens-per-second", str(args.tokens_per_second), "--embed-latency", str(args.embed_latency)] + (["--quick"] if args.quick else [])
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True)
+    try:
+        with open(out) as f: result = json.load(f)
+    except (OSError, ValueError): result = {"error": (process.stderr or process.stdout)[-2000:]}
+    finally:
+        if os.path.exists(out): os.remove(out)
+    result["scenario_seconds"] = round(time.perf_counter() - start, 1); return result
+
+def direction(metric):
+    return -1 if metric.endswith("_ms") else 1 if metric.endswith("_per_s") else 0
+
+def compare(results, baseline, threshold):
+    """Prints every latency/throughput against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\n{'metric':<58} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get("results", {}).get(name, {}).get(metric); sign = direction(metric)
+            if not sign or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old: continue
+            change = (value - old) / old; worse = change * -sign > threshold
+            if worse: regressions.append((f"{name}/{metric}", old, value, change))
+            print(f"{name + '/' + metric:<58} {old:>11.3f} {value:>11.3f} {change:>+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--quick", action="store_true", help="smaller data sets and fewer repetitions")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="previous results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM base latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=2000, help="stub LLM completion speed")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="stub embedding latency per call in seconds")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS); parser.add_argument("--scenario-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        result = SCENARIOS[args.run_scenario](args)
+        with open(args.scenario_output, "w") as f: json.dump(result, f)
+        return
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown: parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    report = {**metadata(args), "results": {}}
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        report["results"][name] = result = run_isolated(name, args)
+        for metric, value in result.items(): print(f"  {metric}: {value}" if metric != "error" else f"  FAILED:\n{value}")
+    with open(args.output, "w") as f: json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f: regressions = compare(report["results"], json.load(f), args.threshold)
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+        if regressions and args.fail_on_regression: sys.exit(1)
+    if any("error" in result for result in report["results"].values()): sys.exit(2)
+
+if __name__ == "__main__":
+    main()
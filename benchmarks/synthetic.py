@@ -0,0 +1,69 @@
+"""
+Deterministic synthetic data for the benchmarks: curricula, resource texts, users, guides and saved plans.
+
+Everything is generated from a caller-supplied random.Random, so a seed reproduces the same data set.
+Text is drawn from a small Zipf-weighted vocabulary that looks like the guides the app stores.
+"""
+import sys
+import datetime
+from sqlalchemy import insert
+
+COMMON = ("the child children will play and to a of with in for each their as they can this is an on by "
+          "use using make making explore exploring share sharing take turns together group small large "
+          "teacher ask asks invite encourage notice describe count pour fill empty build sort match talk "
+          "feelings calm friends water sand blocks paint music story garden leaves shapes colours cups "
+          "observe support model wait listen respond praise extend question reflect circle space area").split()
+
+def sentence(rng, n):
+    words = rng.choices(COMMON, weights=[1 / (i + 1) ** 0.8 for i in range(len(COMMON))], k=n)
+    return " ".join(words).capitalize() + "."
+
+def paragraph(rng, sentences):
+    return " ".join(sentence(rng, rng.randint(10, 20)) for _ in range(sentences))
+
+def synthetic_guide(rng):
+    return {"guide_title": sentence(rng, 4)[:-1], "cognitive_outcomes": [sentence(rng, 12) for _ in range(3)],
+            "socio_emotional_outcomes": [sentence(rng, 12) for _ in range(3)], "activity_name": sentence(rng, 3)[:-1],
+            "activity_description": paragraph(rng, 6), "recommended_oak_content": [sentence(rng, 5) for _ in range(2)],
+            "setup_guidance": paragraph(rng, 6), "introduction_guidance": paragraph(rng, 5), "during_play_guidance": paragraph(rng, 8),
+            "conclusion_guidance": paragraph(rng, 5), "materials": [sentence(rng, 8) for _ in range(8)],
+            "assessment_rubric": "| Indicator | Emerging | Developing | Secure |\n|---|---|---|---|\n" + "\n".join(
+                "| " + " | ".join(sentence(rng, 8) for _ in range(4)) + " |" for _ in range(4))}
+
+def synthetic_doc(n_components, n_cohorts=8, n_domains=25, n_play_types=50):
+    cohorts = [f"cohort {i}" for i in range(n_cohorts)]; domains = [f"domain {j}" for j in range(n_domains)]
+    return {
+        "age_cohorts": cohorts, "domains": domains,
+        "components": [{"name": f"component {k}", "age_cohort": cohorts[k % n_cohorts], "domain": domains[(k // n_cohorts) % n_domains]} for k in range(n_components)],
+        "play_types": [{"name": f"play type {k}", "description": "...", "context": "Standard", "age_cohorts": cohorts, "domains": domains} for k in range(n_play_types)],
+    }
+
+def resource_text(rng, words=800):
+    """A plain-text resource of about `words` words, split into paragraphs like an article."""
+    parts = []; written = 0
+    while written < words:
+        n = rng.randint(4, 8); parts.append(paragraph(rng, n)); written += n * 15
+    return "\n\n".join(parts)
+
+def create_users(m, n, password, prefix="user"):
+    """Creates `n` teachers (emails <prefix><i>@example.com) and returns their ids. Hash the password once: call passwords.configure(workers=0) first."""
+    user = m.User(first_name="Bench", last_name="User", email="template@example.com", force_password_change=False); user.set_password(password)
+    with m.app.app_context():
+        m.db.session.execute(insert(m.User), [{"first_name": "Bench", "last_name": str(i), "email": f"{prefix}{i}@example.com", "password_hash": user.password_hash,
+                                               "role": "teacher", "force_password_change": False} for i in range(n)])
+        m.db.session.commit()
+        return [uid for (uid,) in m.db.session.query(m.User.id).filter(m.User.email.like(f"{prefix}%@example.com")).order_by(m.User.id)]
+
+def create_plans(m, rng, user_ids, n, distinct_guides=500, batch_size=5000):
+    """Saves `n` plans spread over `user_ids`, referencing `distinct_guides` structured guides in guide storage."""
+    guides = sys.modules["backend.guides"]; now = datetime.datetime(2026, 1, 1)
+    with m.app.app_context():
+        selections = {"age": "3-5 years", "domain": "Science", "sub_domain": "Water", "play_type": {"name": "Free Play", "context": "Standard"}}
+        docs = [synthetic_guide(rng) for _ in range(min(n, distinct_guides))]; blob_ids = guides.store_documents(docs); batch = []
+        guides.store_search_text(m.db.session, blob_ids)  # as POST /api/my-plans does before inserting a plan
+        for i in range(n):
+            batch.append({"title": sentence(rng, 4)[:-1], "content": "", "guide_id": blob_ids[i % len(blob_ids)], "selections": selections, "age_cohort": "3-5 years",
+                          "subject": "Science", "play_type": "Free Play", "user_id": user_ids[i % len(user_ids)], "created_at": now + datetime.timedelta(minutes=i)})
+            if len(batch) == batch_size: m.db.session.execute(insert(m.Plan), batch); batch = []
+        if batch: m.db.session.execute(insert(m.Plan), batch)
+        m.db.session.commit()
@@ -0,0 +1,52 @@
+import os
+import requests
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class ConditionalSession(requests.Session):
+    """
+    A requests.Session that keeps the ETag of every successful GET and revalidates with If-None-Match.
+    When the backend answers 304 Not Modified, the remembered body is replayed as a normal 200 response,
+    so callers keep using `response.status_code == 200` and `response.json()` unchanged.
+    The validator table is guarded by a lock, so one session can be shared by concurrent prefetch threads.
+    """
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        super().__init__()
+        self._validators = OrderedDict()  # url -> (etag, content, headers)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        if method.upper() != 'GET': return super().request(method, url, **kwargs)
+        key = requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+        with self._lock: cached = self._validators.get(key)
+        if cached:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'If-None-Match': cached[0]}
+        response = super().request(method, url, **kwargs)
+        if response.status_code == 304 and cached:
+            response.status_code = 200; response._content = cached[1]; response.headers.update(cached[2]); response.from_cache = True
+            with self._lock:
+                if key in self._validators: self._validators.move_to_end(key)
+        elif response.status_code == 200 and response.headers.get('ETag'):
+            entry = (response.headers['ETag'], response.content, {'Content-Type': response.headers.get('Content-Type', '')})
+            with self._lock:
+                self._validators[key] = entry; self._validators.move_to_end(key)
+                while len(self._validators) > self.MAX_ENTRIES: self._validators.popitem(last=False)
+        return response
+
+@contextmanager
+def spooled_download(response, chunk_size=64 * 1024):
+    """
+    `with spooled_download(response) as file:` copies a streamed response body to a temporary file chunk by chunk,
+    instead of joining it in memory, and yields the file opened for reading (a file st.download_button accepts).
+    The file is removed when the block exits.
+    """
+    spool = tempfile.NamedTemporaryFile(prefix="ltp-download-", delete=False)
+    try:
+        with spool:
+            for chunk in response.iter_content(chunk_size=chunk_size): spool.write(chunk)
+        with open(spool.name, "rb") as file: yield file
+    finally: os.unlink(spool.name)
@@ -1,7 +1,10 @@
 import streamlit as st
 import requests
+from api_client import ConditionalSession
 import datetime
 import random
+import json
+import hashlib
 
 # --- CONFIGURATION & STATIC DATA ---
 st.set_page_config(page_title="LTP Guide Bot", page_icon="🎓", layout="centered")
@@ -12,9 +15,10 @@ QUOTES = [
     ("Play is the highest form of research.", "Albert Einstein"),
     ("Children learn as they play. Most importantly, in play children learn how to learn.", "O. Fred Donaldson"),
 ]
+RENDER_CACHE_SIZE = 16  # rendered guides kept per session
 
 # --- SESSION STATE INITIALIZATION ---
-if 'api_session' not in st.session_state: st.session_state.api_session = requests.Session()
+if 'api_session' not in st.session_state: st.session_state.api_session = ConditionalSession()
 if 'logged_in' not in st.session_state: st.session_state.logged_in = False
 if 'user_info' not in st.session_state: st.session_state.user_info = None
 if 'chat_history' not in st.session_state: st.session_state.chat_history = []
@@ -23,7 +27,9 @@ if 'selections' not in st.session_state: st.session_state.selections = {}
 if 'generated_guide' not in st.session_state: st.session_state.generated_guide = None # Will store dict OR edited string
 if 'editing_mode' not in st.session_state: st.session_state.editing_mode = False
 if 'chatbot_options' not in st.session_state: st.session_state.chatbot_options = None
-if 'admin_data' not in st.session_state: st.session_state.admin_data = {}
+if 'wizard_index' not in st.session_state: st.session_state.wizard_index = None
+if 'rendered_markdown' not in st.session_state: st.session_state.rendered_markdown = {}
+if 'variants_remaining' not in st.session_state: st.session_state.variants_remaining = 0 # Other versions of the current plan waiting on the server
 
 # --- API HELPER FUNCTIONS ---
 def register_user(first_name, last_name, email, city, country):
@@ -49,16 +55,13 @@ def get_chatbot_options():
 def generate_plan(age_cohort, subject, sub_domain, play_type_obj):
     payload = {"age_cohort": age_cohort, "subject": subject, "sub_domain": sub_domain, "play_type": play_type_obj}
     return st.session_state.api_session.post(f"{BACKEND_URL}/api/generate-plan", json=payload)
-def save_plan(title, content, age_cohort, subject, play_type_name):
-    payload = {"title": title, "content": content, "age_cohort": age_cohort, "subject": subject, "play_type": play_type_name}
+def next_plan_variant():
+    return st.session_state.api_session.post(f"{BACKEND_URL}/api/generate-plan/next-variant")
+def save_plan(title, content, age_cohort, subject, play_type_name, guide=None, selections=None):
+    # An unedited plan is saved as the structured guide (the server renders it); an edited one as its markdown.
+    payload = {"title": title, "age_cohort": age_cohort, "subject": subject, "play_type": play_type_name}
+    payload.update({"guide": guide, "selections": selections} if guide is not None else {"content": content})
     return st.session_state.api_session.post(f"{BACKEND_URL}/api/my-plans", json=payload)
-def get_admin_data(endpoint):
-    if endpoint not in st.session_state.admin_data:
-        try:
-            response = st.session_state.api_session.get(f"{BACKEND_URL}/api/admin/{endpoint}")
-            st.session_state.admin_data[endpoint] = response.json() if response.status_code == 200 else []
-        except: st.session_state.admin_data[endpoint] = []
-    return st.session_state.admin_data[endpoint]
 def handle_api_error(response, context="An unknown error occurred."):
     st.error(f"{context}: Server returned status {response.status_code}")
 def submit_feedback(rating, selections, generated_guide):
@@ -72,13 +75,33 @@ def submit_feedback(rating, selections, generated_guide):
 
 # --- BOT & RENDER HELPER FUNCTIONS ---
 def add_bot_message(message, options=None, is_final_plan=False):
-    st.session_state.chat_history.append({"role": "assistant", "content": message, "options": options, "is_final_plan": is_final_plan})
+    entry = {"role": "assistant", "content": message, "options": options, "is_final_plan": is_final_plan}
+    if is_final_plan: entry["digest"] = guide_digest(message, st.session_state.selections)  # hashed once; keys the rendered markdown on every rerun
+    st.session_state.chat_history.append(entry)
 def add_user_message(message):
     st.session_state.chat_history.append({"role": "user", "content": message})
 def reset_conversation():
     st.session_state.stage = 'start'; st.session_state.selections = {}; st.session_state.chat_history = []
-    st.session_state.generated_guide = None; st.session_state.editing_mode = False
+    st.session_state.generated_guide = None; st.session_state.editing_mode = False; st.session_state.variants_remaining = 0
     st.rerun()
+def build_wizard_index(options):
+    """Name -> id maps and per-context play type lookups, built once when the chatbot options load."""
+    return {"age_cohorts": options.get("age_cohort_ids", {}), "domains": options.get("domain_ids", {}),
+            "play_types": {key: {pt['name']: pt for pt in pts} for key, pts in options.get("play_types", {}).items()}}
+def play_types_for(selections):
+    """{name: play type} for the selected age cohort and domain, or None if either is unknown."""
+    idx = st.session_state.wizard_index; ac_id = idx["age_cohorts"].get(selections.get('age')); d_id = idx["domains"].get(selections.get('domain'))
+    if ac_id is None or d_id is None: return None
+    return idx["play_types"].get(f"{ac_id}-{d_id}", {})
+def guide_digest(guide_data, selections):
+    return hashlib.sha1(json.dumps([guide_data, selections], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+def memoized_markdown(key, render, *args):
+    """render(*args), computed once per key (kind, guide digest) and reused by later reruns of this session."""
+    cache = st.session_state.rendered_markdown
+    if key not in cache:
+        while len(cache) >= RENDER_CACHE_SIZE: cache.pop(next(iter(cache)))
+        cache[key] = render(*args)
+    return cache[key]
 def convert_guide_to_markdown(guide_data, selections):
     if not isinstance(guide_data, dict): return "Error: Guide data is not in the correct format."
     s = selections
@@ -94,21 +117,60 @@ def convert_guide_to_markdown(guide_data, selections):
     parts.extend([f"- {item}" for item in guide_data.get('materials', [])])
     parts.extend(["\n---", "### Assessment Matrix and Rubric", guide_data.get('assessment_rubric', 'No rubric generated.')])
     return "\n\n".join(parts)
-def render_structured_guide(guide_data):
+def render_structured_guide(guide_data, digest):
     if not isinstance(guide_data, dict):
         st.error("Could not render guide. The data is not in the expected format."); return
-    st.markdown(f"### {guide_data.get('guide_title', 'Untitled Plan')}"); st.markdown("---")
-    st.subheader("Learning Outcomes"); st.markdown("**Cognitive:**")
-    for item in guide_data.get('cognitive_outcomes', []): st.markdown(f"- {item}")
-    st.markdown("**Socio-Emotional:**");
-    for item in guide_data.get('socio_emotional_outcomes', []): st.markdown(f"- {item}")
-    st.markdown("---"); st.subheader("Activities"); st.markdown(f"**{guide_data.get('activity_name', 'N/A')}**"); st.write(guide_data.get('activity_description', '')); st.markdown("---")
-    st.subheader("Step-by-Step Facilitation Guidance")
-    st.markdown(f"**Setup:** {guide_data.get('setup_guidance', '')}"); st.markdown(f"**Introduction:** {guide_data.get('introduction_guidance', '')}")
-    st.markdown(f"**During Play (Facilitation):** {guide_data.get('during_play_guidance', '')}"); st.markdown(f"**Conclusion/Reflection:** {guide_data.get('conclusion_guidance', '')}")
-    st.markdown("---"); st.subheader("Materials");
-    for item in guide_data.get('materials', []): st.markdown(f"- {item}")
-    st.markdown("---"); st.subheader("Assessment Matrix and Rubric"); st.markdown(guide_data.get('assessment_rubric', 'No rubric was generated.'))
+    st.markdown(memoized_markdown(("markdown", digest), convert_guide_to_markdown, guide_data, st.session_state.selections))
+
+def show_next_variant():
+    """Swaps the plan on screen for the next pre-generated version; the server records the one replaced as 'Not Helpful'."""
+    try: response = next_plan_variant()
+    except requests.exceptions.ConnectionError: st.toast("Failed to connect to the server.", icon="🔥"); return
+    plan_json = response.json(); st.session_state.variants_remaining = plan_json.pop("variants", {}).get("remaining", 0)
+    if response.status_code != 200: st.toast(plan_json.get("error", "No other version is available."), icon="⚠️"); return
+    st.session_state.generated_guide = plan_json; st.session_state.editing_mode = False
+    entry = next(msg for msg in reversed(st.session_state.chat_history) if msg.get("is_final_plan"))
+    entry.update(content=plan_json, digest=guide_digest(plan_json, st.session_state.selections))
+    st.rerun()
+def start_editing(guide_markdown):
+    st.session_state.generated_guide = guide_markdown; st.session_state.editing_mode = True
+def finish_editing(save):
+    if save: st.session_state.generated_guide = st.session_state.plan_editor; st.toast("Changes saved!", icon="✅")
+    st.session_state.editing_mode = False
+
+@st.fragment
+def final_plan_view(guide_dict, digest):
+    """
+    The generated plan with its edit, save, export and feedback controls. Interactions inside reruns only this
+    fragment, not the whole chat; starting a new plan or leaving the page reruns the app.
+    """
+    render_structured_guide(guide_dict, digest)
+    guide_markdown = memoized_markdown(("markdown", digest), convert_guide_to_markdown, guide_dict, st.session_state.selections)  # the same text as displayed
+    st.markdown("---")
+    if st.session_state.editing_mode:
+        st.text_area("Editing mode:", value=guide_markdown, height=500, key="plan_editor")
+        c1, c2, _ = st.columns([1, 1, 5])
+        c1.button("✅ Save Changes", type="primary", on_click=finish_editing, args=(True,)); c2.button("❌ Cancel", on_click=finish_editing, args=(False,))
+    else: st.button("✏️ Edit this plan", on_click=start_editing, args=(guide_markdown,))
+    st.markdown("---"); st.subheader("Actions")
+    plan_title = st.text_input("Title to save plan:", value=f"{guide_dict.get('guide_title', 'Plan')}")
+    action_cols = st.columns(3)
+    content_to_save_or_export = st.session_state.generated_guide if isinstance(st.session_state.generated_guide, str) else guide_markdown
+    if action_cols[0].button("💾 Save to My Plans", use_container_width=True, type="primary"):
+        with st.spinner("Saving..."):
+            s = st.session_state.selections; play_type_name = s.get('play_type', {}).get('name', 'N/A')
+            edited = isinstance(st.session_state.generated_guide, str)
+            response = save_plan(plan_title, content_to_save_or_export, s['age'], s['domain'], play_type_name, guide=None if edited else guide_dict, selections=s)
+            if response.status_code == 201: st.success(f"Plan '{plan_title}' saved!")
+            else: handle_api_error(response, "Failed to save plan")
+    action_cols[1].download_button(label="📄 Export as Markdown", data=content_to_save_or_export, file_name=f"{plan_title.replace(' ', '_')}.md", mime="text/markdown", use_container_width=True, on_click="ignore")
+    if action_cols[2].button("📚 Go to My Saved Plans", use_container_width=True): st.switch_page("pages/2_My_Saved_Plans.py")
+    st.markdown("---")
+    feedback_cols = st.columns(2)
+    if feedback_cols[0].button("👍 Helpful", use_container_width=True): submit_feedback(1, st.session_state.selections, guide_dict)
+    if feedback_cols[1].button("👎 Not Helpful", use_container_width=True): submit_feedback(-1, st.session_state.selections, guide_dict)
+    if st.session_state.variants_remaining and st.button(f"🔄 Try Another Version ({st.session_state.variants_remaining} ready)", use_container_width=True): show_next_variant()
+    if st.button("✨ Start New Plan", use_container_width=True, type="secondary"): reset_conversation()
 
 # ==============================================================================
 # ===                      VIEW 1: LOGIN & REGISTRATION                      ===
@@ -174,6 +236,7 @@ else:
         if st.session_state.chatbot_options is None:
             with st.spinner("Loading curriculum structure..."):
                 st.session_state.chatbot_options = get_chatbot_options()
+                if st.session_state.chatbot_options: st.session_state.wizard_index = build_wizard_index(st.session_state.chatbot_options)
         if not st.session_state.chatbot_options:
             st.error("Fatal Error: Could not load curriculum structure. Please contact an administrator."); st.stop()
         
@@ -187,7 +250,7 @@ else:
 
         for i, msg in enumerate(st.session_state.chat_history):
             with st.chat_message(msg["role"]):
-                if msg.get("is_final_plan"): render_structured_guide(msg["content"])
+                if msg.get("is_final_plan"): final_plan_view(msg["content"], msg["digest"])
                 else: st.markdown(msg["content"] or "")
                 
                 if msg.get("options"):
@@ -205,50 +268,18 @@ else:
                                 st.session_state.selections['domain'] = option; age = st.session_state.selections['age']; components = st.session_state.chatbot_options["age_cohorts"][age][option]; add_bot_message("Excellent. Which specific component to focus on?", options=components); st.session_state.stage = 'awaiting_sub_domain'
                             elif st.session_state.stage == 'awaiting_sub_domain':
                                 st.session_state.selections['sub_domain'] = option; s = st.session_state.selections
-                                ac_obj = next((ac for ac in get_admin_data("age-cohorts") if ac['name'] == s['age']), None)
-                                d_obj = next((d for d in get_admin_data("domains") if d['name'] == s['domain']), None)
-                                if ac_obj and d_obj:
-                                    key = f"{ac_obj['id']}-{d_obj['id']}"; valid_play_types = st.session_state.chatbot_options["play_types"].get(key, []); play_type_names = [pt['name'] for pt in valid_play_types]
+                                valid_play_types = play_types_for(s)
+                                if valid_play_types is not None:
+                                    play_type_names = list(valid_play_types)
                                     if play_type_names: add_bot_message("Almost there! Select an available play type.", options=play_type_names); st.session_state.stage = 'awaiting_play_type'
                                     else: add_bot_message("Sorry, no play types are configured for this context. Please contact an admin."); st.session_state.stage = 'error'
                                 else: add_bot_message("Error finding play types."); st.session_state.stage = 'error'
                             elif st.session_state.stage == 'awaiting_play_type':
                                 s = st.session_state.selections
-                                ac_obj = next((ac for ac in get_admin_data("age-cohorts") if ac['name'] == s['age']), None)
-                                d_obj = next((d for d in get_admin_data("domains") if d['name'] == s['domain']), None)
-                                key = f"{ac_obj['id']}-{d_obj['id']}"; valid_play_types = st.session_state.chatbot_options["play_types"].get(key, [])
-                                selected_play_type_obj = next((pt for pt in valid_play_types if pt['name'] == option), None)
+                                selected_play_type_obj = (play_types_for(s) or {}).get(option)
                                 st.session_state.selections['play_type'] = selected_play_type_obj; add_bot_message("Thank you! Generating your customized plan now..."); st.session_state.stage = 'generating_plan'
                             st.rerun()
 
-                if msg.get("is_final_plan"):
-                    guide_dict = msg["content"]; guide_markdown = convert_guide_to_markdown(guide_dict, st.session_state.selections)
-                    st.markdown("---")
-                    if st.session_state.editing_mode:
-                        edited_guide = st.text_area("Editing mode:", value=guide_markdown, height=500)
-                        c1, c2, _ = st.columns([1, 1, 5])
-                        if c1.button("✅ Save Changes", type="primary"): st.session_state.generated_guide = edited_guide; st.session_state.editing_mode = False; st.success("Changes saved!"); st.rerun()
-                        if c2.button("❌ Cancel"): st.session_state.editing_mode = False; st.rerun()
-                    else:
-                        if st.button("✏️ Edit this plan"): st.session_state.generated_guide = guide_markdown; st.session_state.editing_mode = True; st.rerun()
-                    st.markdown("---"); st.subheader("Actions")
-                    plan_title = st.text_input("Title to save plan:", value=f"{guide_dict.get('guide_title', 'Plan')}")
-                    action_cols = st.columns(3)
-                    content_to_save_or_export = st.session_state.generated_guide if isinstance(st.session_state.generated_guide, str) else guide_markdown
-                    if action_cols[0].button("💾 Save to My Plans", use_container_width=True, type="primary"):
-                        with st.spinner("Saving..."):
-                            s = st.session_state.selections; play_type_name = s.get('play_type', {}).get('name', 'N/A')
-                            response = save_plan(plan_title, content_to_save_or_export, s['age'], s['domain'], play_type_name)
-                            if response.status_code == 201: st.success(f"Plan '{plan_title}' saved!"); st.cache_data.clear()
-                            else: handle_api_error(response, "Failed to save plan")
-                    action_cols[1].download_button(label="📄 Export as Markdown", data=content_to_save_or_export, file_name=f"{plan_title.replace(' ', '_')}.md", mime="text/markdown", use_container_width=True)
-                    if action_cols[2].button("📚 Go to My Saved Plans", use_container_width=True): st.switch_page("pages/2_My_Saved_Plans.py")
-                    st.markdown("---")
-                    feedback_cols = st.columns(2)
-                    if feedback_cols[0].button("👍 Helpful", use_container_width=True): submit_feedback(1, st.session_state.selections, guide_dict)
-                    if feedback_cols[1].button("👎 Not Helpful", use_container_width=True): submit_feedback(-1, st.session_state.selections, guide_dict)
-                    if st.button("✨ Start New Plan", use_container_width=True, type="secondary"): reset_conversation()
-
         if st.session_state.stage == 'generating_plan':
             with st.chat_message("assistant"):
                 with st.spinner("🧠 Crafting your activity plan..."):
@@ -258,7 +289,14 @@ else:
                         if response.status_code == 200:
                             plan_json = response.json()
                             if "error" in plan_json: add_bot_message(f"Sorry, an error occurred: {plan_json['error']}")
-                            else: st.session_state.generated_guide = plan_json; add_bot_message(plan_json, is_final_plan=True)
+                            else:
+                                degraded = plan_json.pop("degraded", None); st.session_state.variants_remaining = plan_json.pop("variants", {}).get("remaining", 0)
+                                if degraded: add_bot_message("⚠️ The plan generator is unavailable right now, so here is the best-rated plan previously created for these same selections. You can generate a fresh one again in a minute.")
+                                st.session_state.generated_guide = plan_json; add_bot_message(plan_json, is_final_plan=True)
+                        elif response.status_code == 503:
+                            add_bot_message(f"{response.json().get('error', 'The plan generator is temporarily unavailable.')}")
+                        elif response.status_code == 429:
+                            add_bot_message(f"{response.json().get('error', 'Too many requests.')} You can try again in {response.headers.get('Retry-After', 'a few')} seconds.")
                         else: add_bot_message(f"Sorry, the server returned an error (Status: {response.status_code}). Please try again.")
                     except requests.exceptions.ConnectionError:
                         add_bot_message("Sorry, I couldn't connect to the backend server.")
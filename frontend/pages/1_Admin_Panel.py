@@ -1,14 +1,21 @@
 import streamlit as st
-import requests
+from api_client import ConditionalSession, spooled_download
 import pandas as pd
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURATION & SETUP ---
 st.set_page_config(page_title="Admin Panel", layout="wide")
 BACKEND_URL = "http://127.0.0.1:5001"
+ADMIN_CACHE_SECONDS = 30  # the bootstrap copy is revalidated (If-None-Match) once it is older than this
+EMPTY_ADMIN_DATA = {"users": [], "age_cohorts": [], "domains": [], "play_types": [], "components": [], "resources": []}
 if 'api_session' not in st.session_state:
-    st.session_state.api_session = requests.Session()
+    st.session_state.api_session = ConditionalSession()
 if 'selected_play_type_id' not in st.session_state:
     st.session_state.selected_play_type_id = None
+if 'admin_cache' not in st.session_state:
+    st.session_state.admin_cache = None
 
 def logout_user():
     st.session_state.api_session.post(f"{BACKEND_URL}/api/logout")
@@ -31,35 +38,121 @@ with col2:
 st.markdown("---")
 
 # --- API Functions for Admin Data ---
-@st.cache_data(ttl=30)
-def get_admin_data(endpoint):
+# Every collection the panel shows comes from one GET /api/admin/bootstrap, kept in session state. Mutations
+# patch that copy from the entity the server returns instead of refetching everything. The activity feed has
+# its own endpoint and ETag and is revalidated on every run, so new events never force a bootstrap download.
+def fetch_json(session, path, default=None):
     try:
-        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/admin/{endpoint}")
-        return response.json() if response.status_code == 200 else []
-    except: return []
+        response = session.get(f"{BACKEND_URL}/api/admin/{path}")
+        return response.json() if response.status_code == 200 else default
+    except Exception: return default
+def prefetch(reads):
+    """GETs {name: (path, default)} concurrently, so the page waits for the slowest response rather than the sum of them."""
+    session = st.session_state.api_session  # read here: the worker threads have no Streamlit script context
+    with ThreadPoolExecutor(max_workers=len(reads)) as pool:
+        futures = {name: pool.submit(fetch_json, session, path, default) for name, (path, default) in reads.items()}
+    return {name: future.result() for name, future in futures.items()}
+def get_admin_data(endpoint):
+    return fetch_json(st.session_state.api_session, endpoint)
+def patch_admin_cache(collection, items=(), deleted=None):
+    """Applies a mutation response (changed entities, or a DELETE body) to the cached collections."""
+    cache = st.session_state.admin_cache
+    if cache is None: return
+    rows = {row['id']: row for row in cache[collection]}
+    for item in items: rows[item['id']] = item
+    if deleted: rows.pop(deleted['deleted']['id'], None)
+    cache[collection] = sorted(rows.values(), key=lambda row: row['id'])
+    if collection in ("age_cohorts", "domains"):
+        # Components carry the names, play types and resources the ids, of the cohorts and domains they belong to.
+        field = collection[:-1]; names = {row['id']: row['name'] for row in cache[collection]}
+        gone = set(deleted.get("deleted_component_ids", [])) if deleted else set()
+        cache["components"] = [{**c, f"{field}_name": names.get(c[f"{field}_id"], c[f"{field}_name"])} for c in cache["components"] if c['id'] not in gone]
+        for row in cache["play_types"] + cache["resources"]: row[f"{field}_ids"] = [i for i in row[f"{field}_ids"] if i in names]
 def add_entry(endpoint, payload):
     res = st.session_state.api_session.post(f"{BACKEND_URL}/api/admin/{endpoint}", json=payload)
-    if res.status_code == 201: st.toast("Added!", icon="🎉"); st.cache_data.clear(); st.rerun()
+    if res.status_code == 201: patch_admin_cache(endpoint.replace('-', '_'), [res.json()]); st.toast("Added!", icon="🎉"); st.rerun()
+    else: st.error(f"Add failed: {res.text}")
+def add_entries(endpoint, items):
+    """Creates several entries in one request and one transaction; nothing is saved if any item is invalid."""
+    res = st.session_state.api_session.post(f"{BACKEND_URL}/api/admin/{endpoint}:batch", json=items)
+    if res.status_code == 201: patch_admin_cache(endpoint.replace('-', '_'), res.json()['items']); st.toast(f"Added {len(res.json()['ids'])}!", icon="🎉"); st.rerun()
+    elif res.status_code == 400 and res.json().get("errors"):
+        st.error("Add failed: " + "; ".join(f"item {e['index'] + 1}: {e['message']}" for e in res.json()["errors"]))
     else: st.error(f"Add failed: {res.text}")
 def update_entry(endpoint, entry_id, payload):
     res = st.session_state.api_session.put(f"{BACKEND_URL}/api/admin/{endpoint}/{entry_id}", json=payload)
-    if res.status_code == 200: st.toast("Updated!", icon="✅"); st.cache_data.clear(); st.rerun()
+    if res.status_code == 200: patch_admin_cache(endpoint.replace('-', '_'), [res.json()]); st.toast("Updated!", icon="✅"); st.rerun()
     else: st.error(f"Update failed: {res.text}")
 def delete_entry(endpoint, entry_id):
     res = st.session_state.api_session.delete(f"{BACKEND_URL}/api/admin/{endpoint}/{entry_id}")
-    if res.status_code == 200: st.toast("Deleted!", icon="🗑️"); st.cache_data.clear(); st.rerun()
+    if res.status_code == 200: patch_admin_cache(endpoint.replace('-', '_'), deleted=res.json()); st.toast("Deleted!", icon="🗑️"); st.rerun()
     else: st.error(f"Delete failed: {res.text}")
 
+# --- First paint: the bootstrap and the live widgets (generator status, analytics, activity) in one parallel round trip ---
+days = st.session_state.get("analytics_days", 30); group_by = st.session_state.get("analytics_group_by", ["domain", "play_type"])
+end = datetime.date.today(); start = end - datetime.timedelta(days=days - 1)
+period = f"from={start.isoformat()}&to={end.isoformat()}"
+reads = {"status": ("generation-status", None), "daily": (f"analytics/daily?{period}", {}), "activity": ("activity-logs", {})}
+if group_by: reads["usage"] = (f"analytics/usage?{period}&group_by={','.join(group_by)}", {})
+if st.session_state.admin_cache is None or time.monotonic() - st.session_state.admin_cache["loaded_at"] > ADMIN_CACHE_SECONDS: reads["bootstrap"] = ("bootstrap", None)
+fetched = prefetch(reads)
+if fetched.get("bootstrap"): st.session_state.admin_cache = {**fetched["bootstrap"], "loaded_at": time.monotonic()}
+data = st.session_state.admin_cache or EMPTY_ADMIN_DATA
+
 # --- TABS ---
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["👥 User List", "📊 User Activity", "⚙️ Settings", "🧩 Curriculum Builder", "🧠 Knowledge Base"])
 
 with tab1:
     st.header("User Management")
-    st.dataframe(pd.DataFrame(get_admin_data("users")), use_container_width=True, hide_index=True)
+    st.dataframe(pd.DataFrame(data["users"]), use_container_width=True, hide_index=True)
+    with st.expander("⬇️ Export all saved plans"):
+        st.caption("A ZIP with one folder of Markdown files per teacher, or one JSON Lines file.")
+        export_format = st.radio("Format", ["zip", "jsonl"], horizontal=True, key="admin_export_format")
+        if st.button("Prepare export", key="admin_export"):
+            with st.session_state.api_session.get(f"{BACKEND_URL}/api/admin/plans/export", params={"format": export_format}, stream=True) as res:
+                if res.status_code == 200:
+                    with spooled_download(res) as file:
+                        st.download_button("Download", data=file, file_name=f"all-plans.{export_format}", mime="application/zip" if export_format == "zip" else "application/x-ndjson")
+                else: st.error(f"Export failed: {res.text}")
 
 with tab2:
     st.header("User Activity Monitor")
-    st.dataframe(pd.DataFrame(get_admin_data("activity-logs")), use_container_width=True, hide_index=True)
+    status = fetched["status"]
+    if status:
+        circuit = status["circuit"]; s1, s2, s3 = st.columns(3)
+        s1.metric("Plan generator", {"closed": "🟢 Available", "half_open": "🟡 Recovering", "open": "🔴 Unavailable"}[circuit["state"]])
+        s2.metric("Generations in progress", f"{status['admission']['in_flight']} / {status['admission']['max_concurrency']}"); s3.metric("Waiting", status["admission"]["queued"])
+        if circuit["state"] != "closed": st.warning(f"Since {circuit['since']}: {circuit['last_error']}. Teachers are served stored plans where available; the next probe is in {circuit['probe_in_seconds']:.0f} s.")
+    # Dashboards are served from pre-aggregated daily rollups, so they cost the same however long the logs get.
+    range_col, group_col = st.columns([1, 2])
+    with range_col:
+        st.selectbox("Period", [7, 30, 90, 365], index=1, format_func=lambda d: f"Last {d} days", key="analytics_days")
+    with group_col:
+        st.multiselect("Break usage down by", ["age_cohort", "domain", "component", "play_type"], default=["domain", "play_type"], key="analytics_group_by")
+    daily = pd.DataFrame((fetched["daily"] or {}).get("days", []))
+    if not daily.empty:
+        daily["day"] = pd.to_datetime(daily["day"]); daily = daily.set_index("day")
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Plans generated", int(daily["generations"].sum())); m2.metric("👍 ratings", int(daily["positive_ratings"].sum()))
+        m3.metric("👎 ratings", int(daily["negative_ratings"].sum())); m4.metric("Peak daily active users", int(daily["active_users"].max()))
+        st.subheader("Daily active users and generations")
+        st.line_chart(daily[["active_users", "generations"]])
+    if group_by:
+        usage = pd.DataFrame((fetched["usage"] or {}).get("rows", []))
+        st.subheader("Generations and ratings")
+        if usage.empty: st.info("No generations or ratings in this period.")
+        else: st.dataframe(usage, use_container_width=True, hide_index=True)
+    st.subheader("Recent activity")
+    # Fetched a page at a time (newest first); older pages are only requested when asked for.
+    if 'activity_pages' not in st.session_state: st.session_state.activity_pages = 1
+    events = list(fetched["activity"].get("events", [])); cursor = fetched["activity"].get("next_cursor")
+    for _ in range(1, st.session_state.activity_pages):
+        if not cursor: break
+        page = get_admin_data(f"activity-logs?cursor={cursor}") or {}
+        events.extend(page.get("events", [])); cursor = page.get("next_cursor")
+    if events:
+        st.dataframe(pd.DataFrame(events)[["timestamp", "user_email", "action", "action_code"]], use_container_width=True, hide_index=True)
+    if cursor and st.button("Load older activity"): st.session_state.activity_pages += 1; st.rerun()
 
 with tab3:
     st.header("Manage Application Settings")
@@ -69,8 +162,8 @@ with tab4:
     st.header("Build and Manage Curriculum Structure")
     st.info("This is a top-down curriculum builder. Define the foundational elements first, then link them together.")
 
-    age_cohorts = get_admin_data("age-cohorts"); domains = get_admin_data("domains")
-    play_types = get_admin_data("play-types"); components = get_admin_data("components")
+    age_cohorts = data["age_cohorts"]; domains = data["domains"]
+    play_types = data["play_types"]; components = data["components"]
     age_cohort_map = {ac['id']: ac['name'] for ac in age_cohorts}
     domain_map = {d['id']: d['name'] for d in domains}
 
@@ -83,16 +176,18 @@ with tab4:
                 c1, c2 = st.columns([4,1]); c1.write(ac['name'])
                 if c2.button("🗑️", key=f"del_ac_{ac['id']}", help=f"Delete {ac['name']}"): delete_entry("age-cohorts", ac['id'])
             with st.form("add_ac_form", clear_on_submit=True):
-                new_ac_name = st.text_input("New Age Cohort Name"); submitted = st.form_submit_button("Add")
-                if submitted and new_ac_name: add_entry("age-cohorts", {"name": new_ac_name})
+                new_ac_names = st.text_area("New Age Cohort Name(s) (one per line)", height=68); submitted = st.form_submit_button("Add")
+                names = [n.strip() for n in new_ac_names.split('\n') if n.strip()]
+                if submitted and names: add_entries("age-cohorts", [{"name": n} for n in names])
         with col2:
             st.markdown("**Manage Domains**"); 
             for d in domains:
                 c1, c2 = st.columns([4,1]); c1.write(d['name'])
                 if c2.button("🗑️", key=f"del_d_{d['id']}", help=f"Delete {d['name']}"): delete_entry("domains", d['id'])
             with st.form("add_d_form", clear_on_submit=True):
-                new_d_name = st.text_input("New Domain Name"); submitted = st.form_submit_button("Add")
-                if submitted and new_d_name: add_entry("domains", {"name": new_d_name})
+                new_d_names = st.text_area("New Domain Name(s) (one per line)", height=68); submitted = st.form_submit_button("Add")
+                names = [n.strip() for n in new_d_names.split('\n') if n.strip()]
+                if submitted and names: add_entries("domains", [{"name": n} for n in names])
 
     st.subheader("2. Component Matrix")
     with st.container(border=True):
@@ -112,10 +207,8 @@ with tab4:
             if st.form_submit_button("Add Components") and new_comp_names and selected_d_name and selected_ac_names:
                 domain_id = next(k for k, v in domain_map.items() if v == selected_d_name)
                 age_cohort_ids = [k for k, v in age_cohort_map.items() if v in selected_ac_names]
-                for name in new_comp_names.strip().split('\n'):
-                    if name:
-                        for ac_id in age_cohort_ids:
-                            add_entry("components", {"name": name, "age_cohort_id": ac_id, "domain_id": domain_id})
+                names = [n.strip() for n in new_comp_names.split('\n') if n.strip()]
+                add_entries("components", [{"name": name, "age_cohort_id": ac_id, "domain_id": domain_id} for name in names for ac_id in age_cohort_ids])
 
     st.subheader("3. Play Type Studio")
     with st.container(border=True):
@@ -150,11 +243,36 @@ with tab4:
                     if not is_new and c2.form_submit_button("🗑️ Delete This Play Type", use_container_width=True):
                         delete_entry("play-types", selected_pt['id'])
 
+    st.subheader("4. Import / Export")
+    with st.container(border=True):
+        st.markdown("**Export the whole curriculum** (age cohorts, domains, components and play types with their links).")
+        c1, c2 = st.columns(2)
+        curriculum_format = c1.radio("Format", ["json", "csv"], horizontal=True, key="curriculum_export_format")
+        if c2.button("Prepare export", key="curriculum_export", use_container_width=True):
+            res = st.session_state.api_session.get(f"{BACKEND_URL}/api/admin/curriculum/export", params={"format": curriculum_format})
+            if res.status_code == 200: c2.download_button("⬇️ Download", data=res.content, file_name=f"curriculum.{curriculum_format}", mime="application/json" if curriculum_format == "json" else "text/csv", use_container_width=True)
+            else: st.error(f"Export failed: {res.text}")
+
+        st.markdown("---"); st.markdown("**Import a curriculum file.** Existing entries are kept; new ones are added and play types are updated by name.")
+        curriculum_file = st.file_uploader("Curriculum file (JSON or CSV)", type=["json", "csv"])
+        if curriculum_file:
+            c1, c2 = st.columns(2)
+            preview, apply = c1.button("🔍 Preview changes", use_container_width=True), c2.button("📥 Import", type="primary", use_container_width=True)
+            if preview or apply:
+                res = st.session_state.api_session.post(f"{BACKEND_URL}/api/admin/curriculum/import", params={"dry_run": "0" if apply else "1"},
+                    files={"file": (curriculum_file.name, curriculum_file.getvalue())})
+                if res.status_code == 200:
+                    diff = res.json()["diff"]
+                    st.table({section: {"added": len(d["added"]), "updated": len(d.get("updated", [])), "unchanged": d["unchanged"]} for section, d in diff.items()})
+                    if apply: st.success("Curriculum imported."); st.session_state.admin_cache = None  # many rows changed: reload the bootstrap on the next run
+                elif res.status_code == 400 and res.json().get("errors"): st.error("Import failed:\n- " + "\n- ".join(res.json()["errors"][:20]))
+                else: st.error(f"Import failed: {res.text}")
+
 with tab5:
     st.header("Manage Resource Library (for RAG)")
     st.info("Upload documents, links, and text. The content will be indexed and used by the AI to generate context-aware plans.")
     
-    resources = get_admin_data("resources"); st.subheader("Current Resources")
+    resources = data["resources"]; st.subheader("Current Resources")
     st.dataframe(pd.DataFrame(resources), use_container_width=True, hide_index=True)
 
     st.subheader("Add New Resource")
@@ -166,8 +284,8 @@ with tab5:
         elif resource_type == "Web Link": content_input = st.text_input("Enter URL*")
         elif resource_type == "PDF": content_input = st.file_uploader("Upload PDF File*", type="pdf")
         
-        domain_map = {d['name']: d['id'] for d in get_admin_data("domains")}
-        age_cohort_map = {ac['name']: ac['id'] for ac in get_admin_data("age-cohorts")}
+        domain_map = {d['name']: d['id'] for d in data["domains"]}
+        age_cohort_map = {ac['name']: ac['id'] for ac in data["age_cohorts"]}
         selected_domains = st.multiselect("Tag with Domains", options=domain_map.keys())
         selected_age_cohorts = st.multiselect("Tag with Age Cohorts", options=age_cohort_map.keys())
 
@@ -187,8 +305,10 @@ with tab5:
                     else:
                         form_data['content_path'] = content_input
                     
-                    response = st.session_state.api_session.post(f"{BACKEND_URL}/api/admin/resources", data=form__data, files=files)
+                    response = st.session_state.api_session.post(f"{BACKEND_URL}/api/admin/resources", data=form_data, files=files)
                     if response.status_code == 201:
-                        st.success(f"Resource '{title}' processed successfully!"); st.cache_data.clear(); st.rerun()
+                        patch_admin_cache("resources", [response.json()]); st.success(f"Resource '{title}' processed successfully!"); st.rerun()
+                    elif response.status_code == 200 and response.json().get("duplicate"):
+                        st.info(f"This file is already in the library as '{response.json().get('title')}'. Its existing index was reused.")
                     else:
                         st.error(f"Upload failed: {response.text}")
\ No newline at end of file
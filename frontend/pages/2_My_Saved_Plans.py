@@ -1,5 +1,7 @@
 import streamlit as st
 import requests
+from api_client import ConditionalSession, spooled_download
+from contextlib import contextmanager
 from datetime import datetime
 
 # --- CONFIGURATION ---
@@ -9,7 +11,7 @@ BACKEND_URL = "http://127.0.0.1:5001"
 # --- SESSION STATE & API SESSION ---
 # Ensure the authenticated session object is available.
 if 'api_session' not in st.session_state:
-    st.session_state.api_session = requests.Session()
+    st.session_state.api_session = ConditionalSession()
 
 def logout_user():
     st.session_state.api_session.post(f"{BACKEND_URL}/api/logout")
@@ -39,60 +41,158 @@ with col3:
         logout_user()
 st.markdown("---")
 
-# --- Function to fetch plans from the backend (CORRECTED) ---
-@st.cache_data(ttl=60) # Cache the results for 60 seconds
-def fetch_plans():
-    """
-    Makes a GET request to the /api/my-plans endpoint.
-    It no longer needs a user_id argument. The backend identifies the user
-    from the session cookie sent automatically by st.session_state.api_session.
-    """
+# --- Functions to fetch plans from the backend ---
+# The listing endpoint returns pages of metadata only; a plan's content is fetched when it is opened.
+# Both calls go through the ConditionalSession, so unchanged pages and plans are revalidated with a 304.
+def fetch_plans_page(cursor=None):
+    """Fetches one page of plan metadata: {"plans": [...], "next_cursor": ..., "total": ... (first page only)}."""
     try:
-        # The URL is now correct and does not include a user ID.
-        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/my-plans")
+        params = {"cursor": cursor} if cursor else None
+        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/my-plans", params=params)
         if response.status_code == 200:
             return response.json()
-        else:
-            # This is the error you were seeing.
-            st.error(f"Failed to fetch plans. Server responded with {response.status_code}")
-            return []
+        st.error(f"Failed to fetch plans. Server responded with {response.status_code}")
     except requests.exceptions.ConnectionError:
         st.error("Connection Error: Could not connect to the backend server.")
-        return []
+    return {"plans": [], "next_cursor": None}
+
+def search_plans(query, age_cohort=None, subject=None, page=1):
+    """Full-text search: {"results": [... "title_highlighted", "snippet"], "total": ..., "next_page": ...}."""
+    try:
+        params = {"q": query, "page": page, "age_cohort": age_cohort or "", "subject": subject or ""}
+        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/my-plans/search", params=params)
+        if response.status_code == 200:
+            return response.json()
+        st.error(f"Search failed. Server responded with {response.status_code}")
+    except requests.exceptions.ConnectionError:
+        st.error("Connection Error: Could not connect to the backend server.")
+    return {"results": [], "total": 0, "next_page": None}
+
+def fetch_filter_options():
+    """Age cohorts and subjects for the search filters, taken from the (cached) chatbot options."""
+    try:
+        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/chatbot/options")
+        if response.status_code == 200:
+            cohorts = response.json().get("age_cohorts", {})
+            return list(cohorts), sorted({subject for subjects in cohorts.values() for subject in subjects})
+    except requests.exceptions.ConnectionError:
+        pass
+    return [], []
+
+def fetch_plan_content(plan_id):
+    """Fetches the markdown content of a single plan."""
+    try:
+        response = st.session_state.api_session.get(f"{BACKEND_URL}/api/plans/{plan_id}")
+        if response.status_code == 200:
+            return response.json().get('content', '')
+        st.error(f"Failed to load plan. Server responded with {response.status_code}")
+    except requests.exceptions.ConnectionError:
+        st.error("Connection Error: Could not connect to the backend server.")
+    return None
+
+def render_plan_card(plan, card_title, snippet=None):
+    """A collapsed card; the plan's content is only requested once the card is opened."""
+    with st.container(border=True):
+        opened = st.toggle(card_title, key=f"open_{plan['id']}")
+        if snippet and not opened:
+            st.caption(snippet)
+        if not opened:
+            return
+        content = fetch_plan_content(plan['id'])
+        if content is None:
+            return
+        st.markdown(content)
+
+        st.markdown("---")
+
+        # --- Action Buttons ---
+        if st.button("🗑️ Delete Plan", key=f"delete_{plan['id']}", type="primary"):
+            try:
+                delete_response = st.session_state.api_session.delete(f"{BACKEND_URL}/api/plans/{plan['id']}")
+                if delete_response.status_code == 200:
+                    st.toast(f"Plan '{plan['title']}' was deleted.")
+                    st.rerun() # Rerun the script to refresh the list
+                else:
+                    st.error(f"Failed to delete plan: {delete_response.json().get('message')}")
+            except requests.exceptions.ConnectionError:
+                st.error("Connection error while trying to delete.")
+
+def describe(plan, title, bold=True):
+    try:
+        plan_date = datetime.strptime(plan['created_at'], '%Y-%m-%d %H:%M').strftime('%B %d, %Y')
+        title = f"**{title}**" if bold else title
+        return f"{title} (Age: {plan['age_cohort']}, Subject: {plan['subject']}) - Saved on {plan_date}"
+    except:
+        return plan.get('title', 'Untitled Plan')
+
+@contextmanager
+def export_plans(export_format, age_cohort=None, subject=None):
+    """Downloads the streamed export of all (filtered) plans to a temporary file; yields (file, file name), or (None, None) if it failed."""
+    params = {"format": export_format, "age_cohort": age_cohort or "", "subject": subject or ""}
+    with st.session_state.api_session.get(f"{BACKEND_URL}/api/my-plans/export", params=params, stream=True) as response:
+        if response.status_code != 200:
+            st.error(f"Export failed. Server responded with {response.status_code}"); yield None, None; return
+        file_name = response.headers.get("Content-Disposition", "").partition("filename=")[2] or f"my-plans.{export_format}"
+        with spooled_download(response) as file: yield file, file_name
+
+# --- Search Bar ---
+cohort_options, subject_options = fetch_filter_options()
+search_col, cohort_col, subject_col = st.columns([3, 1, 1])
+with search_col:
+    query = st.text_input("🔎 Search your plans", placeholder="e.g. water game")
+with cohort_col:
+    age_cohort = st.selectbox("Age cohort", ["All"] + cohort_options)
+with subject_col:
+    subject = st.selectbox("Subject", ["All"] + subject_options)
+with st.expander("⬇️ Export plans"):
+    st.caption("Downloads every saved plan matching the age cohort and subject filters above.")
+    export_format = st.radio("Format", ["zip", "jsonl"], horizontal=True, format_func=lambda f: "ZIP of Markdown files" if f == "zip" else "JSON Lines")
+    if st.button("Prepare export"):
+        try:
+            with export_plans(export_format, None if age_cohort == "All" else age_cohort, None if subject == "All" else subject) as (file, file_name):
+                if file is not None:
+                    st.download_button("Download", data=file, file_name=file_name, mime="application/zip" if export_format == "zip" else "application/x-ndjson")
+        except requests.exceptions.ConnectionError:
+            st.error("Connection Error: Could not connect to the backend server.")
+search_key = (query, age_cohort, subject)
+if st.session_state.get('saved_plans_search_key') != search_key:
+    st.session_state.saved_plans_search_key = search_key; st.session_state.search_pages = 1
 
 # --- Main Page Logic ---
-# The call to fetch_plans is now simpler.
-saved_plans = fetch_plans()
+if query.strip():
+    # Ranked search results; matches are shown in bold in the title and snippet.
+    results = []; total = 0; next_page = 1
+    for _ in range(st.session_state.search_pages):
+        if not next_page: break
+        found = search_plans(query, None if age_cohort == "All" else age_cohort, None if subject == "All" else subject, page=next_page)
+        results.extend(found['results']); total = found['total']; next_page = found['next_page']
+    if not results:
+        st.info("No saved plans match your search.")
+    else:
+        st.subheader(f"{total} plans match your search.")
+        for plan in results:
+            render_plan_card(plan, describe(plan, plan['title_highlighted'], bold=False), snippet=plan['snippet'])
+        if next_page and st.button("Load more results", use_container_width=True):
+            st.session_state.search_pages += 1; st.rerun()
+    st.stop()
+
+# Only as many pages as the teacher has asked for are fetched and rendered.
+if 'saved_plans_pages' not in st.session_state:
+    st.session_state.saved_plans_pages = 1
+
+first_page = fetch_plans_page()
+saved_plans = list(first_page['plans']); next_cursor = first_page['next_cursor']
+for _ in range(st.session_state.saved_plans_pages - 1):
+    if not next_cursor: break
+    page = fetch_plans_page(next_cursor); saved_plans.extend(page['plans']); next_cursor = page['next_cursor']
 
 if not saved_plans:
     st.info("You haven't saved any plans yet. Go back to the chatbot to create one!")
 else:
-    st.subheader(f"You have {len(saved_plans)} saved plans.")
+    st.subheader(f"You have {first_page.get('total', len(saved_plans))} saved plans.")
 
-    # Loop through each plan and display it in an expander
     for plan in saved_plans:
-        try:
-            plan_date = datetime.strptime(plan['created_at'], '%Y-%m-%d %H:%M').strftime('%B %d, %Y')
-            expander_title = f"**{plan['title']}** (Age: {plan['age_cohort']}, Subject: {plan['subject']}) - Saved on {plan_date}"
-        except:
-            expander_title = plan.get('title', 'Untitled Plan')
-
-
-        with st.expander(expander_title):
-            # Display the content as Markdown, which is how it's saved
-            st.markdown(plan['content'])
-            
-            st.markdown("---")
-            
-            # --- Action Buttons ---
-            if st.button("🗑️ Delete Plan", key=f"delete_{plan['id']}", type="primary"):
-                try:
-                    delete_response = st.session_state.api_session.delete(f"{BACKEND_URL}/api/plans/{plan['id']}")
-                    if delete_response.status_code == 200:
-                        st.toast(f"Plan '{plan['title']}' was deleted.")
-                        st.cache_data.clear() # Clear the cache
-                        st.rerun() # Rerun the script to refresh the list
-                    else:
-                        st.error(f"Failed to delete plan: {delete_response.json().get('message')}")
-                except requests.exceptions.ConnectionError:
-                    st.error("Connection error while trying to delete.")
\ No newline at end of file
+        render_plan_card(plan, describe(plan, plan['title']))
+
+    if next_cursor and st.button("Load more plans", use_container_width=True):
+        st.session_state.saved_plans_pages += 1; st.rerun()
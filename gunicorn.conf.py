@@ -0,0 +1,53 @@
+# ==============================================================================
+# ===                  GUNICORN PRODUCTION SERVING PROFILE                   ===
+# ==============================================================================
+# gunicorn -c gunicorn.conf.py backend.wsgi:app
+#
+# Requests spend most of their time waiting on the LLM and the database, so each worker runs
+# several threads (gthread). Every setting can be overridden from the environment.
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:5001")
+workers = int(os.environ.get("GUNICORN_WORKERS", min(2 * multiprocessing.cpu_count() + 1, 8)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# Plan generation can take well over a minute.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 180))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically to bound memory growth from the LLM/vector-store clients.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+# Workers import the app themselves: no engine, thread or process pool is inherited across fork.
+preload_app = False
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+
+# With RETRIEVAL_SERVICE_URL set, workers use one shared retrieval service (backend/retrieval_service.py)
+# instead of each opening the vector store. RETRIEVAL_SERVICE_AUTOSTART=true runs it as a child of the master.
+_retrieval_service = None
+
+def on_starting(server):
+    """Runs schema upgrades and seeding once, in a separate process, before any worker is forked."""
+    if os.environ.get("SKIP_DB_INIT", "").lower() not in ("1", "true", "yes"):
+        server.log.info("Preparing database")
+        subprocess.run([sys.executable, "-m", "flask", "--app", "backend.app", "init-db"], check=True)
+    if os.environ.get("RETRIEVAL_SERVICE_AUTOSTART", "").lower() in ("1", "true", "yes"): start_retrieval_service(server)
+
+def start_retrieval_service(server):
+    global _retrieval_service
+    from backend.retrieval_service import RetrievalClient, RetrievalServiceError
+    url = os.environ["RETRIEVAL_SERVICE_URL"]; server.log.info("Starting retrieval service on %s", url)
+    _retrieval_service = subprocess.Popen([sys.executable, "-m", "backend.retrieval_service", "--listen", url])
+    client = RetrievalClient(url, timeout=5); deadline = time.monotonic() + 120
+    while True:  # workers are only forked once the index is loaded
+        try: client.health(); return
+        except RetrievalServiceError:
+            if _retrieval_service.poll() is not None or time.monotonic() > deadline: raise RuntimeError("The retrieval service did not start")
+            time.sleep(0.5)
+
+def on_exit(server):
+    if _retrieval_service is not None: _retrieval_service.terminate(); _retrieval_service.wait(timeout=30)
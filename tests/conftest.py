@@ -0,0 +1,38 @@
+import os
+import contextlib
+import pytest
+
+# The app reads its configuration when backend.app is first imported: quiet, synchronous settings for tests.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("ACTIVITY_LOG_ASYNC", "false")
+os.environ.setdefault("TRACE_FILE", "")
+
+from benchmarks.common import load_app, login
+from backend import instrumentation
+
+@pytest.fixture(scope="session")
+def backend():
+    """The backend.app module, bound to a throwaway SQLite database shared by the whole test session."""
+    m = load_app()
+    with m.app.app_context(): m.create_admin_user_if_not_exists()
+    return m
+
+@pytest.fixture
+def admin_client(backend):
+    return login(backend.app.test_client(), backend.app.config['ADMIN_EMAIL'], backend.app.config['ADMIN_PASSWORD'])
+
+@pytest.fixture
+def track_queries():
+    """
+    `with track_queries(max_queries=n, nplusone_threshold=k) as stats: ...` fails the test when the block runs more
+    than n SQL statements, or one statement shape more than k times. The failure lists the statements that ran.
+    """
+    @contextlib.contextmanager
+    def tracker(max_queries=None, nplusone_threshold=None):
+        stats = None; failure = None
+        try:
+            with instrumentation.track_queries(max_queries=max_queries, nplusone_threshold=nplusone_threshold) as stats: yield stats
+        except instrumentation.QueryBudgetExceeded as e:
+            failure = f"{e}\n" + "\n".join(f"  {n} x {fp}" for fp, n in stats.fingerprints.most_common())
+        if failure: pytest.fail(failure, pytrace=False)
+    return tracker
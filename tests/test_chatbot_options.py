@@ -0,0 +1,30 @@
+def add_curriculum(m, tag, n_cohorts, n_domains, components_per_pair=3, n_play_types=5):
+    """Adds an n_cohorts x n_domains block of curriculum; every addition moves the "curriculum" version."""
+    with m.app.app_context():
+        cohorts = [m.AgeCohort(name=f"cohort {tag}/{i}") for i in range(n_cohorts)]
+        domains = [m.Domain(name=f"domain {tag}/{j}") for j in range(n_domains)]
+        m.db.session.add_all(cohorts + domains); m.db.session.flush()
+        m.db.session.add_all(m.Component(name=f"component {ac.id}/{d.id}/{k}", age_cohort_id=ac.id, domain_id=d.id)
+                             for ac in cohorts for d in domains for k in range(components_per_pair))
+        m.db.session.add_all(m.PlayType(name=f"play type {tag}/{k}", context="Standard", age_cohorts=cohorts, domains=domains) for k in range(n_play_types))
+        m.db.session.commit()
+
+def test_snapshot_build_costs_the_same_queries_at_any_curriculum_size(backend, admin_client, track_queries):
+    counts = []
+    for tag, size in enumerate((2, 5, 12)):
+        add_curriculum(backend, tag, size, size)
+        with track_queries() as stats:
+            response = admin_client.get('/api/chatbot/options')
+        assert response.status_code == 200 and f"cohort {tag}/0" in response.json["age_cohorts"]  # rebuilt, not the previous snapshot
+        counts.append(stats.count)
+    assert len(set(counts)) == 1, f"snapshot build queries grew with the curriculum: {counts}"
+
+def test_unchanged_curriculum_is_served_from_the_snapshot(backend, admin_client, track_queries):
+    add_curriculum(backend, "cached", 2, 2)
+    first = admin_client.get('/api/chatbot/options')
+    # Only the session's user and the curriculum version are read; the body and ETag come from memory.
+    with track_queries(max_queries=2):
+        again = admin_client.get('/api/chatbot/options')
+    assert again.data == first.data
+    with track_queries(max_queries=2):
+        assert admin_client.get('/api/chatbot/options', headers={"If-None-Match": first.headers['ETag']}).status_code == 304
@@ -0,0 +1,17 @@
+import pytest
+
+from benchmarks.query_budgets import BUDGETS, NPLUSONE_THRESHOLD, seed
+
+@pytest.fixture(scope="module", autouse=True)
+def curriculum(backend):
+    seed(backend)  # enough play types and resources to expose a lazy-load loop
+
+@pytest.mark.parametrize("endpoint", list(BUDGETS))
+def test_endpoint_stays_within_query_budget(admin_client, track_queries, endpoint):
+    with track_queries(max_queries=BUDGETS[endpoint], nplusone_threshold=NPLUSONE_THRESHOLD):
+        assert admin_client.get(endpoint).status_code == 200
+
+def test_budget_overrun_fails_the_test(admin_client, track_queries):
+    with pytest.raises(pytest.fail.Exception, match="budget is 1"):
+        with track_queries(max_queries=1):
+            admin_client.get('/api/admin/play-types'); admin_client.get('/api/admin/resources')